@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Modul zur Zwischenspeicherung der Kamera-Fähigkeiten.
+Die vollständige Matrix aus Pixelformaten, Auflösungen und Bildraten wird pro
+physischer Kamera nur einmal mit v4l2-ctl ermittelt und auf der Festplatte
+abgelegt. Anfragen werden aus dem Arbeitsspeicher beantwortet.
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+
+from webcam_detection_helper import get_camera_capabilities, get_usb_device_info
+
+# Logger konfigurieren
+logger = logging.getLogger("drehteller360.camera_capability_store")
+
+
+class CameraCapabilityStore:
+    """Speichert die Fähigkeiten jeder Kamera, Schlüssel: USB-ID und Seriennummer."""
+
+    def __init__(self, store_path='cache/camera_capabilities.json'):
+        """
+        Initialisiert den Speicher.
+
+        Args:
+            store_path: JSON-Datei für die dauerhafte Ablage
+        """
+        self.store_path = store_path
+        self.lock = threading.Lock()
+        self.entries = self._load()
+
+        # Zuordnung Gerätepfad -> Geräteinformationen (wird beim Anstecken verworfen)
+        self.device_info = {}
+
+    def _load(self):
+        """Lädt die gespeicherten Einträge."""
+        try:
+            with open(self.store_path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self):
+        """Speichert alle Einträge atomar."""
+        try:
+            os.makedirs(os.path.dirname(self.store_path) or '.', exist_ok=True)
+            tmp_path = self.store_path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(self.entries, f, indent=2)
+            os.replace(tmp_path, self.store_path)
+        except OSError as e:
+            logger.warning(f"Kamera-Fähigkeiten konnten nicht gespeichert werden: {e}")
+
+    def _resolve(self, device_path):
+        """Ermittelt Schlüssel und Firmware-Version eines Geräts (mit Zwischenspeicher)."""
+        info = self.device_info.get(device_path)
+        if info is None:
+            usb_info = get_usb_device_info(device_path)
+            if usb_info:
+                info = {'key': usb_info['key'], 'firmware': usb_info['firmware'], 'persistent': True}
+            else:
+                # Ohne USB-Kennung nur für die Laufzeit unter dem Gerätepfad merken
+                info = {'key': f"path:{device_path}", 'firmware': None, 'persistent': False}
+            self.device_info[device_path] = info
+        return info
+
+    def get(self, device_path, refresh=False):
+        """
+        Liefert die Fähigkeiten eines Geräts.
+
+        Args:
+            device_path: Gerätepfad, z.B. /dev/video0
+            refresh: Fähigkeiten unabhängig vom Speicher neu ermitteln
+
+        Returns:
+            Dictionary mit Auflösungen, Pixelformaten und Bildraten
+        """
+        with self.lock:
+            info = self._resolve(device_path)
+            entry = self.entries.get(info['key'])
+
+            # Bei geänderter Firmware sind die gespeicherten Daten ungültig
+            if entry and not refresh and entry.get('firmware') == info['firmware']:
+                return entry['capabilities']
+
+        capabilities = get_camera_capabilities(device_path)
+
+        with self.lock:
+            # Leere Ergebnisse (z.B. Gerät belegt) nicht dauerhaft speichern
+            if capabilities['formats']:
+                self.entries[info['key']] = {
+                    'firmware': info['firmware'],
+                    'updated': time.time(),
+                    'capabilities': capabilities
+                }
+                if info['persistent']:
+                    self._save()
+                logger.info(f"Kamera-Fähigkeiten für {device_path} ({info['key']}) ermittelt: "
+                            f"{len(capabilities['formats'])} Pixelformate")
+
+        return capabilities
+
+    def invalidate(self, device_path):
+        """
+        Verwirft die Zuordnung eines Gerätepfads (z.B. nach dem An- oder Abstecken).
+
+        Gespeicherte Fähigkeiten einer USB-Kamera bleiben erhalten und werden
+        beim nächsten Zugriff über die Firmware-Version geprüft.
+        """
+        with self.lock:
+            info = self.device_info.pop(device_path, None)
+            if info and not info['persistent']:
+                self.entries.pop(info['key'], None)
+
+
+# Globale Instanz für die Anwendung
+capability_store = CameraCapabilityStore()
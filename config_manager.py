@@ -10,6 +10,10 @@ class ConfigManager:
             'resolution': {
                 'width': 1280,
                 'height': 720
+            },
+            'preview': {
+                'fps': 10,
+                'max_width': 640
             }
         },
         'arduino': {
@@ -22,6 +26,41 @@ class ConfigManager:
         },
         'simulator': {
             'enabled': True
+        },
+        'processing': {
+            'frame_cache': False,
+            'workers': None  # processes for post-processing, default: CPU count
+        },
+        # Several turntable stations driven by this server, e.g.
+        # {'id': 'rig1', 'name': 'Rig 1', 'angle_step': 10,
+        #  'arduino': {'port': '/dev/ttyACM0', 'baudrate': 9600},
+        #  'camera': {'type': 'webcam', 'device_path': '/dev/video0',
+        #             'resolution': {'width': 1920, 'height': 1080}}}
+        # Instead of 'camera', 'cameras' lists several cameras that capture
+        # together at every step, e.g. [{'name': 'low', 'device_path': '/dev/video0', 'elevation': 0},
+        # {'name': 'high', 'device_path': '/dev/video2', 'elevation': 30}]
+        'rigs': [],
+        'web': {
+            'mode': 'development',  # or 'production'
+            'threads': 32,
+            'file_offload': None,  # None, 'x-sendfile' or 'x-accel-redirect'
+            'accel_prefix': '/protected-static/',
+            'workers': 4  # only with hardware.broker, otherwise one process
+        },
+        'hardware': {
+            'broker': False,  # Arduino and cameras in a separate broker process
+            'socket_path': 'cache/hardware.sock'
+        },
+        # Deleted projects are removed from static/projects/.trash in the background
+        'project_trash': {
+            'files_per_second': 200,
+            'bytes_per_second': 32 * 1024 * 1024
+        },
+        # On-demand profiling (admin only, see /api/admin/profiling)
+        'profiling': {
+            'directory': 'cache/profiles',
+            'keep': 20,  # recorded profiles kept on disk
+            'sample_interval': 0.005  # seconds between stack samples
         }
     }
 
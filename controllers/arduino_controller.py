@@ -6,6 +6,8 @@ import logging
 import serial
 import serial.tools.list_ports
 
+from metrics import device_reconnects
+
 
 class ArduinoController:
     """Klasse zur Steuerung des Arduino, der den Drehteller antreibt"""
@@ -24,16 +26,22 @@ class ArduinoController:
 
     def connect(self):
         """Stellt eine Verbindung zum Arduino her"""
+        # Bestand schon einmal eine Verbindung, ist es ein Wiederverbinden
+        reconnect = self.serial is not None
         try:
             self.serial = serial.Serial(self.port, self.baudrate, timeout=2)
             time.sleep(2)  # Warten auf Arduino-Reset nach Verbindungsaufbau
             self.connected = True
             self.logger.info("Verbindung zum Arduino hergestellt: %s @ %d Baud",
                              self.port, self.baudrate)
+            if reconnect:
+                device_reconnects.labels('arduino', 'success').inc()
             return True
         except Exception as e:
             self.logger.error("Fehler beim Verbinden mit Arduino: %s", str(e))
             self.connected = False
+            if reconnect:
+                device_reconnects.labels('arduino', 'failure').inc()
             return False
 
     def disconnect(self):
@@ -8,12 +8,32 @@ import subprocess
 import cv2
 from pathlib import Path
 
+from .capture_tuner import CaptureModeTuner
+from metrics import capture_seconds, capture_phase_seconds
+
+
+def write_frame(output_path, frame):
+    """Kodiert einen Frame passend zur Dateiendung und schreibt ihn (Phasen getrennt gemessen)"""
+    extension = os.path.splitext(output_path)[1] or '.jpg'
+    with capture_phase_seconds.labels('encode').time():
+        ret, buffer = cv2.imencode(extension, frame)
+    if not ret:
+        return False
+    with capture_phase_seconds.labels('write').time():
+        with open(output_path, 'wb') as f:
+            f.write(buffer.tobytes())
+    return True
+
 
 class CameraController:
     """Klasse zur Steuerung der Kamera (Webcam oder gphoto2-Kamera)"""
 
-    def __init__(self, camera_type='webcam', device='/dev/video0', resolution=(1920, 1080)):
-        """Initialisiert den Kameracontroller"""
+    def __init__(self, camera_type='webcam', device='/dev/video0', resolution=(1920, 1080), auto_tune=True):
+        """Initialisiert den Kameracontroller
+
+        auto_tune: Beim ersten Verbinden einer unbekannten Webcam den schnellsten
+        Aufnahmemodus ermitteln und als Profil speichern
+        """
         self.logger = logging.getLogger(__name__)
         self.camera_type = camera_type
         self.device = device
@@ -30,6 +50,9 @@ class CameraController:
         self.webcam = None
         self.gphoto2_available = self._check_gphoto2()
 
+        self.auto_tune = auto_tune
+        self.tuner = CaptureModeTuner()
+
     def _check_gphoto2(self):
         """Prüft, ob gphoto2 installiert ist"""
         try:
@@ -50,11 +73,17 @@ class CameraController:
                 else:
                     device_id = self.device
 
-                self.webcam = cv2.VideoCapture(device_id)
+                profile = self.get_capture_profile()
+                with capture_phase_seconds.labels('open').time():
+                    if profile:
+                        # Gespeichertes Profil (Pixelformat, Auflösung, Puffer) verwenden
+                        self.webcam = self.tuner.open_capture(self.device, profile['mode'])
+                    else:
+                        self.webcam = cv2.VideoCapture(device_id)
 
-                # Auflösung einstellen
-                self.webcam.set(cv2.CAP_PROP_FRAME_WIDTH, self.resolution[0])
-                self.webcam.set(cv2.CAP_PROP_FRAME_HEIGHT, self.resolution[1])
+                        # Auflösung einstellen
+                        self.webcam.set(cv2.CAP_PROP_FRAME_WIDTH, self.resolution[0])
+                        self.webcam.set(cv2.CAP_PROP_FRAME_HEIGHT, self.resolution[1])
 
                 if not self.webcam.isOpened():
                     self.logger.error("Webcam konnte nicht geöffnet werden: %s", self.device)
@@ -69,6 +98,30 @@ class CameraController:
                 return False
         return True
 
+    def get_capture_profile(self):
+        """Liefert das Aufnahmeprofil der Webcam und ermittelt es bei Bedarf"""
+        profile = self.tuner.get_profile(self.device)
+
+        # Profil gilt nur für die Auflösung, für die es ermittelt wurde
+        if profile and tuple(profile.get('resolution', ())) == tuple(self.resolution):
+            return profile
+
+        # Ohne passenden Modus direkt mit cv2.VideoCapture öffnen statt erneut zu messen
+        if self.auto_tune and not self.tuner.recently_failed(self.device, self.resolution):
+            self.logger.info("Neue Kamera oder Auflösung, ermittle Aufnahmemodus für %s", self.device)
+            return self.tune_capture_mode()
+        return None
+
+    def tune_capture_mode(self):
+        """Testet die Aufnahmemodi der Webcam und speichert das schnellste Profil"""
+        if self.camera_type != 'webcam':
+            self.logger.warning("Aufnahmemodus-Optimierung ist nur für Webcams verfügbar")
+            return None
+
+        # Die Webcam muss für die Messung freigegeben sein
+        self._close_webcam()
+        return self.tuner.tune(self.device, self.resolution)
+
     def _close_webcam(self):
         """Schließt die Webcam"""
         if self.webcam is not None:
@@ -86,14 +139,15 @@ class CameraController:
 
             # Mehrere Frames lesen, um sicherzustellen, dass die Kamera sich angepasst hat
             for _ in range(5):
-                ret, frame = self.webcam.read()
+                with capture_phase_seconds.labels('grab').time():
+                    ret, frame = self.webcam.read()
                 if not ret:
                     self.logger.error("Fehler beim Lesen des Webcam-Frames")
                     return False
                 time.sleep(0.1)
 
             # Letzten Frame speichern
-            success = cv2.imwrite(output_path, frame)
+            success = write_frame(output_path, frame)
 
             if success:
                 self.logger.info("Webcam-Foto gespeichert: %s", output_path)
@@ -105,6 +159,48 @@ class CameraController:
             self.logger.error("Fehler bei der Webcam-Fotoaufnahme: %s", str(e))
             return False
 
+    def prepare_capture(self):
+        """Bereitet eine Aufnahme vor (Webcam öffnen, Belichtung einschwingen lassen)"""
+        if self.camera_type != 'webcam':
+            return True
+        if not self._setup_webcam():
+            return False
+
+        # Gepufferte, veraltete Frames verwerfen
+        for _ in range(4):
+            if not self.webcam.grab():
+                self.logger.error("Fehler beim Lesen des Webcam-Frames")
+                return False
+            time.sleep(0.1)
+        return True
+
+    def trigger_capture(self, output_path):
+        """Löst die Aufnahme aus und speichert sie (nach prepare_capture)
+
+        Bei Webcams wird der Frame sofort gegriffen und erst danach dekodiert
+        und geschrieben, damit mehrere Kameras möglichst gleichzeitig auslösen.
+        """
+        if self.camera_type != 'webcam':
+            return self.capture_photo(output_path)
+
+        with capture_phase_seconds.labels('grab').time():
+            if self.webcam is None or not self.webcam.grab():
+                self.logger.error("Fehler beim Lesen des Webcam-Frames")
+                return False
+
+            ret, frame = self.webcam.retrieve()
+        if not ret:
+            self.logger.error("Fehler beim Dekodieren des Webcam-Frames")
+            return False
+
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        if not write_frame(output_path, frame):
+            self.logger.error("Fehler beim Speichern des Webcam-Fotos: %s", output_path)
+            return False
+
+        self.logger.info("Webcam-Foto gespeichert: %s", output_path)
+        return True
+
     def capture_gphoto2_photo(self, output_path):
         """Nimmt ein Foto mit einer gphoto2-kompatiblen Kamera auf"""
         if not self.gphoto2_available:
@@ -142,13 +238,13 @@ class CameraController:
 
     def capture_photo(self, output_path):
         """Nimmt ein Foto auf (je nach Kameratyp)"""
-        if self.camera_type == 'webcam':
-            return self.capture_webcam_photo(output_path)
-        elif self.camera_type == 'gphoto2':
-            return self.capture_gphoto2_photo(output_path)
-        else:
-            self.logger.error("Unbekannter Kameratyp: %s", self.camera_type)
-            return False
+        with capture_seconds.labels(self.camera_type).time():
+            if self.camera_type == 'webcam':
+                return self.capture_webcam_photo(output_path)
+            elif self.camera_type == 'gphoto2':
+                return self.capture_gphoto2_photo(output_path)
+        self.logger.error("Unbekannter Kameratyp: %s", self.camera_type)
+        return False
 
     def cleanup(self):
         """Ressourcen freigeben, wenn die Kamera nicht mehr benötigt wird"""
@@ -0,0 +1,112 @@
+# Datei: controllers/camera_group.py
+# Modul für die synchrone Aufnahme mit mehreren Kameras
+
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class CameraGroup:
+    """Mehrere Kameras, die pro Drehteller-Schritt gemeinsam auslösen
+
+    Jede Kamera hat einen eigenen Aufnahme-Thread. Alle Threads bereiten die
+    Aufnahme parallel vor, warten an einer gemeinsamen Barriere und lösen dann
+    gleichzeitig aus; anschließend schreibt jeder Thread seinen Frame selbst.
+    Ein Schritt dauert so lange wie die langsamste Kamera, nicht wie alle
+    Kameras zusammen.
+    """
+
+    def __init__(self, cameras, timeout=30, elevations=None):
+        """Initialisiert die Kameragruppe
+
+        cameras: Dictionary Name -> CameraController (Reihenfolge bleibt erhalten,
+        die erste Kamera ist die Hauptkamera)
+        timeout: Maximale Wartezeit in Sekunden auf die langsamste Kamera
+        elevations: Dictionary Name -> Elevation in Grad (Standard: Ebenen 0, 1, 2, ...)
+        """
+        self.logger = logging.getLogger(__name__)
+        if not cameras:
+            raise ValueError("Kameragruppe ohne Kameras")
+
+        self.cameras = dict(cameras)
+        self.timeout = timeout
+        self.elevations = {name: (elevations or {}).get(name, index)
+                           for index, name in enumerate(self.cameras)}
+
+        # Ein Thread je Kamera, damit jede Kamera immer vom selben Thread bedient wird
+        self.executors = {name: ThreadPoolExecutor(max_workers=1, thread_name_prefix=f'camera-{name}')
+                          for name in self.cameras}
+
+    @property
+    def names(self):
+        """Namen der Kameras"""
+        return list(self.cameras)
+
+    @property
+    def primary(self):
+        """Name der Hauptkamera"""
+        return self.names[0]
+
+    def _capture_one(self, name, output_path, barrier, trigger_times):
+        """Vorbereiten, an der Barriere warten und auslösen (im Thread der Kamera)"""
+        camera = self.cameras[name]
+        if not camera.prepare_capture():
+            # Die anderen Kameras nicht ewig warten lassen
+            barrier.abort()
+            return False
+
+        try:
+            barrier.wait()
+        except threading.BrokenBarrierError:
+            return False
+
+        trigger_times[name] = time.time()
+        return camera.trigger_capture(output_path)
+
+    def capture(self, output_paths):
+        """Löst alle Kameras gleichzeitig aus
+
+        output_paths: Dictionary Kameraname -> Zieldatei
+        Rückgabe: Dictionary mit 'success', 'timestamp' (gemeinsamer Auslösezeitpunkt),
+        'paths' (erfolgreich gespeicherte Dateien) und 'skew' (Zeitversatz in Sekunden)
+        """
+        shared = {}
+
+        def release():
+            # Gemeinsamer Zeitstempel, sobald alle Kameras bereit sind
+            shared['timestamp'] = time.time()
+
+        barrier = threading.Barrier(len(output_paths), action=release, timeout=self.timeout)
+        trigger_times = {}
+
+        futures = {name: self.executors[name].submit(self._capture_one, name, path, barrier, trigger_times)
+                   for name, path in output_paths.items()}
+
+        paths = {}
+        for name, future in futures.items():
+            try:
+                if future.result(timeout=self.timeout * 2):
+                    paths[name] = output_paths[name]
+            except Exception as e:
+                self.logger.error("Fehler bei der Aufnahme mit Kamera %s: %s", name, str(e))
+                barrier.abort()
+
+        skew = max(trigger_times.values()) - min(trigger_times.values()) if trigger_times else None
+        return {
+            'success': len(paths) == len(output_paths),
+            'timestamp': shared.get('timestamp'),
+            'paths': paths,
+            'skew': skew
+        }
+
+    def cleanup(self):
+        """Gibt alle Kameras frei (die Gruppe bleibt verwendbar)"""
+        for name, camera in self.cameras.items():
+            self.executors[name].submit(camera.cleanup).result()
+
+    def close(self):
+        """Gibt alle Kameras frei und beendet die Aufnahme-Threads"""
+        self.cleanup()
+        for executor in self.executors.values():
+            executor.shutdown(wait=False)
@@ -0,0 +1,214 @@
+# Datei: controllers/capture_tuner.py
+# Modul zur automatischen Auswahl des schnellsten Aufnahmemodus einer Webcam
+
+import os
+import json
+import time
+import logging
+import cv2
+
+from webcam_detection_helper import get_usb_device_info
+from camera_capability_store import capability_store
+
+
+class CaptureModeTuner:
+    """Misst Aufnahmemodi (Pixelformat, Auflösung, Puffer) und speichert das schnellste Profil"""
+
+    # Pixelformate, die OpenCV über V4L2 zuverlässig setzen kann
+    SUPPORTED_FORMATS = ('MJPG', 'YUYV')
+    BUFFER_COUNTS = (1, 2, 4)
+
+    # Eintrag in der Profildatei mit fehlgeschlagenen Messungen (Gerät@Auflösung -> Zeitpunkt)
+    FAILURES_KEY = '_failures'
+
+    def __init__(self, profile_path='cache/capture_profiles.json', benchmark_frames=30, warmup_frames=3,
+                 failure_retry_age=24 * 3600):
+        """Initialisiert den Tuner
+
+        Args:
+            profile_path: JSON-Datei mit den gespeicherten Profilen
+            benchmark_frames: Anzahl der Bilder für die Messung der Bildrate
+            warmup_frames: Bilder, die vor der Messung verworfen werden
+            failure_retry_age: Sekunden, nach denen eine fehlgeschlagene Messung
+                automatisch wiederholt wird
+        """
+        self.logger = logging.getLogger(__name__)
+        self.profile_path = profile_path
+        self.benchmark_frames = benchmark_frames
+        self.warmup_frames = warmup_frames
+        self.failure_retry_age = failure_retry_age
+        self.profiles = self._load_profiles()
+
+    def _load_profiles(self):
+        """Lädt die gespeicherten Profile"""
+        try:
+            with open(self.profile_path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_profiles(self):
+        """Speichert die Profile"""
+        try:
+            os.makedirs(os.path.dirname(self.profile_path) or '.', exist_ok=True)
+            with open(self.profile_path, 'w') as f:
+                json.dump(self.profiles, f, indent=4)
+        except OSError as e:
+            self.logger.error("Fehler beim Speichern der Aufnahmeprofile: %s", str(e))
+
+    @staticmethod
+    def device_key(device):
+        """Schlüssel eines Geräts (USB-Kennung, sonst Gerätepfad)"""
+        info = get_usb_device_info(device)
+        return info['key'] if info else f"path:{device}"
+
+    def get_profile(self, device):
+        """Gibt das gespeicherte Profil eines Geräts zurück (oder None)"""
+        return self.profiles.get(self.device_key(device))
+
+    def _failure_key(self, device, resolution):
+        return f"{self.device_key(device)}@{resolution[0]}x{resolution[1]}"
+
+    def recently_failed(self, device, resolution):
+        """Prüft, ob die Messung für Gerät und Auflösung vor kurzem ergebnislos war"""
+        failed_at = self.profiles.get(self.FAILURES_KEY, {}).get(self._failure_key(device, resolution))
+        return failed_at is not None and time.time() - failed_at < self.failure_retry_age
+
+    def candidate_modes(self, device, resolution):
+        """Ermittelt die zu testenden Modi, die mindestens die gewünschte Auflösung liefern"""
+        capabilities = capability_store.get(device)
+        modes = []
+
+        for fmt in capabilities.get('formats', []):
+            if fmt['pixel_format'] not in self.SUPPORTED_FORMATS:
+                continue
+
+            # Kleinste Auflösung, die die Vorgabe erfüllt
+            sizes = [s for s in fmt['sizes']
+                     if s['width'] >= resolution[0] and s['height'] >= resolution[1]]
+            if not sizes:
+                continue
+            size = min(sizes, key=lambda s: s['width'] * s['height'])
+
+            for buffers in self.BUFFER_COUNTS:
+                modes.append({
+                    'pixel_format': fmt['pixel_format'],
+                    'width': size['width'],
+                    'height': size['height'],
+                    'buffers': buffers
+                })
+
+        # Ohne Fähigkeitsdaten: nur die gewünschte Auflösung in beiden Formaten testen
+        if not modes:
+            for pixel_format in self.SUPPORTED_FORMATS:
+                modes.append({'pixel_format': pixel_format, 'width': resolution[0],
+                              'height': resolution[1], 'buffers': 1})
+
+        return modes
+
+    @staticmethod
+    def open_capture(device, mode):
+        """Öffnet eine Aufnahme mit dem angegebenen Modus"""
+        device_id = int(device) if str(device).isdigit() else device
+        cap = cv2.VideoCapture(device_id, cv2.CAP_V4L2)
+
+        # Das Pixelformat muss vor der Auflösung gesetzt werden
+        cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*mode['pixel_format']))
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, mode['width'])
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, mode['height'])
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, mode['buffers'])
+        return cap
+
+    def benchmark_mode(self, device, mode):
+        """Misst Öffnungszeit, Zeit bis zum ersten Bild, Bildrate und CPU-Zeit pro Bild"""
+        start = time.perf_counter()
+        cap = self.open_capture(device, mode)
+        open_latency = time.perf_counter() - start
+
+        try:
+            if not cap.isOpened():
+                return None
+
+            ret, frame = cap.read()
+            first_frame = time.perf_counter() - start
+            if not ret or frame is None:
+                return None
+
+            for _ in range(self.warmup_frames):
+                cap.read()
+
+            cpu_start = time.process_time()
+            wall_start = time.perf_counter()
+            frames = 0
+            for _ in range(self.benchmark_frames):
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                frames += 1
+            wall = time.perf_counter() - wall_start
+            cpu = time.process_time() - cpu_start
+
+            if frames == 0:
+                return None
+
+            return {
+                'mode': mode,
+                'actual_width': int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                'actual_height': int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+                'open_latency': open_latency,
+                'time_to_first_frame': first_frame,
+                'fps': frames / wall if wall > 0 else 0.0,
+                'cpu_per_frame': cpu / frames
+            }
+        finally:
+            cap.release()
+
+    def tune(self, device, resolution):
+        """Testet alle Kandidaten und speichert den schnellsten passenden Modus als Profil
+
+        Args:
+            device: Gerätepfad
+            resolution: Mindestauflösung als Tupel (Breite, Höhe)
+
+        Returns:
+            Profil-Dictionary oder None, wenn kein Modus funktioniert
+        """
+        results = []
+        for mode in self.candidate_modes(device, resolution):
+            self.logger.info("Teste Aufnahmemodus %s %dx%d (%d Puffer) auf %s",
+                             mode['pixel_format'], mode['width'], mode['height'], mode['buffers'], device)
+            try:
+                result = self.benchmark_mode(device, mode)
+            except Exception as e:
+                self.logger.error("Fehler beim Testen des Aufnahmemodus: %s", str(e))
+                result = None
+
+            # Nur Modi, die die gewünschte Auflösung tatsächlich liefern
+            if result and result['actual_width'] >= resolution[0] and result['actual_height'] >= resolution[1]:
+                results.append(result)
+
+        failures = self.profiles.setdefault(self.FAILURES_KEY, {})
+        if not results:
+            self.logger.warning("Kein Aufnahmemodus erfüllt die Auflösung %dx%d auf %s",
+                                resolution[0], resolution[1], device)
+            # Ergebnis merken, damit nicht jede Aufnahme erneut misst
+            failures[self._failure_key(device, resolution)] = time.time()
+            self._save_profiles()
+            return None
+        failures.pop(self._failure_key(device, resolution), None)
+
+        # Höchste Bildrate, bei Gleichstand geringste Zeit bis zum ersten Bild und CPU-Last
+        best = max(results, key=lambda r: (round(r['fps'], 1), -r['time_to_first_frame'], -r['cpu_per_frame']))
+
+        profile = dict(best)
+        profile['resolution'] = list(resolution)
+        profile['tuned_at'] = time.time()
+        profile['candidates'] = len(results)
+
+        self.profiles[self.device_key(device)] = profile
+        self._save_profiles()
+
+        self.logger.info("Aufnahmeprofil für %s: %s %dx%d, %d Puffer, %.1f fps",
+                         device, best['mode']['pixel_format'], best['mode']['width'],
+                         best['mode']['height'], best['mode']['buffers'], best['fps'])
+        return profile
@@ -4,10 +4,14 @@
 import time
 import logging
 import math
+import threading
 import os
 import uuid
 from pathlib import Path
 from models.photo_session import PhotoSession
+from models.session_journal import SessionJournal
+from controllers.camera_group import CameraGroup
+from metrics import rotation_seconds, settle_seconds, session_seconds
 
 
 class TurntableController:
@@ -23,6 +27,11 @@ class TurntableController:
         self.default_angle_step = default_angle_step
         self.current_position = 0  # Aktuelle Position in Grad (0-360)
 
+        # Zustand der laufenden Session (für Statusabfragen aus anderen Threads)
+        self.stop_requested = threading.Event()
+        self.progress = None
+        self.last_error = None
+
     def calculate_rotation_time(self, degrees):
         """Berechnet die Zeit, die für eine Rotation um einen bestimmten Winkel benötigt wird"""
         # Die Zeit wird in Millisekunden zurückgegeben
@@ -38,7 +47,8 @@ class TurntableController:
         rotation_time_ms = self.calculate_rotation_time(degrees)
 
         # Motor für die berechnete Zeit einschalten
-        success = self.arduino.rotate_for_duration(rotation_time_ms)
+        with rotation_seconds.time():
+            success = self.arduino.rotate_for_duration(rotation_time_ms)
 
         if success:
             # Position aktualisieren
@@ -55,67 +65,150 @@ class TurntableController:
         self.current_position = 0
         self.logger.info("Drehteller-Position zurückgesetzt")
 
-    def start_session(self, project, camera_controller):
-        """Startet eine Fotosession für ein Projekt"""
+    def stop(self):
+        """Bricht eine laufende Fotosession nach dem aktuellen Schritt ab"""
+        self.stop_requested.set()
+
+    def _fail(self, message):
+        """Protokolliert einen Fehler der Session und merkt ihn für Statusabfragen"""
+        self.logger.error(message)
+        self.last_error = message
+        return False
+
+    def _capture_step(self, camera_controller, base_path, angle):
+        """Nimmt die Fotos eines Schritts auf (eine Kamera oder eine Kameragruppe)
+
+        Rückgabe: (Liste von (Kameraname oder None, Elevation, Pfad), Zeitstempel) oder None
+        """
+        if not isinstance(camera_controller, CameraGroup):
+            photo_filename = os.path.join(base_path, f"angle_{angle:03d}.jpg")
+            if not camera_controller.capture_photo(photo_filename):
+                return None
+            return [(None, 0, photo_filename)], time.time()
+
+        # Alle Kameras lösen gemeinsam aus und schreiben parallel
+        output_paths = {name: os.path.join(base_path, f"angle_{angle:03d}_{name}.jpg")
+                        for name in camera_controller.names}
+        result = camera_controller.capture(output_paths)
+        if not result['success']:
+            return None
+
+        self.logger.debug(f"Kameraversatz bei {angle} Grad: {result['skew']:.4f} s")
+        frames = [(name, camera_controller.elevations[name], result['paths'][name])
+                  for name in camera_controller.names]
+        return frames, result['timestamp']
+
+    def start_session(self, project, camera_controller, resume_session_id=None):
+        """Startet eine Fotosession für ein Projekt
+
+        camera_controller: CameraController oder CameraGroup (mehrere Kameras,
+        die pro Schritt gleichzeitig auslösen)
+        resume_session_id: Abgebrochene Session fortsetzen; bereits aufgenommene
+        Winkel aus dem Session-Protokoll werden übersprungen. Der Drehteller
+        wird von der zuletzt protokollierten Position aus weitergedreht (er darf
+        seit dem Abbruch nicht von Hand bewegt worden sein)
+        """
+        self.stop_requested.clear()
+        self.last_error = None
+
         if not self.arduino or not self.arduino.is_connected():
-            self.logger.error("Arduino ist nicht verbunden")
-            return False
+            return self._fail("Arduino ist nicht verbunden")
 
         if not camera_controller:
-            self.logger.error("Kamera-Controller ist nicht initialisiert")
-            return False
+            return self._fail("Kamera-Controller ist nicht initialisiert")
 
+        journal = None
+        started = time.monotonic()
+        completed = False
         try:
-            # Neue Session erstellen
-            session_id = str(uuid.uuid4())
-            session = PhotoSession(
-                id=session_id,
-                name=f"Session {time.strftime('%Y-%m-%d %H:%M')}",
-                timestamp=time.time(),
-                angle_step=project.angle_step
-            )
+            if resume_session_id:
+                # Session aus dem Protokoll wiederherstellen
+                journal = SessionJournal.for_session(project.path, resume_session_id)
+                session = journal.replay()
+                if session is None:
+                    return self._fail(f"Kein Protokoll für Session {resume_session_id} gefunden")
+                if session.completed:
+                    return self._fail(f"Session {resume_session_id} ist bereits abgeschlossen")
+                session_id = session.id
+            else:
+                # Neue Session erstellen
+                session_id = str(uuid.uuid4())
+                session = PhotoSession(
+                    id=session_id,
+                    name=f"Session {time.strftime('%Y-%m-%d %H:%M')}",
+                    timestamp=time.time(),
+                    angle_step=project.angle_step
+                )
+                journal = SessionJournal.for_session(project.path, session_id)
+                journal.start(session)
 
             # Speicherpfad für die Fotos
             base_path = os.path.join(project.path, "sessions", session_id)
             os.makedirs(base_path, exist_ok=True)
 
-            # Drehteller auf Position 0 zurücksetzen (ohne Bewegung)
-            self.reset_position()
+            if resume_session_id:
+                # Der Teller steht noch dort, wo die abgebrochene Session ihn verlassen hat
+                self.current_position = journal.last_position()
+                self.logger.info(f"Setze Session bei {self.current_position} Grad fort")
+            else:
+                # Drehteller auf Position 0 zurücksetzen (ohne Bewegung)
+                self.reset_position()
 
             # Anzahl der benötigten Schritte berechnen
-            total_steps = 360 // project.angle_step
+            angle_step = session.angle_step
+            total_steps = 360 // angle_step
+            captured = session.captured_angles()
 
-            self.logger.info(f"Starte Fotosession mit {total_steps} Schritten alle {project.angle_step} Grad")
+            self.logger.info(f"Starte Fotosession mit {total_steps} Schritten alle {angle_step} Grad"
+                             + (f" ({len(captured)} bereits aufgenommen)" if captured else ""))
 
             for step in range(total_steps):
-                # Aktuelle Winkelposition
-                angle = step * project.angle_step
+                if self.stop_requested.is_set():
+                    return self._fail("Fotosession abgebrochen")
 
-                # Dateiname für das Foto
-                photo_filename = os.path.join(base_path, f"angle_{angle:03d}.jpg")
+                # Aktuelle Winkelposition
+                angle = step * angle_step
+                self.progress = {'step': step + 1, 'total': total_steps, 'angle': angle}
+
+                if angle in captured:
+                    continue
+
+                # Vorwärts bis zum nächsten fehlenden Winkel (übersprungene Schritte am Stück)
+                degrees = (angle - self.current_position) % 360
+                if degrees:
+                    if not self.move_degrees(degrees):
+                        return self._fail(f"Fehler beim Drehen auf {angle} Grad")
+                    journal.append_position(self.current_position)
+                    # Kurze Pause für Stabilisierung
+                    with settle_seconds.time():
+                        time.sleep(1)
 
-                # Foto aufnehmen
+                # Foto(s) aufnehmen und sofort im Protokoll sichern
                 self.logger.info(f"Nehme Foto bei {angle} Grad auf")
-                if not camera_controller.capture_photo(photo_filename):
-                    self.logger.error(f"Fehler beim Aufnehmen des Fotos bei {angle} Grad")
-                    return False
+                result = self._capture_step(camera_controller, base_path, angle)
+                if result is None:
+                    return self._fail(f"Fehler beim Aufnehmen des Fotos bei {angle} Grad")
 
-                # Session-Informationen aktualisieren
-                session.add_photo(angle, photo_filename)
-
-                # Wenn wir nicht beim letzten Schritt sind, drehen wir weiter
-                if step < total_steps - 1:
-                    self.move_degrees(project.angle_step)
-                    # Kurze Pause für Stabilisierung
-                    time.sleep(1)
+                frames, timestamp = result
+                journal.append_step(angle, frames, timestamp)
+                session.add_step(angle, frames, timestamp)
 
-            # Session zum Projekt hinzufügen
+            # Session einmalig in die Projekt-Metadaten übernehmen
+            session.completed = True
+            project.remove_session(session_id)
             project.add_session(session)
-            project.save()
+            if not project.save():
+                return self._fail("Projekt konnte nicht gespeichert werden")
+            journal.complete()
+            completed = True
 
             self.logger.info(f"Fotosession erfolgreich abgeschlossen: {session_id}")
             return True
 
         except Exception as e:
-            self.logger.error(f"Fehler während der Fotosession: {str(e)}")
-            return False
\ No newline at end of file
+            return self._fail(f"Fehler während der Fotosession: {str(e)}")
+        finally:
+            session_seconds.labels('completed' if completed else 'failed').observe(time.monotonic() - started)
+            self.progress = None
+            if journal is not None:
+                journal.close()
\ No newline at end of file
@@ -2,34 +2,55 @@
 # -*- coding: utf-8 -*-
 """
 Modul zur Erkennung von Kameras und Arduino-Geräten.
-Erkennt automatisch verfügbare Geräte und aktualisiert regelmäßig die Liste.
+Erkennt verfügbare Geräte beim Start und reagiert danach auf Kernel-Ereignisse
+(uevents) beim An- und Abstecken, statt alle Geräte periodisch neu zu testen.
 """
 
 import os
+import json
 import time
+import socket
 import logging
 import subprocess
 import glob
 import threading
+from contextlib import contextmanager
 from serial.tools import list_ports
 
-from webcam_detection_helper import find_working_webcam
+from webcam_detection_helper import probe_webcams, get_usb_device_info
+from camera_capability_store import capability_store
+from metrics import device_reconnects
 
 # Logger konfigurieren
 logger = logging.getLogger("drehteller360.device_detector")
 
+# Netlink-Protokoll für Kernel-uevents (linux/netlink.h)
+NETLINK_KOBJECT_UEVENT = 15
+
 
 class DeviceDetector:
     """Erkennt und verfolgt verfügbare Kameras und Arduino-Geräte."""
 
-    def __init__(self, scan_interval=10):
+    # Subsysteme, deren Ereignisse eine Neuerkennung auslösen
+    WATCHED_SUBSYSTEMS = ('video4linux', 'tty', 'usb')
+
+    def __init__(self, scan_interval=10, probe_cache_path='cache/device_probe_cache.json',
+                 debounce=0.5, failure_retry_age=300):
         """
         Initialisiert den Gerätedetektor.
 
         Args:
-            scan_interval: Zeit in Sekunden zwischen Geräte-Scans
+            scan_interval: Zeit in Sekunden zwischen Prüfungen, falls keine
+                Kernel-Ereignisse verfügbar sind (Fallback)
+            probe_cache_path: Datei für die Ergebnisse bereits getesteter Kameras
+            debounce: Wartezeit in Sekunden, um zusammengehörige Ereignisse zu bündeln
+            failure_retry_age: Sekunden, nach denen eine Kamera, deren Test
+                fehlgeschlagen ist, erneut getestet wird
         """
         self.scan_interval = scan_interval
+        self.probe_cache_path = probe_cache_path
+        self.debounce = debounce
+        self.failure_retry_age = failure_retry_age
         self.devices = {
             'cameras': {
                 'webcams': [],
@@ -39,26 +60,109 @@ class DeviceDetector:
         }
         self.running = False
         self.lock = threading.Lock()
+        self.active_lock = threading.Lock()
+
+        # Testergebnisse je Kamera, Schlüssel: USB-Vendor:Product:Serial:Index
+        self.probe_cache = self._load_probe_cache()
+        # Aktuell bekannte Videogeräte: Gerätepfad -> {'key', 'working'}
+        self.webcam_state = {}
+        # Geräte, die gerade für eine Aufnahme verwendet werden
+        self.active_devices = set()
+
+    def _load_probe_cache(self):
+        """Lädt den Cache der Kamera-Testergebnisse."""
+        try:
+            with open(self.probe_cache_path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_probe_cache(self):
+        """Speichert den Cache der Kamera-Testergebnisse."""
+        try:
+            os.makedirs(os.path.dirname(self.probe_cache_path) or '.', exist_ok=True)
+            with open(self.probe_cache_path, 'w') as f:
+                json.dump(self.probe_cache, f, indent=2)
+        except OSError as e:
+            logger.warning(f"Kamera-Cache konnte nicht gespeichert werden: {e}")
+
+    def get_device_key(self, device):
+        """
+        Ermittelt einen stabilen Schlüssel für ein Videogerät.
+
+        Der Schlüssel besteht aus USB-Vendor-ID, Product-ID, Seriennummer und dem
+        Index des Videoknotens innerhalb der Kamera. Er bleibt beim erneuten
+        Anstecken (auch an einem anderen Port) gleich.
+
+        Args:
+            device: Gerätepfad, z.B. /dev/video0
+
+        Returns:
+            Schlüssel als String oder None, wenn das Gerät kein USB-Gerät ist
+        """
+        info = get_usb_device_info(device)
+        return info['key'] if info else None
+
+    def probe_webcam(self, device):
+        """
+        Prüft, ob ein Videogerät Bilder liefert, und nutzt dabei den Cache.
+
+        Funktionierende Kameras werden nicht erneut getestet, fehlgeschlagene
+        erst nach failure_retry_age Sekunden (z.B. war die Kamera beim ersten
+        Test noch von einem anderen Programm belegt). Geräte, die gerade
+        aufnehmen, werden nie getestet. Der Test kann einige Sekunden dauern
+        und wird deshalb ohne self.lock aufgerufen.
+
+        Args:
+            device: Gerätepfad
+
+        Returns:
+            Zustand des Geräts als Dictionary {'key', 'working'}
+        """
+        key = self.get_device_key(device)
+        cached = self.probe_cache.get(key) if key else None
+
+        if cached and (cached['working'] or time.time() - cached['probed'] < self.failure_retry_age):
+            working = cached['working']
+        elif self.is_device_active(device):
+            # Gerät nimmt gerade auf, also funktioniert es offensichtlich
+            working = True
+        else:
+            working = bool(probe_webcams([device]))
+            if key:
+                self.probe_cache[key] = {'working': working, 'probed': time.time()}
+                self._save_probe_cache()
+
+        return {'key': key, 'working': working}
+
+    def _webcam_list(self):
+        """Liste der Videogeräte, funktionierende Kameras zuerst."""
+        working = sorted(d for d, s in self.webcam_state.items() if s['working'])
+        others = sorted(d for d, s in self.webcam_state.items() if not s['working'])
+        return working + others
 
     def detect_webcams(self):
         """Erkennt angeschlossene Webcams."""
-        webcam_devices = []
-
         try:
             # Videoeingabegeräte finden
             video_devices = glob.glob('/dev/video*')
-            working_webcam = find_working_webcam(video_devices)
 
-            if working_webcam:
-                webcam_devices.append(working_webcam)
+            with self.lock:
+                for device in list(self.webcam_state):
+                    if device not in video_devices:
+                        del self.webcam_state[device]
+                new_devices = [device for device in video_devices if device not in self.webcam_state]
 
-            for device in video_devices:
-                if device != working_webcam and os.path.exists(device):
-                    webcam_devices.append(device)
+            # Neue Geräte ohne Lock testen
+            probed = {device: self.probe_webcam(device) for device in new_devices}
+
+            with self.lock:
+                self.webcam_state.update(probed)
         except Exception as e:
             logger.error(f"Fehler bei der Webcam-Erkennung: {e}")
 
-        return webcam_devices
+        with self.lock:
+            return self._webcam_list()
 
     def detect_gphoto2_cameras(self):
         """Erkennt Kameras, die mit gphoto2 kompatibel sind."""
@@ -107,27 +211,213 @@ class DeviceDetector:
 
     def scan_devices(self):
         """Scannt nach allen verfügbaren Geräten."""
+        # Die Erkennung läuft ohne Lock, damit get_devices() nicht wartet
+        webcams = self.detect_webcams()
+        gphoto2 = self.detect_gphoto2_cameras()
+        arduinos = self.detect_arduinos()
+
         with self.lock:
-            self.devices['cameras']['webcams'] = self.detect_webcams()
-            self.devices['cameras']['gphoto2'] = self.detect_gphoto2_cameras()
-            self.devices['arduinos'] = self.detect_arduinos()
+            self.devices['cameras']['webcams'] = webcams
+            self.devices['cameras']['gphoto2'] = gphoto2
+            self.devices['arduinos'] = arduinos
+
+        self._log_devices()
 
+    def _log_devices(self):
+        """Protokolliert die Anzahl der erkannten Geräte."""
         logger.info(f"Geräte erkannt: {len(self.devices['cameras']['webcams'])} Webcams, "
                     f"{len(self.devices['cameras']['gphoto2'])} gphoto2-Kameras, "
                     f"{len(self.devices['arduinos'])} Arduino-Geräte")
 
+    def handle_events(self, events):
+        """
+        Aktualisiert nur die von Kernel-Ereignissen betroffenen Gerätegruppen.
+
+        Args:
+            events: Liste von uevent-Dictionaries (ACTION, SUBSYSTEM, DEVNAME, ...)
+        """
+        webcams_changed = False
+        usb_changed = False
+        tty_changed = False
+        # Neu zu testende Videogeräte: Gerätepfad -> letzte Aktion
+        to_probe = {}
+
+        with self.lock:
+            for event in events:
+                subsystem = event.get('SUBSYSTEM')
+                action = event.get('ACTION')
+
+                if subsystem == 'video4linux' and event.get('DEVNAME'):
+                    device = os.path.join('/dev', event['DEVNAME'])
+                    # Der Knoten kann jetzt zu einer anderen Kamera gehören
+                    capability_store.invalidate(device)
+                    # Geändertes Gerät neu bewerten (der Cache verhindert erneute Tests)
+                    self.webcam_state.pop(device, None)
+                    if action == 'remove':
+                        to_probe.pop(device, None)
+                    elif action in ('add', 'change'):
+                        to_probe[device] = action
+                    webcams_changed = True
+                elif subsystem == 'tty':
+                    tty_changed = True
+                elif subsystem == 'usb' and event.get('DEVTYPE') == 'usb_device':
+                    usb_changed = True
+
+        # Tests und Erkennung ohne Lock, damit get_devices() nicht wartet
+        probed = {}
+        for device, action in to_probe.items():
+            probed[device] = self.probe_webcam(device)
+            if action == 'add':
+                device_reconnects.labels('camera', 'success' if probed[device]['working'] else 'failure').inc()
+        gphoto2 = self.detect_gphoto2_cameras() if usb_changed else None
+        arduinos = self.detect_arduinos() if tty_changed else None
+
+        with self.lock:
+            if webcams_changed:
+                self.webcam_state.update(probed)
+                self.devices['cameras']['webcams'] = self._webcam_list()
+            if usb_changed:
+                self.devices['cameras']['gphoto2'] = gphoto2
+            if tty_changed:
+                self.devices['arduinos'] = arduinos
+
+        if webcams_changed or usb_changed or tty_changed:
+            self._log_devices()
+
+    @staticmethod
+    def parse_uevent(data):
+        """
+        Zerlegt eine Kernel-uevent-Nachricht.
+
+        Args:
+            data: Rohdaten ("ACTION@DEVPATH\\0KEY=VALUE\\0...")
+
+        Returns:
+            Dictionary der Schlüssel/Wert-Paare oder None
+        """
+        parts = data.split(b'\0')
+        if not parts or b'@' not in parts[0]:
+            # Nachrichten von udev (libudev-Header) werden ignoriert
+            return None
+
+        event = {}
+        for part in parts[1:]:
+            if b'=' in part:
+                key, _, value = part.partition(b'=')
+                event[key.decode(errors='replace')] = value.decode(errors='replace')
+        return event
+
+    def _open_uevent_socket(self):
+        """Öffnet einen Netlink-Socket für Kernel-uevents oder gibt None zurück."""
+        try:
+            sock = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM, NETLINK_KOBJECT_UEVENT)
+            sock.bind((0, 1))
+            sock.settimeout(1.0)
+            return sock
+        except (AttributeError, OSError) as e:
+            logger.warning(f"Kernel-uevents nicht verfügbar, verwende Fallback: {e}")
+            return None
+
+    def _watch_uevents(self, sock):
+        """Verarbeitet Kernel-uevents, bis die Erkennung gestoppt wird."""
+        pending = []
+        deadline = None
+
+        while self.running:
+            try:
+                event = self.parse_uevent(sock.recv(16384))
+                if event and event.get('SUBSYSTEM') in self.WATCHED_SUBSYSTEMS:
+                    pending.append(event)
+                    if deadline is None:
+                        deadline = time.time() + self.debounce
+            except socket.timeout:
+                pass
+            except OSError as e:
+                logger.error(f"Fehler beim Lesen der Kernel-uevents: {e}")
+                time.sleep(1)
+
+            # Ereignisse gebündelt verarbeiten, sobald das Gerät vollständig angemeldet ist
+            if pending and time.time() >= deadline:
+                self.handle_events(pending)
+                pending = []
+                deadline = None
+
+    def _snapshot(self):
+        """Günstiger Zustand der Geräteknoten für den Fallback (ohne Kameratests)."""
+        video = {}
+        for device in glob.glob('/dev/video*'):
+            try:
+                stat = os.stat(device)
+                video[device] = (stat.st_rdev, stat.st_ctime_ns)
+            except OSError:
+                pass
+        ports = tuple(sorted(p.device for p in list_ports.comports()))
+        usb = tuple(sorted(glob.glob('/sys/bus/usb/devices/*')))
+        return video, ports, usb
+
+    def _watch_polling(self):
+        """Fallback: vergleicht Geräteknoten und testet nur neue oder geänderte Kameras."""
+        previous = self._snapshot()
+
+        while self.running:
+            time.sleep(self.scan_interval)
+            current = self._snapshot()
+
+            events = []
+            for device in set(previous[0]) | set(current[0]):
+                if device not in current[0]:
+                    action = 'remove'
+                elif device not in previous[0]:
+                    action = 'add'
+                elif previous[0][device] != current[0][device]:
+                    action = 'change'
+                else:
+                    continue
+                events.append({'ACTION': action, 'SUBSYSTEM': 'video4linux',
+                               'DEVNAME': os.path.basename(device)})
+            if previous[1] != current[1]:
+                events.append({'ACTION': 'change', 'SUBSYSTEM': 'tty'})
+            if previous[2] != current[2]:
+                events.append({'ACTION': 'change', 'SUBSYSTEM': 'usb', 'DEVTYPE': 'usb_device'})
+
+            if events:
+                self.handle_events(events)
+            previous = current
+
+    @contextmanager
+    def device_in_use(self, device):
+        """Markiert ein Gerät während einer Aufnahme als aktiv (wird nicht getestet)."""
+        with self.active_lock:
+            self.active_devices.add(device)
+        try:
+            yield
+        finally:
+            with self.active_lock:
+                self.active_devices.discard(device)
+
+    def is_device_active(self, device):
+        """Prüft, ob ein Gerät gerade für eine Aufnahme verwendet wird."""
+        with self.active_lock:
+            return device in self.active_devices
+
     def get_devices(self):
         """Gibt die aktuell erkannten Geräte zurück."""
         with self.lock:
             return self.devices.copy()
 
     def start_detection(self):
-        """Startet den Erkennungsprozess in einer Schleife."""
+        """Startet den Erkennungsprozess: einmaliger Scan, danach ereignisgesteuert."""
         self.running = True
+        self.scan_devices()
 
-        while self.running:
-            self.scan_devices()
-            time.sleep(self.scan_interval)
+        sock = self._open_uevent_socket()
+        if sock is not None:
+            try:
+                self._watch_uevents(sock)
+            finally:
+                sock.close()
+        else:
+            self._watch_polling()
 
     def stop_detection(self):
         """Stoppt den Erkennungsprozess."""
@@ -135,4 +425,4 @@ class DeviceDetector:
 
 
 # Globale Instanz für die Anwendung
-device_detector = DeviceDetector()
\ No newline at end of file
+device_detector = DeviceDetector()
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Hardware-Broker für die 360° Drehteller-Steuerung.
+Ein eigener Prozess besitzt exklusiv den seriellen Port und die Kameras und
+stellt sie über ein kleines RPC-Protokoll auf einem Unix-Socket bereit.
+Dadurch können mehrere Webprozesse laufen, ohne dass jeder den Arduino
+öffnet (und dabei zurücksetzt). Das gilt auch für die Rigs aus rig_manager:
+sie laufen im Broker, die Webprozesse steuern sie über RPC.
+
+Protokoll: Eine JSON-Zeile pro Anfrage ({"method": ..., "params": {...}}),
+eine JSON-Zeile pro Antwort ({"result": ...} oder {"error": ...}).
+Bei "subscribe" folgen fortlaufend Kopfzeilen {"event": "frame", "size": n}
+mit jeweils n Bytes JPEG-Daten. Alle Abonnenten mit gleicher Bildrate und
+Breite teilen sich eine Aufnahme (PreviewHub); jedes Bild wird also nur
+einmal gelesen und kodiert, egal wie viele Webprozesse es anfordern.
+"""
+
+import os
+import sys
+import json
+import socket
+import logging
+import threading
+
+from hardware_scheduler import HardwareError, HardwareBusyError
+from live_preview import PreviewHub
+from rig_manager import RigError, RigBusyError
+
+# Logger konfigurieren
+logger = logging.getLogger("drehteller360.hardware_broker")
+
+# Standardpfad des Sockets
+DEFAULT_SOCKET_PATH = 'cache/hardware.sock'
+
+
+class HardwareBroker:
+    """Stellt die Hardware über einen Unix-Socket bereit."""
+
+    # Über RPC erreichbare Methoden des Dienstes
+    METHODS = ('rotate', 'capture', 'step', 'status', 'devices', 'auto_tune')
+
+    # Über RPC erreichbare Methoden der Rigs (die Rigs laufen im Broker)
+    RIG_METHODS = ('rigs', 'rig_status', 'start_rig_session', 'stop_rig_session')
+
+    def __init__(self, service, socket_path=DEFAULT_SOCKET_PATH, rigs=None):
+        """
+        Initialisiert den Broker.
+
+        Args:
+            service: HardwareScheduler (bzw. HardwareService), der die Geräte besitzt
+            socket_path: Pfad des Unix-Sockets
+            rigs: RigRegistry, deren Rigs dieser Prozess betreibt (oder None)
+        """
+        self.service = service
+        self.rigs = rigs
+        self.socket_path = socket_path
+        self.server = None
+        self.running = False
+        # Gemeinsame Vorschau je (fps, max_width) für alle Webprozesse
+        self.preview_hubs = {}
+        self.preview_lock = threading.Lock()
+
+    def preview_hub(self, fps=10, max_width=640):
+        """Liefert den gemeinsamen PreviewHub für diese Bildrate und Breite."""
+        with self.preview_lock:
+            key = (fps, max_width)
+            hub = self.preview_hubs.get(key)
+            if hub is None:
+                hub = self.preview_hubs[key] = PreviewHub(self.service, fps=fps, max_width=max_width)
+            return hub
+
+    def serve_forever(self):
+        """Nimmt Verbindungen an, bis shutdown() aufgerufen wird."""
+        os.makedirs(os.path.dirname(self.socket_path) or '.', exist_ok=True)
+
+        # Verwaisten Socket eines abgestürzten Brokers entfernen, laufenden nicht übernehmen
+        if os.path.exists(self.socket_path):
+            if HardwareClient(self.socket_path).available():
+                raise RuntimeError(f"Hardware-Broker läuft bereits auf {self.socket_path}")
+            os.unlink(self.socket_path)
+
+        self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.server.bind(self.socket_path)
+        os.chmod(self.socket_path, 0o660)
+        self.server.listen(64)
+        self.running = True
+        logger.info(f"Hardware-Broker bereit auf {self.socket_path} (PID {os.getpid()})")
+
+        try:
+            while self.running:
+                try:
+                    conn, _ = self.server.accept()
+                except OSError:
+                    break
+                threading.Thread(target=self._handle_client, args=(conn,), daemon=True).start()
+        finally:
+            self.shutdown()
+
+    def shutdown(self):
+        """Beendet den Broker und entfernt den Socket."""
+        self.running = False
+        if self.server is not None:
+            try:
+                self.server.close()
+            except OSError:
+                pass
+            self.server = None
+            try:
+                os.unlink(self.socket_path)
+            except FileNotFoundError:
+                pass
+
+    @staticmethod
+    def _send(conn, message):
+        """Sendet eine JSON-Zeile."""
+        conn.sendall(json.dumps(message).encode('utf-8') + b'\n')
+
+    def _handle_client(self, conn):
+        """Bearbeitet die Anfragen einer Verbindung."""
+        try:
+            with conn, conn.makefile('rb') as reader:
+                for line in reader:
+                    try:
+                        request = json.loads(line)
+                        method = request.get('method')
+                        params = request.get('params') or {}
+                    except (ValueError, AttributeError):
+                        self._send(conn, {'error': "Ungültige Anfrage"})
+                        continue
+
+                    if method == 'subscribe':
+                        self._stream(conn, params)
+                        return
+
+                    if method in self.METHODS:
+                        handler = getattr(self.service, method)
+                    elif method in self.RIG_METHODS and self.rigs is not None:
+                        handler = getattr(self, f'_{method}')
+                    else:
+                        self._send(conn, {'error': f"Unbekannte Methode: {method}"})
+                        continue
+
+                    try:
+                        result = handler(**params)
+                        self._send(conn, {'result': result})
+                    except (HardwareBusyError, RigBusyError) as e:
+                        self._send(conn, {'error': str(e), 'busy': True, 'rig': isinstance(e, RigError)})
+                    except RigError as e:
+                        self._send(conn, {'error': str(e), 'rig': True})
+                    except Exception as e:
+                        logger.error(f"Fehler bei {method}: {e}")
+                        self._send(conn, {'error': str(e)})
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def _rig(self, rig_id):
+        rig = self.rigs.get(rig_id)
+        if rig is None:
+            raise RigError(f"Rig nicht gefunden: {rig_id}")
+        return rig
+
+    def _rigs(self):
+        return self.rigs.status()
+
+    def _rig_status(self, rig_id):
+        rig = self.rigs.get(rig_id)
+        return rig.status() if rig else None
+
+    def _start_rig_session(self, rig_id, **params):
+        return self._rig(rig_id).start_session(**params)
+
+    def _stop_rig_session(self, rig_id):
+        return self._rig(rig_id).stop()
+
+    def _stream(self, conn, params):
+        """Sendet Vorschaubilder, bis der Client die Verbindung schließt oder die Quelle hängt."""
+        frames = self.preview_hub(**params).frames()
+        try:
+            for frame in frames:
+                conn.sendall(json.dumps({'event': 'frame', 'size': len(frame)}).encode('utf-8') + b'\n' + frame)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            frames.close()
+
+
+class HardwareClient:
+    """Client für den Hardware-Broker mit derselben Schnittstelle wie HardwareService."""
+
+    def __init__(self, socket_path=DEFAULT_SOCKET_PATH, timeout=600):
+        """
+        Initialisiert den Client.
+
+        Args:
+            socket_path: Pfad des Broker-Sockets
+            timeout: Maximale Dauer eines Befehls in Sekunden
+        """
+        self.socket_path = socket_path
+        self.timeout = timeout
+
+    def _connect(self, timeout=None):
+        """Öffnet eine Verbindung (eine pro Aufruf, damit Threads sich nicht blockieren)."""
+        conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        conn.settimeout(self.timeout if timeout is None else timeout)
+        try:
+            conn.connect(self.socket_path)
+        except OSError:
+            conn.close()
+            raise
+        return conn
+
+    def available(self):
+        """Prüft, ob ein Broker erreichbar ist."""
+        try:
+            self._connect(timeout=1).close()
+            return True
+        except OSError:
+            return False
+
+    def call(self, method, **params):
+        """
+        Führt einen Befehl im Broker aus.
+
+        Raises:
+            HardwareError: Wenn der Broker nicht erreichbar ist oder der Befehl fehlschlägt
+            RigError: Wenn ein Rig-Befehl fehlschlägt (RigBusyError bei laufender Session)
+        """
+        try:
+            with self._connect() as conn, conn.makefile('rb') as reader:
+                conn.sendall(json.dumps({'method': method, 'params': params}).encode('utf-8') + b'\n')
+                line = reader.readline()
+        except OSError as e:
+            raise HardwareError(f"Hardware-Broker nicht erreichbar: {e}") from e
+
+        if not line:
+            raise HardwareError("Hardware-Broker hat die Verbindung geschlossen")
+
+        response = json.loads(line)
+        if response.get('rig'):
+            raise (RigBusyError if response.get('busy') else RigError)(response['error'])
+        if response.get('busy'):
+            raise HardwareBusyError(response['error'])
+        if 'error' in response:
+            raise HardwareError(response['error'])
+        return response.get('result')
+
+    def rotate(self, degrees, priority='interactive', request_id=None):
+        return self.call('rotate', degrees=degrees, priority=priority, request_id=request_id)
+
+    def capture(self, filename=None, simulator=None, priority='interactive', request_id=None):
+        return self.call('capture', filename=filename, simulator=simulator,
+                         priority=priority, request_id=request_id)
+
+    def step(self, degrees, filename=None, priority='interactive', request_id=None):
+        return self.call('step', degrees=degrees, filename=filename,
+                         priority=priority, request_id=request_id)
+
+    def status(self):
+        return self.call('status')
+
+    def devices(self):
+        return self.call('devices')
+
+    def auto_tune(self, priority='interactive', request_id=None):
+        return self.call('auto_tune', priority=priority, request_id=request_id)
+
+    def subscribe(self, fps=10, max_width=640):
+        """Liefert fortlaufend Vorschaubilder des Brokers (Generator mit JPEG-Bytes)."""
+        with self._connect(timeout=30) as conn, conn.makefile('rb') as reader:
+            conn.sendall(json.dumps({'method': 'subscribe',
+                                     'params': {'fps': fps, 'max_width': max_width}}).encode('utf-8') + b'\n')
+            while True:
+                header = reader.readline()
+                if not header:
+                    return
+                message = json.loads(header)
+                if 'error' in message:
+                    raise HardwareError(message['error'])
+                yield reader.read(message['size'])
+
+
+def run_broker(socket_path=None):
+    """Startet Geräteerkennung, Hardwaredienst und Broker in diesem Prozess."""
+    from config_manager import config_manager
+    from device_detector import device_detector
+    from startup_manager import startup_manager
+    from hardware_service import HardwareService
+    from hardware_scheduler import HardwareScheduler
+    from rig_manager import rig_registry
+
+    socket_path = socket_path or config_manager.get('hardware.socket_path', DEFAULT_SOCKET_PATH)
+
+    # Alle Befehle aller Webprozesse laufen durch eine Warteschlange
+    service = HardwareScheduler(HardwareService())
+    threading.Thread(target=device_detector.start_detection, daemon=True).start()
+    startup_manager.warm_up(['sample_images', 'webcam_simulator', 'arduino'])
+
+    # Die Rigs laufen ebenfalls hier, damit nur ein Prozess ihre Geräte öffnet
+    try:
+        HardwareBroker(service, socket_path, rigs=rig_registry).serve_forever()
+    finally:
+        rig_registry.shutdown()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    # Relative Pfade (static/, cache/) beziehen sich auf das Projektverzeichnis
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    try:
+        run_broker(sys.argv[1] if len(sys.argv) > 1 else None)
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Modul für die serielle Ausführung von Hardwarebefehlen.
+Ein einzelner Worker-Thread führt alle Befehle für Drehteller und Kamera
+nacheinander aus. Interaktive Befehle (manuelles Drehen) haben Vorrang vor
+Serienaufnahmen, doppelte Befehle werden zusammengefasst und volle
+Warteschlangen lehnen neue Befehle ab.
+"""
+
+import time
+import heapq
+import logging
+import threading
+from collections import OrderedDict
+
+from metrics import hardware_wait_seconds
+
+# Logger konfigurieren
+logger = logging.getLogger("drehteller360.hardware_scheduler")
+
+# Prioritäten (kleiner = früher)
+PRIORITIES = {
+    'interactive': 0,
+    'batch': 10
+}
+
+# Befehle ohne Nebenwirkung auf die Position dürfen auch ohne Anfrage-ID zusammengefasst werden
+IDEMPOTENT_METHODS = ('auto_tune', 'capture')
+
+# Befehle, die einen Fehler mit einem leeren Ergebnis (None/False) melden
+FALSY_FAILURE_METHODS = ('rotate', 'capture', 'step')
+
+
+class HardwareError(Exception):
+    """Fehler bei einem Hardwarebefehl (lokal oder über den Broker)."""
+
+
+class HardwareBusyError(HardwareError):
+    """Die Warteschlange für diese Priorität ist voll."""
+
+
+class HardwareCommand:
+    """Ein Befehl in der Warteschlange (wartet auf sein Ergebnis)."""
+
+    def __init__(self, method, params, priority, key):
+        self.method = method
+        self.params = params
+        self.priority = priority
+        self.key = key
+        self.submitted_at = time.monotonic()
+        self.started_at = None
+        self.finished_at = None
+        self.result = None
+        self.error = None
+        self.waiters = 1
+        self.done = threading.Event()
+
+    @property
+    def wait_time(self):
+        """Wartezeit in der Warteschlange in Sekunden"""
+        return (self.started_at or time.monotonic()) - self.submitted_at
+
+    def wait(self, timeout=None):
+        """Wartet auf das Ergebnis und gibt es zurück (oder wirft den Fehler des Befehls)."""
+        if not self.done.wait(timeout):
+            raise TimeoutError(f"Zeitüberschreitung bei {self.method}")
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class HardwareScheduler:
+    """Führt Hardwarebefehle priorisiert und nacheinander in einem Worker-Thread aus."""
+
+    def __init__(self, service, max_queue=None, dedupe_window=30):
+        """
+        Initialisiert den Scheduler.
+
+        Args:
+            service: HardwareService, der die Befehle ausführt
+            max_queue: Maximale Warteschlangenlänge je Priorität
+            dedupe_window: Sekunden, in denen abgeschlossene Befehle mit gleicher
+                Anfrage-ID nicht erneut ausgeführt werden
+        """
+        self.service = service
+        self.max_queue = max_queue or {'interactive': 8, 'batch': 64}
+        self.dedupe_window = dedupe_window
+
+        self.condition = threading.Condition()
+        self.queue = []
+        self.sequence = 0
+        self.pending = {}
+        self.recent = OrderedDict()
+        self.running = None
+
+        self.metrics = {
+            'submitted': 0,
+            'merged': 0,
+            'rejected': 0,
+            'completed': 0,
+            'failed': 0,
+            'wait_time_total': 0.0,
+            'wait_time_max': 0.0,
+            'run_time_total': 0.0
+        }
+
+        self.worker = threading.Thread(target=self._run, name='hardware-scheduler', daemon=True)
+        self.worker.start()
+
+    def _depth(self, priority):
+        """Anzahl wartender Befehle einer Priorität (Lock gehalten)."""
+        return sum(1 for entry in self.queue if entry[2].priority == priority)
+
+    def submit(self, method, params=None, priority='interactive', request_id=None):
+        """
+        Reiht einen Befehl ein.
+
+        Args:
+            method: Methode des HardwareService
+            params: Parameter als Dictionary
+            priority: 'interactive' oder 'batch'
+            request_id: Optionale Anfrage-ID; Wiederholungen werden zusammengefasst
+
+        Returns:
+            HardwareCommand (mit wait() auf das Ergebnis warten)
+
+        Raises:
+            HardwareBusyError: Wenn die Warteschlange voll ist
+        """
+        params = params or {}
+        if priority not in PRIORITIES:
+            priority = 'interactive'
+
+        if request_id:
+            key = ('request', request_id)
+        elif method in IDEMPOTENT_METHODS:
+            key = (method, tuple(sorted(params.items())))
+        else:
+            key = None
+
+        with self.condition:
+            self.metrics['submitted'] += 1
+
+            # Gleicher Befehl wartet oder läuft bereits: Ergebnis teilen
+            if key is not None:
+                self._expire_recent()
+                command = self.pending.get(key) or self.recent.get(key)
+                if command is not None:
+                    command.waiters += 1
+                    self.metrics['merged'] += 1
+                    return command
+
+            if self._depth(priority) >= self.max_queue.get(priority, 8):
+                self.metrics['rejected'] += 1
+                raise HardwareBusyError(f"Warteschlange '{priority}' ist voll")
+
+            command = HardwareCommand(method, params, priority, key)
+            self.sequence += 1
+            heapq.heappush(self.queue, (PRIORITIES[priority], self.sequence, command))
+            if key is not None:
+                self.pending[key] = command
+            self.condition.notify()
+            return command
+
+    def call(self, method, params=None, priority='interactive', request_id=None, timeout=None):
+        """Reiht einen Befehl ein und wartet auf sein Ergebnis."""
+        return self.submit(method, params, priority, request_id).wait(timeout)
+
+    def _expire_recent(self):
+        """Entfernt abgelaufene Einträge der Duplikaterkennung (Lock gehalten)."""
+        now = time.monotonic()
+        while self.recent:
+            key, command = next(iter(self.recent.items()))
+            if now - command.finished_at < self.dedupe_window:
+                break
+            self.recent.popitem(last=False)
+
+    def _run(self):
+        """Worker: führt die Befehle nacheinander aus."""
+        while True:
+            with self.condition:
+                while not self.queue:
+                    self.condition.wait()
+                _, _, command = heapq.heappop(self.queue)
+                command.started_at = time.monotonic()
+                self.running = command
+
+            hardware_wait_seconds.labels(command.priority).observe(command.wait_time)
+
+            try:
+                command.result = getattr(self.service, command.method)(**command.params)
+            except HardwareError as e:
+                logger.error(f"Fehler bei Hardwarebefehl {command.method}: {e}")
+                command.error = e
+            except Exception as e:
+                # Gerätefehler (z.B. SerialException) einheitlich als HardwareError melden
+                logger.error(f"Fehler bei Hardwarebefehl {command.method}: {e}")
+                command.error = HardwareError(f"{command.method}: {e}")
+                command.error.__cause__ = e
+
+            failed = command.error is not None or \
+                (command.method in FALSY_FAILURE_METHODS and not command.result)
+
+            with self.condition:
+                command.finished_at = time.monotonic()
+                self.running = None
+
+                wait_time = command.wait_time
+                self.metrics['failed' if failed else 'completed'] += 1
+                self.metrics['wait_time_total'] += wait_time
+                self.metrics['wait_time_max'] = max(self.metrics['wait_time_max'], wait_time)
+                self.metrics['run_time_total'] += command.finished_at - command.started_at
+
+                if command.key is not None:
+                    self.pending.pop(command.key, None)
+                    # Nur erfolgreiche Anfragen mit ID bleiben für Wiederholungen
+                    # erhalten; nach einem Fehler führt eine Wiederholung den
+                    # Befehl erneut aus
+                    if command.key[0] == 'request' and not failed:
+                        self.recent[command.key] = command
+
+            command.done.set()
+
+    def queue_status(self):
+        """Liefert Länge der Warteschlangen und Wartezeiten."""
+        with self.condition:
+            finished = self.metrics['completed'] + self.metrics['failed']
+            now = time.monotonic()
+            oldest = {}
+            for _, _, command in self.queue:
+                oldest[command.priority] = max(oldest.get(command.priority, 0.0), now - command.submitted_at)
+
+            return {
+                'depth': {priority: self._depth(priority) for priority in PRIORITIES},
+                'oldest_wait': oldest,
+                'running': self.running.method if self.running else None,
+                'submitted': self.metrics['submitted'],
+                'merged': self.metrics['merged'],
+                'rejected': self.metrics['rejected'],
+                'completed': self.metrics['completed'],
+                'failed': self.metrics['failed'],
+                'avg_wait_time': self.metrics['wait_time_total'] / finished if finished else 0.0,
+                'max_wait_time': self.metrics['wait_time_max'],
+                'avg_run_time': self.metrics['run_time_total'] / finished if finished else 0.0
+            }
+
+    # Schnittstelle wie HardwareService (Befehle laufen über die Warteschlange)
+
+    def rotate(self, degrees, priority='interactive', request_id=None):
+        return self.call('rotate', {'degrees': degrees}, priority, request_id)
+
+    def capture(self, filename=None, simulator=None, priority='interactive', request_id=None):
+        return self.call('capture', {'filename': filename, 'simulator': simulator}, priority, request_id)
+
+    def step(self, degrees, filename=None, priority='interactive', request_id=None):
+        return self.call('step', {'degrees': degrees, 'filename': filename}, priority, request_id)
+
+    def auto_tune(self, priority='interactive', request_id=None):
+        return self.call('auto_tune', {}, priority, request_id)
+
+    def status(self):
+        status = self.service.status()
+        status['queue'] = self.queue_status()
+        return status
+
+    def devices(self):
+        return self.service.devices()
+
+    def preview_frame(self, max_width=640, quality=80):
+        return self.service.preview_frame(max_width, quality)
+
+    def subscribe(self, fps=10, max_width=640):
+        return self.service.subscribe(fps, max_width)
@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Modul für den Zugriff auf die Hardware (Arduino-Drehteller und Kamera).
+Genau eine Instanz besitzt den seriellen Port und die Kamera: entweder direkt
+im Webprozess oder im Hardware-Broker (hardware_broker.py), an den sich
+beliebig viele Webprozesse verbinden.
+"""
+
+import os
+import time
+import serial
+import logging
+import threading
+import subprocess
+from contextlib import ExitStack
+
+import cv2
+
+from config_manager import config_manager
+from startup_manager import startup_manager
+from device_detector import device_detector
+from webcam_simulator import WebcamCaptureSimulator
+from sample_images_generator import SampleImagesGenerator
+from controllers.camera_controller import write_frame
+from metrics import rotation_seconds, capture_seconds, capture_phase_seconds
+
+# Logger konfigurieren
+logger = logging.getLogger("drehteller360.hardware_service")
+
+# Verzeichnis für aufgenommene Fotos
+PHOTO_DIR = 'static/photos'
+SAMPLE_IMAGE_DIR = 'static/sample_images'
+
+# Frames queued in the V4L2 buffers of an open camera (discarded before a photo)
+STALE_FRAMES = 4
+
+
+def ensure_sample_images():
+    """
+    Generate sample images for the simulator if the directory is sparse
+
+    :return: Number of available sample images
+    """
+    if not os.path.exists(SAMPLE_IMAGE_DIR) or len(os.listdir(SAMPLE_IMAGE_DIR)) < 5:
+        image_generator = SampleImagesGenerator()
+        image_generator.generate_sample_images(10)
+    return len(os.listdir(SAMPLE_IMAGE_DIR))
+
+
+def create_webcam_simulator():
+    """
+    Create the webcam capture simulator (probes the webcam devices)
+    """
+    # The simulator falls back to the sample images
+    startup_manager.get('sample_images')
+    return WebcamCaptureSimulator()
+
+
+def get_arduino_connection():
+    """
+    Establish Arduino connection based on configuration
+    """
+    try:
+        if config_manager.get('simulator.enabled', True):
+            return None
+
+        port = config_manager.get('arduino.port', '/dev/ttyACM0')
+        baudrate = config_manager.get('arduino.baudrate', 9600)
+
+        arduino = serial.Serial(port, baudrate, timeout=1)
+        time.sleep(2)  # Wait for initialization
+        return arduino
+    except Exception as e:
+        print(f"Arduino connection error: {e}")
+        return None
+
+
+class HardwareService:
+    """Besitzt Drehteller und Kamera; Befehle werden nacheinander ausgeführt."""
+
+    def __init__(self):
+        """Initialisiert den Dienst und registriert die langsamen Geräte beim Startup-Manager."""
+        self.lock = threading.RLock()
+
+        # Offene Kamera für die Live-Vorschau (wird auch für Fotos genutzt)
+        self.preview_capture = None
+        self.preview_stack = None
+        self.preview_subscribers = 0
+        self.sample_index = 0
+
+        self.counters = {'rotations': 0, 'captures': 0, 'preview_frames': 0}
+
+        startup_manager.register('sample_images', ensure_sample_images)
+        startup_manager.register('webcam_simulator', create_webcam_simulator)
+        startup_manager.register('arduino', get_arduino_connection)
+
+    @property
+    def use_simulator(self):
+        """Simulator statt echter Hardware verwenden"""
+        return config_manager.get('simulator.enabled', True)
+
+    def rotate(self, degrees):
+        """
+        Rotate the platform
+
+        :param degrees: Rotation angle
+        """
+        with self.lock:
+            self.counters['rotations'] += 1
+
+            if self.use_simulator:
+                print(f"Simulated rotation: {degrees} degrees")
+                return True
+
+            arduino = startup_manager.get('arduino')
+            if arduino is None:
+                print("Arduino not connected!")
+                return False
+
+            # Berechnung der Drehzeit basierend auf der Gradzahl (0,8 Grad pro Sekunde)
+            rotation_time = degrees / 0.8
+
+            # Relais einschalten (Drehteller starten)
+            with rotation_seconds.time():
+                arduino.write(b'1')  # '1' senden, um das Relais einzuschalten
+                time.sleep(rotation_time)  # Warte für die berechnete Zeit
+                arduino.write(b'0')  # '0' senden, um das Relais auszuschalten
+            print(f"Drehteller um {degrees} Grad gedreht.")
+            return True
+
+    def capture(self, filename=None, simulator=None):
+        """
+        Capture a photo
+
+        :param filename: Optional custom filename
+        :param simulator: Force (True) or skip (False) the simulator, default from configuration
+        :return: Path to the saved photo (static/photos/...) or None
+        """
+        if not filename:
+            filename = f'photo_{int(time.time())}.jpg'
+
+        # Ensure filename is just the basename
+        filename = os.path.basename(filename)
+
+        with self.lock:
+            self.counters['captures'] += 1
+
+            if self.use_simulator if simulator is None else simulator:
+                # Use the webcam simulator to generate a photo
+                with capture_seconds.labels('simulator').time():
+                    return startup_manager.get('webcam_simulator').capture_photo(filename)
+
+            try:
+                with capture_seconds.labels(config_manager.get('camera.type', 'webcam')).time():
+                    return self._capture_hardware(filename)
+            except Exception as e:
+                print(f"Fehler beim Aufnehmen des Fotos: {e}")
+                return None
+
+    def step(self, degrees, filename=None):
+        """
+        Rotate the platform and capture a photo as one command
+
+        :param degrees: Rotation angle
+        :param filename: Optional custom filename
+        :return: Path to the saved photo or None
+        """
+        with self.lock:
+            self.rotate(degrees)
+            return self.capture(filename)
+
+    def _capture_hardware(self, filename):
+        """Nimmt ein Foto mit der konfigurierten Kamera auf (Lock gehalten)."""
+        # Camera device path and resolution from configuration
+        camera_device = config_manager.get('camera.device_path', '/dev/video0')
+        camera_type = config_manager.get('camera.type', 'webcam')
+
+        # Get camera resolution
+        camera_width = config_manager.get('camera.resolution.width')
+        camera_height = config_manager.get('camera.resolution.height')
+
+        os.makedirs(PHOTO_DIR, exist_ok=True)
+        full_path = os.path.join(PHOTO_DIR, filename)
+
+        # Choose capture method based on camera type
+        if camera_type == 'gphoto2':
+            # Use gphoto2 for DSLR cameras
+            subprocess.call(['gphoto2', '--capture-image-and-download', '--filename', full_path])
+        elif self.preview_capture is not None:
+            # The camera is already open for the live preview. While the lock
+            # was held (e.g. during the rotation of step()) the preview stopped
+            # reading, so the driver buffers still hold frames from before or
+            # during the rotation: discard them before taking the photo.
+            with capture_phase_seconds.labels('grab').time():
+                for _ in range(STALE_FRAMES):
+                    if not self.preview_capture.grab():
+                        return None
+                ret, frame = self.preview_capture.read()
+            if not ret:
+                return None
+            write_frame(full_path, frame)
+        else:
+            # Keep the device detector from probing the camera during capture
+            with device_detector.device_in_use(camera_device):
+                with capture_phase_seconds.labels('open').time():
+                    cap = cv2.VideoCapture(camera_device)
+
+                    # Set resolution if specified
+                    if camera_width and camera_height:
+                        cap.set(cv2.CAP_PROP_FRAME_WIDTH, camera_width)
+                        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, camera_height)
+
+                with capture_phase_seconds.labels('grab').time():
+                    ret, frame = cap.read()
+                cap.release()
+                if ret:
+                    write_frame(full_path, frame)
+                else:
+                    # Fallback to fswebcam if OpenCV fails
+                    subprocess.call(['fswebcam', '--no-banner',
+                                     '-d', camera_device,
+                                     full_path])
+
+        print(f"Foto aufgenommen und als {filename} gespeichert.")
+        return full_path
+
+    def _grab_preview(self):
+        """Liest ein Vorschaubild (Lock gehalten)."""
+        if self.use_simulator:
+            # Beispielbilder der Reihe nach als Vorschau
+            startup_manager.get('sample_images')
+            samples = sorted(f for f in os.listdir(SAMPLE_IMAGE_DIR)
+                             if f.lower().endswith(('.png', '.jpg', '.jpeg')))
+            if not samples:
+                return None
+            self.sample_index = (self.sample_index + 1) % len(samples)
+            return cv2.imread(os.path.join(SAMPLE_IMAGE_DIR, samples[self.sample_index]))
+
+        if config_manager.get('camera.type', 'webcam') != 'webcam':
+            return None
+
+        if self.preview_capture is None:
+            camera_device = config_manager.get('camera.device_path', '/dev/video0')
+            self.preview_stack = ExitStack()
+            self.preview_stack.enter_context(device_detector.device_in_use(camera_device))
+            self.preview_capture = cv2.VideoCapture(camera_device)
+
+            # Volle Auflösung, damit Fotos direkt aus der Vorschau entstehen können
+            camera_width = config_manager.get('camera.resolution.width')
+            camera_height = config_manager.get('camera.resolution.height')
+            if camera_width and camera_height:
+                self.preview_capture.set(cv2.CAP_PROP_FRAME_WIDTH, camera_width)
+                self.preview_capture.set(cv2.CAP_PROP_FRAME_HEIGHT, camera_height)
+
+        ret, frame = self.preview_capture.read()
+        return frame if ret else None
+
+    def stop_preview(self):
+        """Schließt die Kamera der Live-Vorschau."""
+        with self.lock:
+            if self.preview_capture is not None:
+                self.preview_capture.release()
+                self.preview_capture = None
+            if self.preview_stack is not None:
+                self.preview_stack.close()
+                self.preview_stack = None
+
+    def preview_frame(self, max_width=640, quality=80):
+        """
+        Liefert ein aktuelles Vorschaubild als JPEG.
+
+        :param max_width: Maximale Bildbreite
+        :param quality: JPEG-Qualität
+        :return: JPEG-Bytes oder None
+        """
+        with self.lock:
+            try:
+                frame = self._grab_preview()
+            finally:
+                # Ohne Abonnenten die Kamera nicht offen halten
+                if self.preview_subscribers == 0:
+                    self.stop_preview()
+
+        if frame is None:
+            return None
+
+        if frame.shape[1] > max_width:
+            height = int(frame.shape[0] * max_width / frame.shape[1])
+            frame = cv2.resize(frame, (max_width, height), interpolation=cv2.INTER_AREA)
+
+        ret, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        if not ret:
+            return None
+
+        self.counters['preview_frames'] += 1
+        return buffer.tobytes()
+
+    def subscribe(self, fps=10, max_width=640):
+        """
+        Liefert fortlaufend Vorschaubilder (Generator mit JPEG-Bytes).
+
+        :param fps: Bildrate
+        :param max_width: Maximale Bildbreite
+        """
+        with self.lock:
+            self.preview_subscribers += 1
+        try:
+            interval = 1.0 / max(fps, 0.1)
+            while True:
+                start = time.monotonic()
+                frame = self.preview_frame(max_width)
+                if frame is not None:
+                    yield frame
+                time.sleep(max(0.0, interval - (time.monotonic() - start)))
+        finally:
+            with self.lock:
+                self.preview_subscribers -= 1
+                if self.preview_subscribers == 0:
+                    self.stop_preview()
+
+    def devices(self):
+        """Liefert die erkannten Geräte."""
+        return device_detector.get_devices()
+
+    def auto_tune(self):
+        """
+        Benchmark the capture modes of the configured webcam and store the fastest profile
+
+        :return: Profile dictionary or None
+        """
+        from controllers.camera_controller import CameraController
+
+        camera_device = config_manager.get('camera.device_path', '/dev/video0')
+        camera_width = config_manager.get('camera.resolution.width', 1280)
+        camera_height = config_manager.get('camera.resolution.height', 720)
+
+        with self.lock:
+            # Die Vorschau gibt die Kamera für die Messung frei
+            self.stop_preview()
+
+            controller = CameraController('webcam', camera_device, (camera_width, camera_height), auto_tune=False)
+
+            # Keep the device detector from probing the camera during the benchmark
+            with device_detector.device_in_use(camera_device):
+                return controller.tune_capture_mode()
+
+    def status(self):
+        """Liefert den Zustand der Hardware."""
+        arduino = startup_manager.services.get('arduino')
+        return {
+            'pid': os.getpid(),
+            'simulator': self.use_simulator,
+            'arduino_connected': bool(arduino and arduino.status == arduino.READY and arduino.instance is not None),
+            'camera_device': config_manager.get('camera.device_path', '/dev/video0'),
+            'camera_type': config_manager.get('camera.type', 'webcam'),
+            'preview_active': self.preview_capture is not None,
+            'preview_subscribers': self.preview_subscribers,
+            'counters': dict(self.counters)
+        }
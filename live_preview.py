@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Modul für die gemeinsame Live-Vorschau.
+Eine einzige Bildquelle (Kamera bzw. Hardware-Broker) liefert bereits
+verkleinerte JPEG-Bilder; der PreviewHub verteilt sie an beliebig viele
+Clients. Im Hardware-Broker verteilt ein PreviewHub die Bilder an alle
+Webprozesse, sodass die Kamera auch bei mehreren Workern nur einmal gelesen
+und kodiert wird. Jeder Client erhält immer nur das neueste Bild, langsame Clients
+überspringen Bilder und bremsen weder andere Clients noch die Aufnahme.
+"""
+
+import time
+import logging
+import threading
+
+# Logger konfigurieren
+logger = logging.getLogger("drehteller360.live_preview")
+
+
+class PreviewClient:
+    """Zustand eines Vorschau-Clients (zuletzt gesehenes Bild, Statistik)."""
+
+    def __init__(self, client_id):
+        self.id = client_id
+        self.last_sequence = 0
+        self.sent = 0
+        self.skipped = 0
+        self.connected_at = time.time()
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'sent': self.sent,
+            'skipped': self.skipped,
+            'connected_for': time.time() - self.connected_at
+        }
+
+
+class PreviewHub:
+    """Verteilt die Bilder einer Vorschauquelle an viele Clients."""
+
+    def __init__(self, source, fps=10, max_width=640, idle_timeout=5.0):
+        """
+        Initialisiert den Hub.
+
+        Args:
+            source: Objekt mit subscribe(fps, max_width) -> Generator mit JPEG-Bytes
+                (HardwareScheduler, HardwareService oder HardwareClient)
+            fps: Bildrate der Vorschau
+            max_width: Breite der Vorschaubilder (einmal in der Quelle verkleinert)
+            idle_timeout: Sekunden ohne Clients, nach denen die Kamera freigegeben wird
+        """
+        self.source = source
+        self.fps = fps
+        self.max_width = max_width
+        self.idle_timeout = idle_timeout
+
+        self.condition = threading.Condition()
+        self.frame = None
+        self.sequence = 0
+        self.frame_time = None
+        self.clients = {}
+        self.next_client_id = 0
+        self.idle_since = None
+        self.thread = None
+        self.error = None
+
+    def _ensure_running(self):
+        """Startet den Aufnahme-Thread, falls er nicht läuft (Lock gehalten)."""
+        if self.thread is None or not self.thread.is_alive():
+            self.thread = threading.Thread(target=self._capture_loop, name='live-preview', daemon=True)
+            self.thread.start()
+
+    def _capture_loop(self):
+        """Liest Bilder aus der Quelle, bis längere Zeit kein Client mehr verbunden ist."""
+        logger.info("Live-Vorschau gestartet")
+        frames = self.source.subscribe(fps=self.fps, max_width=self.max_width)
+        try:
+            for frame in frames:
+                with self.condition:
+                    # Neuestes Bild überschreibt das vorherige
+                    self.frame = frame
+                    self.sequence += 1
+                    self.frame_time = time.time()
+                    self.error = None
+                    self.condition.notify_all()
+
+                    if self.clients:
+                        self.idle_since = None
+                    elif self.idle_since is None:
+                        self.idle_since = time.monotonic()
+                    elif time.monotonic() - self.idle_since > self.idle_timeout:
+                        break
+        except Exception as e:
+            logger.error(f"Fehler in der Live-Vorschau: {e}")
+            with self.condition:
+                self.error = str(e)
+        finally:
+            frames.close()
+            with self.condition:
+                self.thread = None
+                self.frame = None
+                self.idle_since = None
+                # Client hat sich während des Beendens angemeldet
+                if self.clients and self.error is None:
+                    self._ensure_running()
+                self.condition.notify_all()
+            logger.info("Live-Vorschau beendet")
+
+    def connect(self):
+        """Meldet einen Client an und startet bei Bedarf die Aufnahme."""
+        with self.condition:
+            self.next_client_id += 1
+            client = PreviewClient(self.next_client_id)
+            self.clients[client.id] = client
+            self._ensure_running()
+            return client
+
+    def disconnect(self, client):
+        """Meldet einen Client ab."""
+        with self.condition:
+            self.clients.pop(client.id, None)
+
+    def next_frame(self, client, timeout=5.0):
+        """
+        Wartet auf ein Bild, das neuer ist als das zuletzt an den Client gesendete.
+
+        Returns:
+            JPEG-Bytes oder None bei Zeitüberschreitung
+        """
+        with self.condition:
+            self._ensure_running()
+            if not self.condition.wait_for(lambda: self.sequence != client.last_sequence and self.frame,
+                                           timeout):
+                return None
+
+            if client.last_sequence:
+                client.skipped += max(0, self.sequence - client.last_sequence - 1)
+            client.last_sequence = self.sequence
+            client.sent += 1
+            return self.frame
+
+    def frames(self, timeout=5.0, max_timeouts=3):
+        """
+        Generator mit den Bildern für einen Client (meldet sich selbst an und ab).
+
+        Liefert die Quelle max_timeouts Mal hintereinander kein Bild (z.B. weil
+        die Kamera hängt, ohne einen Fehler zu melden), endet der Stream, damit
+        der Client neu verbinden kann und die Verbindung nicht ewig offen bleibt.
+        """
+        client = self.connect()
+        timeouts = 0
+        try:
+            while True:
+                frame = self.next_frame(client, timeout)
+                if frame is None:
+                    with self.condition:
+                        if self.error:
+                            return
+                    timeouts += 1
+                    if timeouts >= max_timeouts:
+                        logger.warning(f"Live-Vorschau: seit {timeouts * timeout:.0f}s kein Bild, "
+                                       f"Client {client.id} wird getrennt")
+                        return
+                    continue
+                timeouts = 0
+                yield frame
+        finally:
+            self.disconnect(client)
+
+    def mjpeg(self, timeout=5.0, max_timeouts=3):
+        """Generator für eine multipart/x-mixed-replace-Antwort."""
+        for frame in self.frames(timeout, max_timeouts):
+            yield (b'--frame\r\nContent-Type: image/jpeg\r\nContent-Length: '
+                   + str(len(frame)).encode('ascii') + b'\r\n\r\n' + frame + b'\r\n')
+
+    def status(self):
+        """Liefert den Zustand der Vorschau."""
+        with self.condition:
+            return {
+                'running': self.thread is not None,
+                'fps': self.fps,
+                'max_width': self.max_width,
+                'frames': self.sequence,
+                'last_frame_age': time.time() - self.frame_time if self.frame_time else None,
+                'error': self.error,
+                'clients': [client.to_dict() for client in self.clients.values()]
+            }
@@ -7,7 +7,11 @@ Startet den Webserver und initialisiert alle benötigten Komponenten.
 
 import os
 import sys
+import time
+import atexit
 import logging
+import argparse
+import subprocess
 from threading import Thread
 
 # Stelle sicher, dass wir im richtigen Verzeichnis sind
@@ -32,8 +36,10 @@ os.makedirs('static/projects', exist_ok=True)
 
 # Importiere erst nach Verzeichnissetup
 from web import app
-from device_detector import DeviceDetector
+from device_detector import device_detector
 from config_manager import config_manager
+from startup_manager import startup_manager
+from hardware_broker import HardwareClient, DEFAULT_SOCKET_PATH
 
 
 def check_dependencies():
@@ -51,21 +57,129 @@ def check_dependencies():
         return False
 
 
+def start_hardware_broker(timeout=15):
+    """
+    Startet den Hardware-Broker als eigenen Prozess, falls er noch nicht läuft.
+
+    :return: True, wenn der Broker erreichbar ist
+    """
+    socket_path = config_manager.get('hardware.socket_path', DEFAULT_SOCKET_PATH)
+    client = HardwareClient(socket_path)
+    if client.available():
+        return True
+
+    broker = subprocess.Popen([sys.executable, os.path.join(script_dir, 'hardware_broker.py'), socket_path])
+    atexit.register(broker.terminate)
+
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if client.available():
+            logger.info(f"Hardware-Broker gestartet (PID {broker.pid})")
+            return True
+        if broker.poll() is not None:
+            break
+        time.sleep(0.2)
+
+    logger.error("Hardware-Broker konnte nicht gestartet werden")
+    return False
+
+
+def start_background_services():
+    """Startet Geräteerkennung und Dienst-Vorbereitung im aktuellen Prozess."""
+    # Mit Broker erkennt der Broker-Prozess die Geräte
+    if not config_manager.get('hardware.broker', False):
+        # Dieselbe Instanz wie /api/devices
+        detection_thread = Thread(target=device_detector.start_detection, daemon=True)
+        detection_thread.start()
+
+    # Langsame Dienste im Hintergrund vorbereiten
+    startup_manager.warm_up()
+
+
+def run_production_server(host, port, threads, workers=1):
+    """
+    Startet einen mehrfädigen WSGI-Server.
+
+    Ohne Hardware-Broker läuft genau ein Prozess, damit die Hardware (Arduino,
+    Kameras) nur einmal geöffnet wird; mit Broker sind mehrere Worker möglich.
+    Bevorzugt wird gunicorn (gthread-Worker, Dateien per sendfile), sonst
+    waitress, sonst der mehrfädige Werkzeug-Server.
+    """
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        BaseApplication = None
+
+    if BaseApplication is not None:
+        class GunicornServer(BaseApplication):
+            def load_config(self):
+                self.cfg.set('bind', f"{host}:{port}")
+                self.cfg.set('workers', workers)
+                self.cfg.set('worker_class', 'gthread')
+                self.cfg.set('threads', threads)
+                self.cfg.set('sendfile', True)
+                # Hintergrunddienste erst im Worker starten (Threads überleben kein fork)
+                self.cfg.set('post_worker_init', lambda worker: start_background_services())
+
+            def load(self):
+                return app
+
+        logger.info(f"Produktionsserver (gunicorn, {workers} Worker mit je {threads} Threads) auf {host}:{port}")
+        GunicornServer().run()
+        return
+
+    start_background_services()
+
+    try:
+        from waitress import serve
+    except ImportError:
+        serve = None
+
+    if serve is not None:
+        logger.info(f"Produktionsserver (waitress, {threads} Threads) auf {host}:{port}")
+        serve(app, host=host, port=port, threads=threads)
+        return
+
+    from werkzeug.serving import make_server
+    logger.warning("Weder gunicorn noch waitress installiert, verwende mehrfädigen Werkzeug-Server")
+    make_server(host, port, app, threaded=True).serve_forever()
+
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="360° Drehteller-Steuerung")
+    parser.add_argument('--production', action='store_true',
+                        help="Produktionsserver statt Flask-Entwicklungsserver starten")
+    args = parser.parse_args()
+
     logger.info("Starte 360° Drehteller-Steuerung...")
 
     if not check_dependencies():
         sys.exit(1)
 
-    # Initialisiere Gerätedetektor im Hintergrund
-    device_detector = DeviceDetector()
-    detection_thread = Thread(target=device_detector.start_detection, daemon=True)
-    detection_thread.start()
-
-    # Starte den Flask-Server
+    # Starte den Webserver
     host = config_manager.get('web.host', '0.0.0.0')
     port = config_manager.get('web.port', 5000)
     debug = config_manager.get('web.debug', True)
+    production = args.production or config_manager.get('web.mode') == 'production'
+
+    # Mit Broker besitzt ein eigener Prozess Arduino und Kameras
+    broker = config_manager.get('hardware.broker', False)
+
+    if production:
+        if broker and not start_hardware_broker():
+            sys.exit(1)
+
+        workers = config_manager.get('web.workers', 4) if broker else 1
+        startup_manager.mark('server_start')
+        run_production_server(host, port, config_manager.get('web.threads', 32), workers)
+        sys.exit(0)
+
+    # Langsame Dienste nicht im Reloader-Elternprozess starten
+    if not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        if broker and not start_hardware_broker():
+            sys.exit(1)
+        start_background_services()
 
+    startup_manager.mark('server_start')
     logger.info(f"Webserver wird gestartet auf {host}:{port}")
-    app.run(host=host, port=port, debug=debug)
\ No newline at end of file
+    app.run(host=host, port=port, debug=debug)
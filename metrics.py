@@ -0,0 +1,375 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Modul für Laufzeitmetriken (Zähler, Messwerte, Histogramme) im Textformat
+von Prometheus.
+Jeder Thread schreibt in eigene Zählerfelder, sodass Messungen im
+Aufnahme- und Anfragepfad ohne Lock auskommen; erst beim Abruf von /metrics
+werden die Felder aller Threads zusammengezählt. Die Werte gelten je
+Prozess (bei mehreren Webprozessen liefert jeder seine eigenen Werte).
+"""
+
+import math
+import time
+import bisect
+import weakref
+import threading
+from contextlib import contextmanager
+
+# Standard-Grenzen der Histogramme in Sekunden (von 1 ms bis 5 min)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _format_value(value):
+    """Zahl im Exposition-Format"""
+    if value == math.inf:
+        return '+Inf'
+    if value == -math.inf:
+        return '-Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def _escape(value):
+    """Maskiert einen Label-Wert"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _label_text(names, values, extra=None):
+    """Labels als {name="wert",...} (leer ohne Labels)"""
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+class _ThreadShard:
+    """Träger der Werte eines Threads (wird beim Ende des Threads freigegeben)"""
+
+    __slots__ = ('values', '__weakref__')
+
+    def __init__(self, values):
+        self.values = values
+
+
+class _Shards:
+    """Werte je Thread: Schreiben ohne Lock, Zusammenzählen beim Abruf
+
+    Endet ein Thread, gibt threading.local seinen Träger frei; die Werte
+    wandern dann sofort in eine Grundsumme. So sammeln kurzlebige
+    Anfrage-Threads keinen Speicher an, auch wenn /metrics nie abgerufen wird.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.shards = {}  # Kennung des Trägers -> Werte
+        self.retired = [0] * size
+
+    def values(self):
+        """Felder des aufrufenden Threads (beim ersten Zugriff angelegt)"""
+        try:
+            return self.local.shard.values
+        except AttributeError:
+            shard = _ThreadShard([0] * self.size)
+            key = id(shard)
+            with self.lock:
+                self.shards[key] = shard.values
+            weakref.finalize(shard, self._retire, key, shard.values)
+            self.local.shard = shard
+            return shard.values
+
+    def _retire(self, key, values):
+        """Übernimmt die Werte eines beendeten Threads in die Grundsumme"""
+        with self.lock:
+            self.shards.pop(key, None)
+            self.retired = [a + b for a, b in zip(self.retired, values)]
+
+    def total(self):
+        """Summe über alle Threads"""
+        with self.lock:
+            total = list(self.retired)
+            shards = list(self.shards.values())
+
+        for values in shards:
+            for i, value in enumerate(values):
+                total[i] += value
+        return total
+
+
+class _Metric:
+    """Gemeinsame Basis: Name, Beschreibung und Labels"""
+
+    TYPE = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.children = {}
+        self.lock = threading.Lock()
+        if not self.labelnames:
+            self.children[()] = self._create_child()
+
+    def _create_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values, **labels):
+        """Metrik für eine Label-Kombination (wird beim ersten Aufruf angelegt)"""
+        if labels:
+            values = tuple(labels[name] for name in self.labelnames)
+        key = tuple(str(value) for value in values)
+        child = self.children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} erwartet die Labels {self.labelnames}")
+            with self.lock:
+                child = self.children.setdefault(key, self._create_child())
+        return child
+
+    def _samples(self):
+        """Liefert (Suffix, Label-Werte, Zusatzlabel, Wert) aller Kombinationen"""
+        raise NotImplementedError
+
+    def expose(self):
+        """Textzeilen der Metrik"""
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.TYPE}']
+        for suffix, values, extra, value in self._samples():
+            lines.append(f'{self.name}{suffix}{_label_text(self.labelnames, values, extra)} '
+                         f'{_format_value(value)}')
+        return lines
+
+
+class _CounterChild:
+    def __init__(self):
+        self.shards = _Shards(1)
+
+    def inc(self, amount=1):
+        self.shards.values()[0] += amount
+
+    def value(self):
+        return self.shards.total()[0]
+
+
+class Counter(_Metric):
+    """Monoton steigender Zähler"""
+
+    TYPE = 'counter'
+
+    def _create_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        self.children[()].inc(amount)
+
+    def _samples(self):
+        for values, child in list(self.children.items()):
+            yield '', values, None, child.value()
+
+
+class _GaugeChild:
+    def __init__(self):
+        self.current = 0
+
+    def set(self, value):
+        self.current = value
+
+    def value(self):
+        return self.current
+
+
+class Gauge(_Metric):
+    """Momentaner Messwert, gesetzt oder beim Abruf aus einer Funktion gelesen"""
+
+    TYPE = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self.function = None
+
+    def _create_child(self):
+        return _GaugeChild()
+
+    def set(self, value):
+        self.children[()].set(value)
+
+    def set_function(self, function):
+        """Wert beim Abruf berechnen
+
+        function liefert eine Zahl oder (mit Labels) ein Dictionary
+        Label-Werte (Tupel) -> Zahl.
+        """
+        self.function = function
+
+    def _samples(self):
+        if self.function is None:
+            for values, child in list(self.children.items()):
+                yield '', values, None, child.value()
+            return
+
+        result = self.function()
+        if not isinstance(result, dict):
+            result = {(): result}
+        for values, value in result.items():
+            if value is not None:
+                yield '', tuple(values), None, value
+
+
+class _HistogramChild:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        # Je Bucket (nicht kumuliert) und +Inf, dann Summe und Anzahl
+        self.shards = _Shards(len(buckets) + 3)
+
+    def observe(self, value):
+        values = self.shards.values()
+        values[bisect.bisect_left(self.buckets, value)] += 1
+        values[-2] += value
+        values[-1] += 1
+
+    @contextmanager
+    def time(self):
+        """Misst die Dauer des with-Blocks"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def snapshot(self):
+        """(kumulierte Bucket-Zähler, Summe, Anzahl)"""
+        total = self.shards.total()
+        cumulative = []
+        running = 0
+        for count in total[:-2]:
+            running += count
+            cumulative.append(running)
+        return cumulative, total[-2], total[-1]
+
+
+class Histogram(_Metric):
+    """Verteilung von Messwerten (meist Dauern in Sekunden)"""
+
+    TYPE = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _create_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self.children[()].observe(value)
+
+    def time(self):
+        return self.children[()].time()
+
+    def _samples(self):
+        for values, child in list(self.children.items()):
+            cumulative, total, count = child.snapshot()
+            for bound, bucket_count in zip(self.buckets + (math.inf,), cumulative):
+                yield '_bucket', values, ('le', _format_value(float(bound))), bucket_count
+            yield '_sum', values, None, total
+            yield '_count', values, None, count
+
+
+class MetricsRegistry:
+    """Sammlung aller Metriken eines Prozesses"""
+
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def _register(self, cls, name, documentation, labelnames, **kwargs):
+        """Gibt die Metrik zurück und legt sie beim ersten Aufruf an"""
+        with self.lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = cls(name, documentation, labelnames, **kwargs)
+            elif not isinstance(metric, cls) or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"Metrik {name} ist bereits anders registriert")
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def exposition(self):
+        """Alle Metriken im Textformat von Prometheus"""
+        with self.lock:
+            metrics = list(self.metrics.values())
+
+        lines = []
+        for metric in metrics:
+            try:
+                lines.extend(metric.expose())
+            except Exception as e:
+                # Eine fehlerhafte Messfunktion soll den Abruf nicht verhindern
+                lines.append(f'# Fehler bei {metric.name}: {_escape(e)}')
+        return '\n'.join(lines) + '\n'
+
+
+# Globale Instanz für die Anwendung
+metrics = MetricsRegistry()
+
+# Hardware
+rotation_seconds = metrics.histogram(
+    'drehteller_rotation_seconds', 'Dauer einer Drehung des Drehtellers')
+settle_seconds = metrics.histogram(
+    'drehteller_settle_seconds', 'Wartezeit zur Stabilisierung nach einer Drehung')
+capture_seconds = metrics.histogram(
+    'drehteller_capture_seconds', 'Dauer einer Fotoaufnahme', ['camera_type'])
+capture_phase_seconds = metrics.histogram(
+    'drehteller_capture_phase_seconds', 'Dauer der Aufnahmephasen (open, grab, encode, write)', ['phase'])
+session_seconds = metrics.histogram(
+    'drehteller_session_seconds', 'Dauer einer Fotosession', ['result'],
+    buckets=(10, 30, 60, 120, 300, 600, 1200, 1800, 3600, 7200))
+device_reconnects = metrics.counter(
+    'drehteller_device_reconnects_total', 'Neu verbundene Geräte', ['device', 'result'])
+hardware_wait_seconds = metrics.histogram(
+    'drehteller_hardware_wait_seconds', 'Wartezeit von Hardwarebefehlen in der Warteschlange', ['priority'])
+hardware_queue_depth = metrics.gauge(
+    'drehteller_hardware_queue_depth', 'Wartende Hardwarebefehle', ['priority'])
+preview_clients = metrics.gauge(
+    'drehteller_preview_clients', 'Verbundene Clients der Live-Vorschau')
+
+# Bildverarbeitung
+processing_seconds = metrics.histogram(
+    'drehteller_processing_seconds', 'Dauer eines Verarbeitungsschritts für alle Bilder', ['stage'])
+processing_images = metrics.counter(
+    'drehteller_processing_images_total', 'Verarbeitete Bilder je Verarbeitungsschritt', ['stage'])
+
+# Web
+http_request_seconds = metrics.histogram(
+    'drehteller_http_request_seconds', 'Antwortzeit je Route (bis zum Beginn der Antwort)', ['route', 'method'])
+http_requests = metrics.counter(
+    'drehteller_http_requests_total', 'HTTP-Anfragen je Route und Status', ['route', 'method', 'status'])
+
+
+@contextmanager
+def processing_stage(stage, images):
+    """Misst einen Verarbeitungsschritt über mehrere Bilder"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_processing_stage(stage, time.perf_counter() - start, images)
+
+
+def record_processing_stage(stage, seconds, images):
+    """Verbucht einen (z.B. in einem Worker-Prozess gemessenen) Verarbeitungsschritt"""
+    processing_seconds.labels(stage).observe(seconds)
+    processing_images.labels(stage).inc(images)
@@ -0,0 +1,152 @@
+# Datei: models/frame_grid.py
+# Modul für das Bildraster einer Session (Azimut x Elevation)
+
+import bisect
+
+
+def parse_angle(value):
+    """Winkel als Zahl (ganzzahlige Winkel als int, sonst float)"""
+    angle = float(value)
+    return int(angle) if angle.is_integer() else angle
+
+
+def _azimuth_distance(a, b):
+    """Abstand zweier Azimutwinkel auf dem Kreis (0-180 Grad)"""
+    difference = abs(a - b) % 360
+    return min(difference, 360 - difference)
+
+
+class FrameGrid:
+    """Bilder einer Session, indiziert nach (Azimut, Elevation)
+
+    Gespeichert als sortierte Arrays: eine Liste der Elevationen und je
+    Elevation eine sortierte Liste der Azimutwinkel mit den zugehörigen
+    Bildpfaden. Suchen (exakt und nächstes Bild) laufen per Binärsuche in
+    O(log n), das Manifest bleibt auch bei tausenden Bildern kompakt.
+    """
+
+    MANIFEST_VERSION = 1
+
+    def __init__(self):
+        """Initialisiert ein leeres Raster"""
+        self.elevations = []
+        self.azimuths = []  # je Elevation sortierte Azimutwinkel
+        self.paths = []  # je Elevation die Pfade passend zu azimuths
+
+    def __len__(self):
+        return sum(len(row) for row in self.azimuths)
+
+    def _row(self, elevation, create=False):
+        """Index der Zeile einer Elevation (oder None)"""
+        index = bisect.bisect_left(self.elevations, elevation)
+        if index < len(self.elevations) and self.elevations[index] == elevation:
+            return index
+        if not create:
+            return None
+
+        self.elevations.insert(index, elevation)
+        self.azimuths.insert(index, [])
+        self.paths.insert(index, [])
+        return index
+
+    def add(self, azimuth, elevation, path):
+        """Fügt ein Bild hinzu (ersetzt ein vorhandenes an derselben Position)"""
+        azimuth = parse_angle(azimuth) % 360
+        row = self._row(parse_angle(elevation), create=True)
+
+        azimuths = self.azimuths[row]
+        index = bisect.bisect_left(azimuths, azimuth)
+        if index < len(azimuths) and azimuths[index] == azimuth:
+            self.paths[row][index] = path
+        else:
+            azimuths.insert(index, azimuth)
+            self.paths[row].insert(index, path)
+
+    def get(self, azimuth, elevation=0):
+        """Gibt den Pfad an genau dieser Position zurück (oder None)"""
+        row = self._row(parse_angle(elevation))
+        if row is None:
+            return None
+
+        azimuth = parse_angle(azimuth) % 360
+        azimuths = self.azimuths[row]
+        index = bisect.bisect_left(azimuths, azimuth)
+        if index < len(azimuths) and azimuths[index] == azimuth:
+            return self.paths[row][index]
+        return None
+
+    def nearest(self, azimuth, elevation=0):
+        """Gibt das nächstgelegene Bild als (Azimut, Elevation, Pfad) zurück (oder None)
+
+        Zuerst wird die nächste Elevation gewählt, dann darin der nächste
+        Azimut (über 0/360 Grad hinweg).
+        """
+        if not self.elevations:
+            return None
+
+        # Nächste Elevation
+        elevation = float(elevation)
+        index = bisect.bisect_left(self.elevations, elevation)
+        candidates = [i for i in (index - 1, index) if 0 <= i < len(self.elevations)]
+        row = min(candidates, key=lambda i: abs(self.elevations[i] - elevation))
+
+        # Nächster Azimut (Nachbarn der Einfügeposition, zyklisch)
+        azimuth = float(azimuth) % 360
+        azimuths = self.azimuths[row]
+        index = bisect.bisect_left(azimuths, azimuth)
+        candidates = {index % len(azimuths), (index - 1) % len(azimuths)}
+        best = min(candidates, key=lambda i: (_azimuth_distance(azimuths[i], azimuth), azimuths[i]))
+
+        return azimuths[best], self.elevations[row], self.paths[row][best]
+
+    def row(self, elevation=0):
+        """Alle Bilder einer Elevation als Liste von (Azimut, Pfad)"""
+        row = self._row(parse_angle(elevation))
+        if row is None:
+            return []
+        return list(zip(self.azimuths[row], self.paths[row]))
+
+    def map_paths(self, func):
+        """Gibt ein neues Raster mit umgerechneten Pfaden zurück"""
+        grid = FrameGrid()
+        grid.elevations = list(self.elevations)
+        grid.azimuths = [list(row) for row in self.azimuths]
+        grid.paths = [[func(path) for path in row] for row in self.paths]
+        return grid
+
+    def to_manifest(self):
+        """Konvertiert das Raster in ein JSON-taugliches Manifest (Zahlen bleiben Zahlen)"""
+        return {
+            'version': self.MANIFEST_VERSION,
+            'elevations': self.elevations,
+            'azimuths': self.azimuths,
+            'paths': self.paths
+        }
+
+    @classmethod
+    def from_manifest(cls, manifest):
+        """Erstellt ein Raster aus einem Manifest"""
+        grid = cls()
+        if not manifest:
+            return grid
+
+        rows = zip(manifest.get('elevations', []), manifest.get('azimuths', []), manifest.get('paths', []))
+        for elevation, azimuths, paths in sorted(rows, key=lambda row: row[0]):
+            if not azimuths:
+                continue
+            # Sortierung prüfen statt blind zu vertrauen (Manifest könnte von Hand bearbeitet sein)
+            pairs = sorted(zip((parse_angle(a) for a in azimuths), paths), key=lambda pair: pair[0])
+            grid.elevations.append(parse_angle(elevation))
+            grid.azimuths.append([azimuth for azimuth, _ in pairs])
+            grid.paths.append([path for _, path in pairs])
+        return grid
+
+    @classmethod
+    def from_images(cls, images, elevation=0):
+        """Erstellt ein Raster aus einer gleichmäßig verteilten Bildfolge (ein Umlauf)"""
+        grid = cls()
+        if images:
+            step = 360 / len(images)
+            for i, image in enumerate(images):
+                grid.add(round(i * step, 3), elevation, image)
+        return grid
@@ -7,6 +7,8 @@ import uuid
 import logging
 from pathlib import Path
 
+from .frame_grid import FrameGrid, parse_angle
+
 
 class PhotoSession:
     """Klasse zur Darstellung einer Fotosession"""
@@ -18,15 +20,50 @@ class PhotoSession:
         self.timestamp = timestamp or time.time()
         self.angle_step = angle_step
         self.photos = {}  # Dictionary mit Winkel als Schlüssel und Dateipfad als Wert
+        self.views = {}  # Bei mehreren Kameras: Kameraname -> {Winkel: Dateipfad}
+        self.capture_times = {}  # Gemeinsamer Auslösezeitpunkt je Winkel (Kameragruppe)
+        self.grid = FrameGrid()  # Alle Bilder nach (Azimut, Elevation)
         self.completed = False
 
-    def add_photo(self, angle, photo_path):
+    def add_photo(self, angle, photo_path, elevation=0):
         """Fügt ein Foto zur Session hinzu"""
         self.photos[angle] = photo_path
+        self.grid.add(angle, elevation, photo_path)
+
+    def add_view_photo(self, camera, angle, photo_path, elevation=None):
+        """Fügt das Foto einer Kamera aus einer Kameragruppe hinzu"""
+        self.views.setdefault(camera, {})[angle] = photo_path
+        if elevation is not None:
+            self.grid.add(angle, elevation, photo_path)
+
+    def add_step(self, angle, frames, timestamp=None):
+        """Fügt die Fotos eines Drehteller-Schritts hinzu
+
+        frames: Liste von (Kameraname oder None, Elevation, Pfad), Hauptkamera zuerst
+        """
+        camera, elevation, photo_path = frames[0]
+        self.add_photo(angle, photo_path, elevation)
 
-    def get_photo(self, angle):
+        # Kameragruppe: alle Ansichten und der gemeinsame Auslösezeitpunkt
+        if camera is not None:
+            for camera, elevation, photo_path in frames:
+                self.add_view_photo(camera, angle, photo_path, elevation)
+            if timestamp is not None:
+                self.capture_times[angle] = timestamp
+
+    def captured_angles(self):
+        """Winkel, für die bereits Fotos vorliegen"""
+        return set(self.photos)
+
+    def get_photo(self, angle, elevation=None):
         """Gibt den Pfad eines Fotos für einen bestimmten Winkel zurück"""
-        return self.photos.get(angle)
+        if elevation is None:
+            return self.photos.get(angle)
+        return self.grid.get(angle, elevation)
+
+    def nearest_photo(self, azimuth, elevation=0):
+        """Gibt das nächstgelegene Foto als (Azimut, Elevation, Pfad) zurück (O(log n))"""
+        return self.grid.nearest(azimuth, elevation)
 
     def get_all_photos(self):
         """Gibt alle Fotos der Session zurück"""
@@ -41,6 +78,9 @@ class PhotoSession:
             'timestamp': self.timestamp,
             'angle_step': self.angle_step,
             'photos': self.photos,
+            'views': self.views,
+            'capture_times': self.capture_times,
+            'grid': self.grid.to_manifest(),
             'completed': self.completed
         }
 
@@ -54,7 +94,19 @@ class PhotoSession:
             angle_step=data.get('angle_step', 5)
         )
 
-        session.photos = data.get('photos', {})
+        # JSON-Schlüssel sind Strings: Winkel wieder als Zahlen, damit die Sortierung stimmt
+        session.photos = {parse_angle(angle): photo_path for angle, photo_path in data.get('photos', {}).items()}
+        session.views = {camera: {parse_angle(angle): photo_path for angle, photo_path in photos.items()}
+                         for camera, photos in data.get('views', {}).items()}
+        session.capture_times = {parse_angle(angle): timestamp
+                                 for angle, timestamp in data.get('capture_times', {}).items()}
+
+        # Ältere Sessions ohne Raster: alle Fotos auf Elevation 0
+        if data.get('grid'):
+            session.grid = FrameGrid.from_manifest(data['grid'])
+        else:
+            for angle, photo_path in session.photos.items():
+                session.grid.add(angle, 0, photo_path)
         session.completed = data.get('completed', False)
 
         return session
\ No newline at end of file
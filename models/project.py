@@ -2,13 +2,13 @@
 # Modul für das Projektdatenmodell und die Projektverwaltung
 
 import os
-import json
 import time
 import uuid
 import logging
-import shutil
 from pathlib import Path
 
+from project_repository import ProjectRepository, ProjectMigrator
+
 
 class Project:
     """Klasse zur Darstellung eines Projekts"""
@@ -22,28 +22,27 @@ class Project:
         self.created_at = time.time()
         self.updated_at = self.created_at
         self.sessions = []
+        self.session_index = {}  # Session-ID -> Session
         self.path = path or ""
 
     def add_session(self, session):
         """Fügt eine Fotosession zum Projekt hinzu"""
         self.sessions.append(session)
+        self.session_index[session.id] = session
         self.updated_at = time.time()
 
     def get_session(self, session_id):
         """Gibt eine Session anhand ihrer ID zurück"""
-        for session in self.sessions:
-            if session.id == session_id:
-                return session
-        return None
+        return self.session_index.get(session_id)
 
     def remove_session(self, session_id):
         """Entfernt eine Session aus dem Projekt"""
-        for i, session in enumerate(self.sessions):
-            if session.id == session_id:
-                del self.sessions[i]
-                self.updated_at = time.time()
-                return True
-        return False
+        session = self.session_index.pop(session_id, None)
+        if session is None:
+            return False
+        self.sessions.remove(session)
+        self.updated_at = time.time()
+        return True
 
     def to_dict(self):
         """Konvertiert das Projekt in ein Dictionary"""
@@ -71,12 +70,75 @@ class Project:
             path=data.get('path', "")
         )
 
+        # Sessions laden
+        for session_data in data.get('sessions', []):
+            project.add_session(PhotoSession.from_dict(session_data))
+
         project.created_at = data.get('created_at', time.time())
         project.updated_at = data.get('updated_at', time.time())
 
-        # Sessions laden
-        for session_data in data.get('sessions', []):
-            project.sessions.append(PhotoSession.from_dict(session_data))
+        return project
+
+    def _relative(self, photo_path):
+        """Pfad eines Fotos relativ zum Projektverzeichnis"""
+        if self.path and os.path.isabs(photo_path) == os.path.isabs(self.path):
+            return os.path.relpath(photo_path, self.path)
+        return photo_path
+
+    def to_metadata(self):
+        """Konvertiert das Projekt in das Metadaten-Schema des Projekt-Repositorys"""
+        sessions = []
+        for session in self.sessions:
+            session_data = session.to_dict()
+            session_data['photos'] = {str(angle): self._relative(photo_path)
+                                      for angle, photo_path in session.photos.items()}
+            session_data['views'] = {camera: {str(angle): self._relative(photo_path)
+                                              for angle, photo_path in photos.items()}
+                                     for camera, photos in session.views.items()}
+            session_data['capture_times'] = {str(angle): timestamp
+                                             for angle, timestamp in session.capture_times.items()}
+            session_data['grid'] = session.grid.map_paths(self._relative).to_manifest()
+            sessions.append(session_data)
+
+        # Die Viewer-Bilder stammen aus der letzten Session
+        images = []
+        if self.sessions:
+            images = [self._relative(photo_path) for photo_path in self.sessions[-1].get_all_photos()]
+
+        return {
+            'name': self.name,
+            'description': self.description,
+            'angle_step': self.angle_step,
+            'created': self.created_at,
+            'updated': self.updated_at,
+            'sessions': sessions,
+            'images': images
+        }
+
+    @classmethod
+    def from_metadata(cls, metadata, path):
+        """Erstellt ein Projekt aus den Metadaten des Projekt-Repositorys"""
+        from .photo_session import PhotoSession
+
+        project = cls(
+            id=metadata.get('id'),
+            name=metadata.get('name', "Unbenanntes Projekt"),
+            description=metadata.get('description', ""),
+            angle_step=metadata.get('angle_step', 5),
+            path=path
+        )
+
+        for session_data in metadata.get('sessions', []):
+            session = PhotoSession.from_dict(session_data)
+            # Pfade wieder absolut
+            session.photos = {angle: os.path.join(path, photo_path) for angle, photo_path in session.photos.items()}
+            session.views = {camera: {angle: os.path.join(path, photo_path) for angle, photo_path in photos.items()}
+                             for camera, photos in session.views.items()}
+            session.grid = session.grid.map_paths(lambda photo_path: os.path.join(path, photo_path))
+            project.add_session(session)
+
+        project.created_at = metadata.get('created', time.time())
+        project.updated_at = metadata.get('updated', project.created_at)
 
         return project
 
@@ -86,10 +148,10 @@ class Project:
             return False
 
         try:
-            # Metadaten-Datei speichern
-            metadata_path = os.path.join(self.path, "project.json")
-            with open(metadata_path, 'w') as f:
-                json.dump(self.to_dict(), f, indent=4)
+            # Metadaten über das Projekt-Repository speichern
+            repository = ProjectRepository.for_directory(os.path.dirname(self.path))
+            metadata = repository.save(os.path.basename(self.path), self.to_metadata())
+            self.updated_at = metadata['updated']
 
             return True
         except Exception as e:
@@ -103,61 +165,43 @@ class ProjectManager:
     def __init__(self, projects_dir):
         """Initialisiert den Projektmanager"""
         self.logger = logging.getLogger(__name__)
-        self.projects_dir = projects_dir
+
+        # Es gibt nur eine Projektablage; Projekte aus projects_dir werden übernommen
+        self.repository = ProjectRepository.for_directory(projects_dir)
+        self.projects_dir = self.repository.projects_dir
 
         # Stellen Sie sicher, dass das Projektverzeichnis existiert
         os.makedirs(self.projects_dir, exist_ok=True)
 
+        # Projekte im alten Format (project.json) einmalig übernehmen
+        ProjectMigrator(self.repository).migrate_directory(self.projects_dir)
+
     def get_project_path(self, project_id):
         """Gibt den Pfad eines Projekts zurück"""
         return os.path.join(self.projects_dir, project_id)
 
     def get_all_projects(self):
         """Gibt eine Liste aller Projekte zurück"""
-        projects = []
-
         try:
-            # Durchsuche das Projektverzeichnis nach Projektordnern
-            for item in os.listdir(self.projects_dir):
-                project_path = os.path.join(self.projects_dir, item)
-
-                # Prüfen, ob es sich um ein Verzeichnis handelt
-                if os.path.isdir(project_path):
-                    # Prüfen, ob eine Projektdatei existiert
-                    project_file = os.path.join(project_path, "project.json")
-                    if os.path.isfile(project_file):
-                        try:
-                            with open(project_file, 'r') as f:
-                                project_data = json.load(f)
-                                project = Project.from_dict(project_data)
-                                # Sicherstellen, dass der Pfad korrekt ist
-                                project.path = project_path
-                                projects.append(project)
-                        except Exception as e:
-                            self.logger.error(f"Fehler beim Laden des Projekts {item}: {str(e)}")
+            # Zuletzt geänderte Projekte zuerst
+            _, projects = self.repository.list(sort='updated', order='desc')
+            return [Project.from_metadata(metadata, self.get_project_path(metadata['id']))
+                    for metadata in projects]
         except Exception as e:
-            self.logger.error(f"Fehler beim Durchsuchen des Projektverzeichnisses: {str(e)}")
-
-        # Sortiere Projekte nach Erstellungsdatum (neueste zuerst)
-        return sorted(projects, key=lambda p: p.updated_at, reverse=True)
+            self.logger.error(f"Fehler beim Laden der Projekte: {str(e)}")
+            return []
 
     def get_project(self, project_id):
         """Gibt ein Projekt anhand seiner ID zurück"""
-        project_path = self.get_project_path(project_id)
-        project_file = os.path.join(project_path, "project.json")
-
-        if os.path.isfile(project_file):
-            try:
-                with open(project_file, 'r') as f:
-                    project_data = json.load(f)
-                    project = Project.from_dict(project_data)
-                    # Sicherstellen, dass der Pfad korrekt ist
-                    project.path = project_path
-                    return project
-            except Exception as e:
-                self.logger.error(f"Fehler beim Laden des Projekts {project_id}: {str(e)}")
-
-        return None
+        metadata = self.repository.get(project_id)
+        if metadata is None:
+            return None
+
+        try:
+            return Project.from_metadata(metadata, self.get_project_path(project_id))
+        except Exception as e:
+            self.logger.error(f"Fehler beim Laden des Projekts {project_id}: {str(e)}")
+            return None
 
     def save_project(self, project):
         """Speichert ein Projekt"""
@@ -181,14 +225,9 @@ class ProjectManager:
 
     def delete_project(self, project_id):
         """Löscht ein Projekt"""
-        project_path = self.get_project_path(project_id)
-
-        if os.path.isdir(project_path):
-            try:
-                shutil.rmtree(project_path)
-                self.logger.info(f"Projekt {project_id} gelöscht")
-                return True
-            except Exception as e:
-                self.logger.error(f"Fehler beim Löschen des Projekts {project_id}: {str(e)}")
+        try:
+            return self.repository.delete(project_id)
+        except Exception as e:
+            self.logger.error(f"Fehler beim Löschen des Projekts {project_id}: {str(e)}")
 
-        return False
\ No newline at end of file
+        return False
@@ -0,0 +1,183 @@
+# Datei: models/session_journal.py
+# Modul für das absturzsichere Protokoll einer laufenden Fotosession
+
+import os
+import json
+import time
+import logging
+
+from .photo_session import PhotoSession
+
+
+class SessionJournal:
+    """Nur anhängendes Protokoll einer Fotosession (eine Zeile je Drehteller-Schritt
+    und je Drehung mit der neuen Position des Tellers)
+
+    Jede Zeile wird sofort mit fsync auf den Datenträger geschrieben. Nach
+    einem Absturz lässt sich die Session aus dem Protokoll wiederherstellen
+    und fortsetzen; erst am Ende wird sie in die Projekt-Metadaten übernommen.
+    Eine unvollständige letzte Zeile (Absturz während des Schreibens) wird
+    beim Einlesen verworfen.
+    """
+
+    FILENAME = 'journal.jsonl'
+    VERSION = 1
+
+    def __init__(self, session_dir):
+        """Initialisiert das Protokoll im Verzeichnis der Session"""
+        self.logger = logging.getLogger(__name__)
+        self.session_dir = session_dir
+        self.path = os.path.join(session_dir, self.FILENAME)
+        self.file = None
+
+    @classmethod
+    def for_session(cls, project_path, session_id):
+        """Protokoll einer Session eines Projekts"""
+        return cls(os.path.join(project_path, "sessions", session_id))
+
+    def exists(self):
+        """Prüft, ob bereits ein Protokoll vorhanden ist"""
+        return os.path.exists(self.path)
+
+    def _truncate_partial(self):
+        """Entfernt eine abgebrochene letzte Zeile, bevor weitergeschrieben wird"""
+        with open(self.path, 'rb+') as f:
+            data = f.read()
+            end = data.rfind(b'\n') + 1
+            if end < len(data):
+                self.logger.warning("Abgebrochene Zeile am Ende des Session-Protokolls entfernt: %s", self.path)
+                f.truncate(end)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _append(self, record):
+        """Hängt einen Eintrag an und schreibt ihn sofort auf den Datenträger"""
+        if self.file is None:
+            os.makedirs(self.session_dir, exist_ok=True)
+            created = not self.exists()
+            if not created:
+                self._truncate_partial()
+            self.file = open(self.path, 'a', encoding='utf-8')
+            if created:
+                # Auch der Verzeichniseintrag der neuen Datei muss den Absturz überstehen
+                dir_fd = os.open(self.session_dir, os.O_RDONLY)
+                try:
+                    os.fsync(dir_fd)
+                finally:
+                    os.close(dir_fd)
+
+        self.file.write(json.dumps(record, separators=(',', ':')) + '\n')
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def start(self, session):
+        """Schreibt den Kopfeintrag einer neuen Session"""
+        self._append({
+            'type': 'session',
+            'version': self.VERSION,
+            'id': session.id,
+            'name': session.name,
+            'timestamp': session.timestamp,
+            'angle_step': session.angle_step
+        })
+
+    def append_step(self, angle, frames, timestamp=None):
+        """Protokolliert die Fotos eines Schritts
+
+        frames: Liste von (Kameraname oder None, Elevation, Pfad), Hauptkamera zuerst
+        """
+        self._append({
+            'type': 'step',
+            'angle': angle,
+            't': timestamp or time.time(),
+            'frames': [{'camera': camera, 'elevation': elevation,
+                        'file': os.path.relpath(path, self.session_dir)}
+                       for camera, elevation, path in frames]
+        })
+
+    def append_position(self, position):
+        """Protokolliert die physische Position des Drehtellers nach einer Drehung"""
+        self._append({'type': 'position', 'position': position, 't': time.time()})
+
+    def last_position(self):
+        """Zuletzt bekannte Position des Drehtellers in Grad
+
+        Nach einer Aufnahme steht der Teller auf deren Winkel, nach einer
+        Drehung auf der protokollierten Position; ohne Einträge auf 0 Grad.
+        """
+        position = 0
+        for record in self.records():
+            if record.get('type') == 'position':
+                position = record['position']
+            elif record.get('type') == 'step':
+                position = record['angle']
+        return position
+
+    def complete(self):
+        """Markiert die Session als abgeschlossen und schließt das Protokoll"""
+        self._append({'type': 'complete', 't': time.time()})
+        self.close()
+
+    def close(self):
+        """Schließt die Protokolldatei"""
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def records(self):
+        """Liest alle vollständigen Einträge des Protokolls"""
+        records = []
+        if not self.exists():
+            return records
+
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.endswith('\n'):
+                    # Abgebrochener Schreibvorgang
+                    self.logger.warning("Unvollständige Zeile im Session-Protokoll verworfen: %s", self.path)
+                    break
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    self.logger.warning("Ungültige Zeile im Session-Protokoll verworfen: %s", self.path)
+                    break
+        return records
+
+    def replay(self):
+        """Stellt die Session aus dem Protokoll wieder her (oder None ohne Kopfeintrag)"""
+        records = self.records()
+        if not records or records[0].get('type') != 'session':
+            return None
+
+        header = records[0]
+        session = PhotoSession(id=header['id'], name=header.get('name', "Neue Session"),
+                               timestamp=header.get('timestamp'), angle_step=header.get('angle_step', 5))
+
+        for record in records[1:]:
+            if record.get('type') == 'step':
+                frames = [(frame.get('camera'), frame.get('elevation', 0),
+                           os.path.join(self.session_dir, frame['file']))
+                          for frame in record.get('frames', [])]
+                session.add_step(record['angle'], frames, record.get('t'))
+            elif record.get('type') == 'complete':
+                session.completed = True
+
+        return session
+
+    @classmethod
+    def find_incomplete(cls, project_path):
+        """IDs der Sessions eines Projekts mit Protokoll, aber ohne Abschluss (neueste zuletzt)"""
+        sessions_dir = os.path.join(project_path, "sessions")
+        if not os.path.isdir(sessions_dir):
+            return []
+
+        incomplete = []
+        for session_id in os.listdir(sessions_dir):
+            journal = cls(os.path.join(sessions_dir, session_id))
+            if not journal.exists():
+                continue
+            records = journal.records()
+            if records and records[0].get('type') == 'session' and records[-1].get('type') != 'complete':
+                incomplete.append((os.path.getmtime(journal.path), session_id))
+
+        return [session_id for _, session_id in sorted(incomplete)]
@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Modul für die Profilierung auf Abruf.
+Ein Administrator schaltet die Profilierung für die nächsten N Anfragen oder
+die nächste Fotosession ein. Aufgezeichnet wird mit cProfile (Ergebnis als
+pstats-Datei) oder mit einem Sampling-Profiler (Ergebnis als "collapsed
+stacks" für Flamegraph-Werkzeuge), auf Wunsch zusätzlich ein
+tracemalloc-Schnappschuss des Speichers. Solange nichts angefordert ist,
+kostet die Profilierung je Anfrage nur einen Attributvergleich.
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import shutil
+import cProfile
+import logging
+import threading
+import tracemalloc
+from collections import Counter
+
+from config_manager import config_manager
+
+# Logger konfigurieren
+logger = logging.getLogger("drehteller360.profiler")
+
+MODES = ('cprofile', 'sampling')
+TARGETS = ('requests', 'session')
+
+# Downloadbare Dateien einer Aufzeichnung
+ARTIFACTS = {
+    'profile.pstats': 'application/octet-stream',
+    'stacks.txt': 'text/plain',
+    'memory.snapshot': 'application/octet-stream',
+    'memory.txt': 'text/plain'
+}
+
+
+class _StackSampler:
+    """Liest in festen Abständen den Aufrufstapel eines Threads"""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, name='profiler-sampler', daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+    def collapsed(self):
+        """Stapel im Format "äußere;...;innere Funktion Anzahl" (eine Zeile je Stapel)"""
+        return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class ProfileCapture:
+    """Eine laufende Aufzeichnung (im profilierten Thread gestartet und beendet)"""
+
+    def __init__(self, service, target, label, mode, memory, sample_interval):
+        self.service = service
+        self.id = time.strftime('%Y%m%d_%H%M%S_') + uuid.uuid4().hex[:6]
+        self.target = target
+        self.label = label
+        self.mode = mode
+        self.memory = memory
+        self.started = time.time()
+        self.start_time = time.perf_counter()
+
+        self.profile = None
+        self.sampler = None
+        self.started_tracemalloc = False
+
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started_tracemalloc = True
+
+        if mode == 'cprofile':
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+        else:
+            self.sampler = _StackSampler(threading.get_ident(), sample_interval)
+            self.sampler.start()
+
+    def stop(self, status=None):
+        """Beendet die Aufzeichnung und speichert die Ergebnisse"""
+        duration = time.perf_counter() - self.start_time
+        snapshot = None
+        try:
+            if self.profile is not None:
+                self.profile.disable()
+            if self.sampler is not None:
+                self.sampler.stop()
+            if self.memory:
+                snapshot = tracemalloc.take_snapshot()
+        finally:
+            if self.started_tracemalloc:
+                tracemalloc.stop()
+            self.service._finished(self)
+
+        directory = self.service.capture_dir(self.id)
+        os.makedirs(directory, exist_ok=True)
+        if self.profile is not None:
+            self.profile.dump_stats(os.path.join(directory, 'profile.pstats'))
+        if self.sampler is not None:
+            with open(os.path.join(directory, 'stacks.txt'), 'w', encoding='utf-8') as f:
+                f.write(self.sampler.collapsed())
+        if snapshot is not None:
+            snapshot.dump(os.path.join(directory, 'memory.snapshot'))
+            with open(os.path.join(directory, 'memory.txt'), 'w', encoding='utf-8') as f:
+                for stat in snapshot.statistics('lineno')[:50]:
+                    f.write(f"{stat}\n")
+
+        info = {
+            'id': self.id,
+            'target': self.target,
+            'label': self.label,
+            'mode': self.mode,
+            'memory': self.memory,
+            'started': self.started,
+            'duration': duration,
+            'status': status,
+            'artifacts': sorted(name for name in ARTIFACTS if os.path.exists(os.path.join(directory, name)))
+        }
+        with open(os.path.join(directory, 'capture.json'), 'w', encoding='utf-8') as f:
+            json.dump(info, f)
+        self.service._prune()
+        logger.info(f"Profil aufgezeichnet: {self.label} ({duration:.3f} s) -> {directory}")
+        return info
+
+
+class ProfilingService:
+    """Verwaltet Profilierungsaufträge und gespeicherte Aufzeichnungen
+
+    Es läuft höchstens eine Aufzeichnung gleichzeitig (cProfile und
+    tracemalloc sind prozessweit); Anfragen, die währenddessen eintreffen,
+    werden nicht profiliert und zählen nicht zu den angeforderten N.
+    """
+
+    def __init__(self, directory=None, keep=None, sample_interval=None):
+        """
+        Initialisiert den Dienst.
+
+        Args:
+            directory: Ablage der Aufzeichnungen (Standard: profiling.directory)
+            keep: Anzahl aufbewahrter Aufzeichnungen (Standard: profiling.keep)
+            sample_interval: Abtastintervall des Sampling-Profilers in Sekunden
+        """
+        self.directory = directory or config_manager.get('profiling.directory', 'cache/profiles')
+        self.keep = keep or config_manager.get('profiling.keep', 20)
+        self.sample_interval = sample_interval or config_manager.get('profiling.sample_interval', 0.005)
+        self.lock = threading.Lock()
+
+        # Ungeschützt gelesen, damit der Normalfall nichts kostet
+        self.requests_remaining = 0
+        self.sessions_remaining = 0
+
+        self.options = {}
+        self.active = None
+
+    def arm(self, target='requests', count=1, mode='cprofile', memory=False, route=None):
+        """
+        Schaltet die Profilierung ein.
+
+        Args:
+            target: 'requests' (die nächsten count Anfragen) oder 'session' (die nächsten count Sessions)
+            count: Anzahl zu profilierender Anfragen oder Sessions
+            mode: 'cprofile' oder 'sampling'
+            memory: Zusätzlich einen tracemalloc-Schnappschuss aufnehmen
+            route: Nur Anfragen, deren Pfad mit diesem Präfix beginnt (z.B. '/generate_360')
+
+        Raises:
+            ValueError: Bei ungültigen Parametern
+        """
+        if target not in TARGETS:
+            raise ValueError(f"Unbekanntes Ziel: {target}")
+        if mode not in MODES:
+            raise ValueError(f"Unbekannter Modus: {mode}")
+        count = int(count)
+        if count < 1:
+            raise ValueError("Anzahl muss mindestens 1 sein")
+
+        with self.lock:
+            self.options = {'target': target, 'mode': mode, 'memory': bool(memory), 'route': route}
+            if target == 'requests':
+                self.requests_remaining = count
+                self.sessions_remaining = 0
+            else:
+                self.sessions_remaining = count
+                self.requests_remaining = 0
+        logger.info(f"Profilierung eingeschaltet: {count} x {target} ({mode})")
+        return self.status()
+
+    def disarm(self):
+        """Schaltet die Profilierung aus (eine laufende Aufzeichnung wird noch beendet)"""
+        with self.lock:
+            self.requests_remaining = 0
+            self.sessions_remaining = 0
+        return self.status()
+
+    def _start(self, target, label, path=None):
+        """Beginnt eine Aufzeichnung, wenn eine angefordert ist und keine läuft"""
+        with self.lock:
+            remaining = self.requests_remaining if target == 'requests' else self.sessions_remaining
+            if remaining <= 0 or self.active is not None:
+                return None
+            route = self.options.get('route')
+            if route and path is not None and not path.startswith(route):
+                return None
+
+            if target == 'requests':
+                self.requests_remaining -= 1
+            else:
+                self.sessions_remaining -= 1
+            self.active = label
+            options = dict(self.options)
+
+        try:
+            return ProfileCapture(self, target, label, options['mode'], options['memory'], self.sample_interval)
+        except Exception as e:
+            logger.error(f"Profilierung konnte nicht gestartet werden: {e}")
+            with self.lock:
+                self.active = None
+            return None
+
+    def start_request(self, method, path):
+        """Aufzeichnung für eine Anfrage (oder None)"""
+        if self.requests_remaining <= 0:
+            return None
+        return self._start('requests', f"{method} {path}", path)
+
+    def start_session(self, label):
+        """Aufzeichnung für eine Fotosession (oder None)"""
+        if self.sessions_remaining <= 0:
+            return None
+        return self._start('session', label)
+
+    def _finished(self, capture):
+        with self.lock:
+            self.active = None
+
+    def capture_dir(self, capture_id):
+        return os.path.join(self.directory, capture_id)
+
+    def captures(self):
+        """Gespeicherte Aufzeichnungen (neueste zuerst)"""
+        captures = []
+        if not os.path.isdir(self.directory):
+            return captures
+        for capture_id in sorted(os.listdir(self.directory), reverse=True):
+            try:
+                with open(os.path.join(self.capture_dir(capture_id), 'capture.json'), encoding='utf-8') as f:
+                    captures.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return captures
+
+    def artifact_path(self, capture_id, name):
+        """Pfad einer Ergebnisdatei (oder None)"""
+        if name not in ARTIFACTS or os.path.basename(capture_id) != capture_id or capture_id.startswith('.'):
+            return None
+        path = os.path.join(self.capture_dir(capture_id), name)
+        return path if os.path.isfile(path) else None
+
+    def _prune(self):
+        """Löscht die ältesten Aufzeichnungen über der Aufbewahrungsgrenze"""
+        if not os.path.isdir(self.directory):
+            return
+        for capture_id in sorted(os.listdir(self.directory))[:-self.keep]:
+            shutil.rmtree(self.capture_dir(capture_id), ignore_errors=True)
+
+    def status(self):
+        """Liefert den aktuellen Auftrag"""
+        with self.lock:
+            return {
+                'requests_remaining': self.requests_remaining,
+                'sessions_remaining': self.sessions_remaining,
+                'options': dict(self.options),
+                'active': self.active
+            }
+
+
+# Globale Instanz für die Anwendung
+profiling = ProfilingService()
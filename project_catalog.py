@@ -0,0 +1,499 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Modul für den indizierten Projektkatalog.
+Hält die Metadaten aller Projekte im Arbeitsspeicher, speichert sie in SQLite
+und aktualisiert sie schrittweise, statt bei jeder Anfrage alle
+metadata.json-Dateien einzulesen.
+"""
+
+import os
+import json
+import time
+import hashlib
+import base64
+import errno
+import ctypes
+import ctypes.util
+import struct
+import sqlite3
+import logging
+import threading
+
+# Logger konfigurieren
+logger = logging.getLogger("drehteller360.project_catalog")
+
+# inotify-Konstanten (linux/inotify.h)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_ISDIR = 0x40000000
+IN_IGNORED = 0x00008000
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+
+class InotifyWatcher:
+    """Minimaler inotify-Wrapper (ohne zusätzliche Abhängigkeiten)."""
+
+    EVENT_HEADER = struct.Struct('iIII')
+
+    def __init__(self):
+        """Initialisiert inotify, löst OSError aus, wenn es nicht verfügbar ist."""
+        libc_name = ctypes.util.find_library('c')
+        if not libc_name:
+            raise OSError(errno.ENOSYS, "libc nicht gefunden")
+
+        self.libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(self.libc, 'inotify_init1'):
+            raise OSError(errno.ENOSYS, "inotify nicht verfügbar")
+
+        self.fd = self.libc.inotify_init1(os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 fehlgeschlagen")
+
+        # Watch-Deskriptor -> Verzeichnis
+        self.watches = {}
+
+    def add_watch(self, path, mask):
+        """Überwacht ein Verzeichnis."""
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch fehlgeschlagen: {path}")
+        self.watches[wd] = path
+        return wd
+
+    def read_events(self):
+        """Liest Ereignisse (blockierend) als Liste von (Verzeichnis, Maske, Name)."""
+        data = os.read(self.fd, 65536)
+        events = []
+        offset = 0
+        while offset + self.EVENT_HEADER.size <= len(data):
+            wd, mask, _, length = self.EVENT_HEADER.unpack_from(data, offset)
+            offset += self.EVENT_HEADER.size
+            name = data[offset:offset + length].split(b'\0', 1)[0].decode(errors='replace')
+            offset += length
+
+            if mask & IN_IGNORED:
+                self.watches.pop(wd, None)
+                continue
+            events.append((self.watches.get(wd), mask, name))
+        return events
+
+    def close(self):
+        """Schließt den inotify-Deskriptor."""
+        os.close(self.fd)
+
+
+class ProjectCatalog:
+    """Indizierter Katalog der Projekte in static/projects."""
+
+    # Sortierbare Felder
+    SORT_FIELDS = ('created', 'updated', 'name', 'image_count')
+
+    def __init__(self, projects_dir='static/projects', db_path='cache/project_catalog.sqlite3'):
+        """
+        Initialisiert den Katalog.
+
+        Args:
+            projects_dir: Verzeichnis mit den Projektordnern
+            db_path: SQLite-Datenbank für die dauerhafte Ablage
+        """
+        self.projects_dir = projects_dir
+        self.db_path = db_path
+        self.lock = threading.RLock()
+
+        # Projekt-ID -> Metadaten (wie von /api/projects geliefert)
+        self.projects = {}
+        # Projekt-ID -> Änderungszeit der Quelle (Erkennung externer Änderungen)
+        self.mtimes = {}
+        # Wird bei jeder Änderung erhöht (verwirft die sortierten Listen)
+        self.version = 0
+        # XOR der Hashes aller (Projekt-ID, Änderungszeit): in jedem Prozess
+        # gleich, solange er denselben Stand der Projekte kennt (für ETags)
+        self.digest = 0
+        self.loaded = False
+        self.sorted_cache = {}
+
+        self.db = None
+        self.watcher = None
+        self.watch_thread = None
+
+    def _connect(self):
+        """Öffnet die SQLite-Datenbank und legt die Tabelle an."""
+        if self.db is None:
+            os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+            self.db = sqlite3.connect(self.db_path, check_same_thread=False)
+            self.db.execute('''
+                CREATE TABLE IF NOT EXISTS projects (
+                    id TEXT PRIMARY KEY,
+                    mtime_ns INTEGER NOT NULL,
+                    data TEXT NOT NULL
+                )
+            ''')
+            self.db.commit()
+        return self.db
+
+    def _source_mtime(self, project_id):
+        """Änderungszeit der Metadaten (oder des Ordners, falls keine existieren)."""
+        project_path = os.path.join(self.projects_dir, project_id)
+        try:
+            return os.stat(os.path.join(project_path, 'metadata.json')).st_mtime_ns
+        except FileNotFoundError:
+            return os.stat(project_path).st_mtime_ns
+
+    def _read_project(self, project_id):
+        """Liest die Metadaten eines Projekts von der Festplatte."""
+        project_path = os.path.join(self.projects_dir, project_id)
+        metadata_path = os.path.join(project_path, 'metadata.json')
+
+        if os.path.exists(metadata_path):
+            with open(metadata_path, 'r') as f:
+                metadata = json.load(f)
+        else:
+            # Fallback, wenn keine Metadaten existieren
+            images = sorted(f for f in os.listdir(project_path) if f.lower().endswith(IMAGE_EXTENSIONS))
+            metadata = {
+                'name': f"Projekt {project_id}",
+                'created': os.path.getctime(project_path),
+                'images': images,
+                'image_count': len(images)
+            }
+
+        # Projekt-ID hinzufügen
+        metadata['id'] = project_id
+        return metadata
+
+    @staticmethod
+    def _entry_hash(project_id, mtime_ns):
+        digest = hashlib.blake2b(f"{project_id}:{mtime_ns}".encode('utf-8'), digest_size=8).digest()
+        return int.from_bytes(digest, 'big')
+
+    def _set_mtime(self, project_id, mtime_ns):
+        """Setzt (oder entfernt bei None) die Änderungszeit und führt den Digest nach (Lock gehalten)."""
+        previous = self.mtimes.pop(project_id, None)
+        if previous is not None:
+            self.digest ^= self._entry_hash(project_id, previous)
+        if mtime_ns is not None:
+            self.mtimes[project_id] = mtime_ns
+            self.digest ^= self._entry_hash(project_id, mtime_ns)
+
+    def _store(self, project_id, metadata, mtime_ns):
+        """Übernimmt ein Projekt in den Speicher und die Datenbank (Lock gehalten)."""
+        self.projects[project_id] = metadata
+        self._set_mtime(project_id, mtime_ns)
+        self._connect().execute('INSERT OR REPLACE INTO projects (id, mtime_ns, data) VALUES (?, ?, ?)',
+                                (project_id, mtime_ns, json.dumps(metadata)))
+        self._changed()
+
+    def _changed(self):
+        """Markiert den Katalog als geändert."""
+        self.version += 1
+        self.sorted_cache = {}
+
+    def load(self):
+        """
+        Lädt den Katalog aus SQLite und gleicht ihn mit dem Dateisystem ab.
+
+        Nur neue oder geänderte Projekte werden eingelesen; für alle anderen
+        genügt ein stat()-Aufruf.
+        """
+        start = time.time()
+
+        with self.lock:
+            db = self._connect()
+
+            # Gespeicherten Stand nur beim ersten Laden aus SQLite übernehmen
+            if not self.loaded:
+                for project_id, mtime_ns, data in db.execute('SELECT id, mtime_ns, data FROM projects'):
+                    try:
+                        self.projects[project_id] = json.loads(data)
+                        self._set_mtime(project_id, mtime_ns)
+                    except ValueError:
+                        continue
+
+            os.makedirs(self.projects_dir, exist_ok=True)
+            # Versteckte Ordner (z.B. der Papierkorb .trash) sind keine Projekte
+            on_disk = {entry.name for entry in os.scandir(self.projects_dir)
+                       if entry.is_dir() and not entry.name.startswith('.')}
+
+            # Gelöschte Projekte entfernen
+            for project_id in set(self.projects) - on_disk:
+                self._remove_locked(project_id)
+
+            refreshed = 0
+            for project_id in on_disk:
+                try:
+                    mtime_ns = self._source_mtime(project_id)
+                    if self.mtimes.get(project_id) != mtime_ns:
+                        self._store(project_id, self._read_project(project_id), mtime_ns)
+                        refreshed += 1
+                except Exception as e:
+                    logger.error(f"Fehler beim Indizieren von Projekt {project_id}: {e}")
+
+            db.commit()
+            # Entfernte und neu eingelesene Projekte haben die Version bereits
+            # erhöht; nur der erste Stand aus SQLite gilt zusätzlich als Änderung
+            if not self.loaded:
+                self.loaded = True
+                self._changed()
+
+        logger.info(f"Projektkatalog geladen: {len(self.projects)} Projekte, "
+                    f"{refreshed} neu eingelesen, {time.time() - start:.3f} s")
+        return self
+
+    def ensure_loaded(self):
+        """Lädt den Katalog beim ersten Zugriff."""
+        if not self.loaded:
+            with self.lock:
+                if not self.loaded:
+                    self.load()
+
+    def upsert(self, project_id):
+        """Liest ein einzelnes Projekt neu ein (nach Erstellen oder Ändern)."""
+        self.ensure_loaded()
+        with self.lock:
+            try:
+                mtime_ns = self._source_mtime(project_id)
+                self._store(project_id, self._read_project(project_id), mtime_ns)
+                self.db.commit()
+            except FileNotFoundError:
+                self.remove(project_id)
+            except Exception as e:
+                logger.error(f"Fehler beim Aktualisieren von Projekt {project_id}: {e}")
+
+    def _remove_locked(self, project_id):
+        """Entfernt ein Projekt (Lock gehalten, ohne Commit)."""
+        if self.projects.pop(project_id, None) is not None:
+            self._set_mtime(project_id, None)
+            self._connect().execute('DELETE FROM projects WHERE id = ?', (project_id,))
+            self._changed()
+
+    def remove(self, project_id, action=None):
+        """
+        Entfernt ein Projekt aus dem Katalog.
+
+        Args:
+            project_id: Projekt-ID
+            action: Optionale Funktion, die unter demselben Lock zuvor ausgeführt
+                wird (z.B. das Verschieben des Ordners); löst sie eine Ausnahme
+                aus, bleibt der Katalog unverändert
+        """
+        with self.lock:
+            if action is not None:
+                action()
+            self._remove_locked(project_id)
+            self._connect().commit()
+
+    def get(self, project_id):
+        """Gibt die Metadaten eines Projekts zurück (oder None)."""
+        self.ensure_loaded()
+        with self.lock:
+            return self.projects.get(project_id)
+
+    def _sort_key(self, sort):
+        """Sortierschlüssel eines Projekts (Feldwert, ID) für das angegebene Feld."""
+        if sort == 'name':
+            return lambda pid: (str(self.projects[pid].get('name') or pid).lower(), pid)
+        if sort == 'image_count':
+            return lambda pid: (self.projects[pid].get('image_count') or 0, pid)
+        if sort == 'updated':
+            return lambda pid: (self.projects[pid].get('updated') or self.projects[pid].get('created') or 0, pid)
+        return lambda pid: (self.projects[pid].get('created') or 0, pid)
+
+    def _sorted_ids(self, sort, reverse):
+        """Liefert die Projekt-IDs sortiert (zwischengespeichert bis zur nächsten Änderung)."""
+        key = (sort, reverse)
+        ids = self.sorted_cache.get(key)
+        if ids is None:
+            ids = sorted(self.projects, key=self._sort_key(sort), reverse=reverse)
+            self.sorted_cache[key] = ids
+        return ids
+
+    @property
+    def etag(self):
+        """Kennung des aktuellen Katalogstands
+
+        Hängt nur von Anzahl, IDs und Änderungszeiten der Projekte ab, sodass
+        alle Webprozesse für dieselbe Liste dasselbe ETag liefern.
+        """
+        return f"{len(self.projects)}-{self.digest:016x}"
+
+    @staticmethod
+    def encode_cursor(sort, order, sort_key):
+        """Kodiert die Position nach einem Projekt als undurchsichtigen Cursor."""
+        data = json.dumps([sort, order, list(sort_key)], separators=(',', ':'))
+        return base64.urlsafe_b64encode(data.encode('utf-8')).decode('ascii').rstrip('=')
+
+    @staticmethod
+    def decode_cursor(cursor):
+        """Dekodiert einen Cursor zu (Sortierfeld, Reihenfolge, Sortierschlüssel)."""
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            sort, order, sort_key = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+            return sort, order, tuple(sort_key)
+        except (ValueError, TypeError) as e:
+            raise ValueError(f"Ungültiger Cursor: {cursor}") from e
+
+    @staticmethod
+    def _position_after(ids, sort_key, reverse, cursor_key):
+        """Binäre Suche nach dem ersten Projekt hinter dem Cursor."""
+        low, high = 0, len(ids)
+        while low < high:
+            middle = (low + high) // 2
+            key = sort_key(ids[middle])
+            if (key >= cursor_key) if reverse else (key <= cursor_key):
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def page(self, sort='created', order='desc', cursor=None, offset=0, limit=None, search=None):
+        """
+        Sortierte, gefilterte Seite mit Cursor für die nächste Seite.
+
+        Der Cursor enthält den Sortierschlüssel des letzten Projekts, daher
+        bleiben Seiten stabil, auch wenn davor Projekte hinzukommen oder
+        wegfallen.
+
+        Args:
+            sort: Sortierfeld (created, updated, name, image_count)
+            order: 'asc' oder 'desc'
+            cursor: Cursor einer vorherigen Seite (Sortierung wird daraus übernommen)
+            offset: Anzahl der zu überspringenden Projekte
+            limit: Maximale Anzahl (None = alle)
+            search: Optionaler Suchtext für Name oder ID
+
+        Returns:
+            Dictionary mit total, items, next_cursor und etag
+        """
+        self.ensure_loaded()
+        cursor_key = None
+        if cursor:
+            sort, order, cursor_key = self.decode_cursor(cursor)
+        if sort not in self.SORT_FIELDS:
+            sort = 'created'
+        if order != 'asc':
+            order = 'desc'
+        reverse = order == 'desc'
+
+        with self.lock:
+            ids = self._sorted_ids(sort, reverse)
+
+            if search:
+                needle = search.lower()
+                ids = [pid for pid in ids
+                       if needle in pid.lower() or needle in str(self.projects[pid].get('name', '')).lower()]
+
+            sort_key = self._sort_key(sort)
+            start = offset
+            if cursor_key is not None:
+                start += self._position_after(ids, sort_key, reverse, cursor_key)
+
+            end = None if limit is None else start + limit
+            page_ids = ids[start:end]
+
+            next_cursor = None
+            if page_ids and end is not None and end < len(ids):
+                next_cursor = self.encode_cursor(sort, order, sort_key(page_ids[-1]))
+
+            return {
+                'total': len(ids),
+                'items': [self.projects[pid] for pid in page_ids],
+                'next_cursor': next_cursor,
+                'etag': self.etag
+            }
+
+    def query(self, sort='created', order='desc', offset=0, limit=None, search=None):
+        """
+        Sortierte, gefilterte und seitenweise Abfrage.
+
+        Args:
+            sort: Sortierfeld (created, updated, name, image_count)
+            order: 'asc' oder 'desc'
+            offset: Anzahl der zu überspringenden Projekte
+            limit: Maximale Anzahl (None = alle)
+            search: Optionaler Suchtext für Name oder ID
+
+        Returns:
+            Tupel (Gesamtzahl der Treffer, Liste der Projekte)
+        """
+        result = self.page(sort=sort, order=order, offset=offset, limit=limit, search=search)
+        return result['total'], result['items']
+
+    def _handle_fs_events(self, events):
+        """Übernimmt Änderungen aus inotify-Ereignissen."""
+        changed = set()
+        for directory, mask, name in events:
+            if directory is None:
+                continue
+            if os.path.abspath(directory) == os.path.abspath(self.projects_dir):
+                # Projektordner angelegt, gelöscht oder umbenannt
+                if mask & IN_ISDIR and name and not name.startswith('.'):
+                    if mask & (IN_CREATE | IN_MOVED_TO):
+                        self._watch_project(name)
+                    changed.add(name)
+            elif not (name or '').startswith('.'):
+                # Datei innerhalb eines Projekts geändert (Punktdateien wie Export-Prüfsummen nicht)
+                changed.add(os.path.basename(directory))
+
+        for project_id in changed:
+            if os.path.isdir(os.path.join(self.projects_dir, project_id)):
+                self.upsert(project_id)
+            else:
+                self.remove(project_id)
+
+    def _watch_project(self, project_id):
+        """Überwacht einen Projektordner auf Änderungen an den Metadaten."""
+        try:
+            self.watcher.add_watch(os.path.join(self.projects_dir, project_id),
+                                   IN_CLOSE_WRITE | IN_MOVED_TO | IN_DELETE | IN_CREATE)
+        except OSError as e:
+            logger.debug(f"Projektordner {project_id} kann nicht überwacht werden: {e}")
+
+    def _watch_loop(self, poll_interval):
+        """Hintergrund-Thread: inotify oder (Fallback) periodischer Abgleich."""
+        if self.watcher is not None:
+            while True:
+                try:
+                    events = self.watcher.read_events()
+                    # Zusammengehörige Ereignisse (z.B. Kopieren vieler Bilder) bündeln
+                    time.sleep(0.2)
+                    self._handle_fs_events(events)
+                except Exception as e:
+                    logger.error(f"Fehler bei der Projektüberwachung: {e}")
+                    time.sleep(1)
+        else:
+            while True:
+                time.sleep(poll_interval)
+                try:
+                    self.load()
+                except Exception as e:
+                    logger.error(f"Fehler beim Abgleich des Projektkatalogs: {e}")
+
+    def start_watching(self, poll_interval=30):
+        """Startet die Überwachung des Projektverzeichnisses auf externe Änderungen."""
+        if self.watch_thread is not None:
+            return
+
+        self.ensure_loaded()
+        try:
+            self.watcher = InotifyWatcher()
+            self.watcher.add_watch(self.projects_dir,
+                                   IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE_SELF)
+            for project_id in list(self.projects):
+                self._watch_project(project_id)
+        except OSError as e:
+            logger.warning(f"inotify nicht verfügbar, gleiche alle {poll_interval} s ab: {e}")
+            self.watcher = None
+
+        self.watch_thread = threading.Thread(target=self._watch_loop, args=(poll_interval,),
+                                             name='project-catalog-watch', daemon=True)
+        self.watch_thread.start()
+
+
+# Globale Instanz für die Anwendung
+project_catalog = ProjectCatalog()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Modul zum Löschen von Projekten im Hintergrund.
+Gelöschte Projekte werden nur in den Papierkorb (.trash im
+Projektverzeichnis) umbenannt; dieser Thread entfernt die Dateien danach mit
+niedriger Priorität und begrenzter Rate, damit große Projekte auf langsamen
+Datenträgern (SD-Karten) weder die Anfrage noch laufende Aufnahmen
+ausbremsen. Reste nach einem Absturz werden beim nächsten Start entfernt.
+"""
+
+import os
+import time
+import logging
+import threading
+
+from config_manager import config_manager
+
+# Logger konfigurieren
+logger = logging.getLogger("drehteller360.project_reaper")
+
+# Papierkorb innerhalb des Projektverzeichnisses (gleiches Dateisystem, atomares Umbenennen)
+TRASH_DIR = '.trash'
+
+
+class ProjectReaper:
+    """Leert die Papierkörbe der Projektverzeichnisse in einem Hintergrund-Thread."""
+
+    def __init__(self, files_per_second=None, bytes_per_second=None):
+        """
+        Initialisiert den Dienst.
+
+        Args:
+            files_per_second: Maximal gelöschte Dateien pro Sekunde
+            bytes_per_second: Maximal freigegebene Bytes pro Sekunde
+        """
+        self.files_per_second = files_per_second or config_manager.get('project_trash.files_per_second', 200)
+        self.bytes_per_second = bytes_per_second or config_manager.get('project_trash.bytes_per_second',
+                                                                       32 * 1024 * 1024)
+        self.condition = threading.Condition()
+        self.trash_dirs = set()
+        self.pending = False
+        self.thread = None
+
+    @staticmethod
+    def trash_dir(projects_dir):
+        """Papierkorb eines Projektverzeichnisses"""
+        return os.path.join(projects_dir, TRASH_DIR)
+
+    def watch(self, projects_dir):
+        """Leert den Papierkorb eines Projektverzeichnisses (startet den Thread bei Bedarf)."""
+        with self.condition:
+            self.trash_dirs.add(os.path.abspath(self.trash_dir(projects_dir)))
+            self.pending = True
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name='project-reaper', daemon=True)
+                self.thread.start()
+            self.condition.notify()
+
+    @staticmethod
+    def _lower_priority():
+        """Senkt die CPU-Priorität dieses Threads (unter Linux folgt die I/O-Priorität)."""
+        try:
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 19)
+        except (AttributeError, OSError) as e:
+            logger.debug(f"Priorität des Papierkorb-Threads nicht geändert: {e}")
+
+    def _run(self):
+        """Thread: wartet auf gelöschte Projekte und entfernt sie."""
+        self._lower_priority()
+        while True:
+            with self.condition:
+                while not self.pending:
+                    self.condition.wait()
+                self.pending = False
+                trash_dirs = list(self.trash_dirs)
+
+            for trash_dir in trash_dirs:
+                try:
+                    self._sweep(trash_dir)
+                except Exception as e:
+                    logger.error(f"Fehler beim Leeren des Papierkorbs {trash_dir}: {e}")
+
+    def _sweep(self, trash_dir):
+        """Entfernt alle Einträge eines Papierkorbs."""
+        if not os.path.isdir(trash_dir):
+            return
+        for entry in sorted(os.scandir(trash_dir), key=lambda entry: entry.name):
+            start = time.monotonic()
+            files, size = self._remove_tree(entry.path)
+            logger.info(f"Gelöschtes Projekt entfernt: {entry.name} ({files} Dateien, "
+                        f"{size / (1024 * 1024):.1f} MB, {time.monotonic() - start:.1f} s)")
+
+    def _remove_tree(self, path):
+        """Löscht einen Ordner Datei für Datei mit begrenzter Rate.
+
+        Returns:
+            Tupel (gelöschte Dateien, freigegebene Bytes)
+        """
+        start = time.monotonic()
+        files = 0
+        size = 0
+
+        def throttle():
+            # So lange warten, bis beide Raten wieder eingehalten sind
+            wait = max(files / self.files_per_second, size / self.bytes_per_second) - (time.monotonic() - start)
+            if wait > 0:
+                time.sleep(wait)
+
+        if os.path.islink(path) or not os.path.isdir(path):
+            self._ignore_missing(os.unlink, path)
+            return 0, 0
+
+        for root, dirs, filenames in os.walk(path, topdown=False):
+            for name in filenames:
+                file_path = os.path.join(root, name)
+                try:
+                    size += os.lstat(file_path).st_size
+                    os.unlink(file_path)
+                    files += 1
+                except FileNotFoundError:
+                    # Ein anderer Prozess leert denselben Papierkorb
+                    continue
+                throttle()
+            for name in dirs:
+                dir_path = os.path.join(root, name)
+                self._ignore_missing(os.unlink if os.path.islink(dir_path) else os.rmdir, dir_path)
+        self._ignore_missing(os.rmdir, path)
+        return files, size
+
+    @staticmethod
+    def _ignore_missing(func, path):
+        try:
+            func(path)
+        except FileNotFoundError:
+            pass
+
+
+# Globale Instanz für die Anwendung
+project_reaper = ProjectReaper()
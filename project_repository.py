@@ -0,0 +1,481 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Modul für die einheitliche Projektablage.
+Alle Projekte liegen als static/projects/<id>/metadata.json mit einem festen
+Schema. Zugriffe laufen über den Projektkatalog (O(1) per ID, indizierte
+Listen). Ein Migrationswerkzeug übernimmt die älteren Ablageformate
+(models.project mit project.json und project_manager mit images/).
+"""
+
+import os
+import json
+import time
+import uuid
+import shutil
+import logging
+import argparse
+import threading
+from datetime import datetime
+
+from project_catalog import project_catalog, IMAGE_EXTENSIONS
+from project_reaper import project_reaper
+
+# Logger konfigurieren
+logger = logging.getLogger("drehteller360.project_repository")
+
+# Version des Metadaten-Schemas
+SCHEMA_VERSION = 1
+
+
+class ProjectRepository:
+    """Einheitlicher Zugriff auf alle Projekte."""
+
+    # Bereits übernommene fremde Projektverzeichnisse (z.B. aus den Einstellungen)
+    _migrated = set()
+    _migrate_lock = threading.Lock()
+
+    def __init__(self, catalog=None):
+        """
+        Initialisiert das Repository.
+
+        Args:
+            catalog: ProjectCatalog für das Projektverzeichnis (Standard: globaler Katalog)
+        """
+        self.catalog = catalog or project_catalog
+
+    @classmethod
+    def for_directory(cls, projects_dir):
+        """
+        Liefert das Repository für ein Projektverzeichnis.
+
+        Es gibt nur eine indizierte Projektablage. Projekte aus einem anderen
+        Verzeichnis werden beim ersten Aufruf in das globale Repository
+        übernommen; der Aufrufer arbeitet danach mit dessen Verzeichnis.
+        """
+        if projects_dir is None:
+            return project_repository
+
+        key = os.path.abspath(projects_dir)
+        if key == os.path.abspath(project_catalog.projects_dir):
+            return project_repository
+
+        with cls._migrate_lock:
+            if key not in cls._migrated:
+                cls._migrated.add(key)
+                migrated = ProjectMigrator(project_repository).migrate_directory(projects_dir)
+                logger.warning(f"Projektverzeichnis {projects_dir} wird nicht separat indiziert; "
+                               f"{len(migrated)} Projekte nach {project_repository.projects_dir} übernommen")
+        return project_repository
+
+    @property
+    def projects_dir(self):
+        """Verzeichnis mit den Projektordnern"""
+        return self.catalog.projects_dir
+
+    def path(self, project_id):
+        """Gibt den Pfad eines Projekts zurück."""
+        return os.path.join(self.projects_dir, project_id)
+
+    @staticmethod
+    def normalize(metadata, project_id):
+        """
+        Ergänzt Metadaten um alle Felder des Schemas.
+
+        Args:
+            metadata: Metadaten-Dictionary (wird nicht verändert)
+            project_id: Projekt-ID
+
+        Returns:
+            Neues Dictionary im aktuellen Schema
+        """
+        normalized = dict(metadata)
+        now = time.time()
+
+        normalized['schema_version'] = SCHEMA_VERSION
+        normalized['id'] = project_id
+        normalized.setdefault('name', project_id)
+        normalized.setdefault('description', '')
+        normalized.setdefault('created', now)
+        normalized['updated'] = normalized.get('updated', normalized['created'])
+        normalized.setdefault('images', [])
+        normalized['image_count'] = len(normalized['images'])
+        normalized.setdefault('sessions', [])
+        normalized.setdefault('user_metadata', {})
+        return normalized
+
+    def get(self, project_id):
+        """Gibt die Metadaten eines Projekts zurück (oder None)."""
+        return self.catalog.get(project_id)
+
+    def list(self, **query):
+        """Sortierte, gefilterte und seitenweise Projektliste (siehe ProjectCatalog.query)."""
+        return self.catalog.query(**query)
+
+    def page(self, **query):
+        """Seite der Projektliste mit Cursor und ETag (siehe ProjectCatalog.page)."""
+        return self.catalog.page(**query)
+
+    def exists(self, project_id):
+        """Prüft, ob ein Projekt existiert."""
+        return self.get(project_id) is not None
+
+    def is_current(self, project_id):
+        """Prüft, ob ein Projekt bereits im aktuellen Schema gespeichert ist."""
+        metadata = self.get(project_id)
+        return bool(metadata) and metadata.get('schema_version') == SCHEMA_VERSION
+
+    def new_id(self, name):
+        """Erzeugt eine sichere, eindeutige Projekt-ID aus einem Namen."""
+        safe_name = "".join([c if c.isalnum() else "_" for c in name]) or "project"
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        project_id = f"{safe_name}_{timestamp}"
+
+        suffix = 1
+        while os.path.exists(self.path(project_id)):
+            suffix += 1
+            project_id = f"{safe_name}_{timestamp}_{suffix}"
+        return project_id
+
+    def create(self, name, description='', project_id=None, **fields):
+        """
+        Legt ein neues Projekt an.
+
+        Args:
+            name: Projektname
+            description: Projektbeschreibung
+            project_id: Optionale ID (Standard: aus Name und Zeitstempel)
+            fields: Weitere Metadatenfelder
+
+        Returns:
+            Metadaten des neuen Projekts
+        """
+        project_id = project_id or self.new_id(name)
+        os.makedirs(self.path(project_id), exist_ok=True)
+
+        metadata = dict(fields)
+        metadata.update({'name': name, 'description': description or ''})
+        return self.save(project_id, metadata)
+
+    def save(self, project_id, metadata):
+        """
+        Speichert die Metadaten eines Projekts atomar und aktualisiert den Katalog.
+
+        Args:
+            project_id: Projekt-ID
+            metadata: Metadaten-Dictionary
+
+        Returns:
+            Gespeicherte (normalisierte) Metadaten
+        """
+        metadata = self.normalize(metadata, project_id)
+        metadata['updated'] = time.time()
+
+        project_dir = self.path(project_id)
+        os.makedirs(project_dir, exist_ok=True)
+
+        metadata_path = os.path.join(project_dir, 'metadata.json')
+        tmp_path = metadata_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(metadata, f)
+        os.replace(tmp_path, metadata_path)
+
+        self.catalog.upsert(project_id)
+        return metadata
+
+    def add_image(self, project_id, image_path, subdir=None):
+        """
+        Kopiert ein Bild in ein Projekt und ergänzt die Bildliste.
+
+        Args:
+            project_id: Projekt-ID
+            image_path: Pfad zum Bild
+            subdir: Optionales Unterverzeichnis innerhalb des Projekts
+
+        Returns:
+            Pfad zum kopierten Bild
+        """
+        metadata = self.get(project_id)
+        if metadata is None:
+            raise KeyError(project_id)
+
+        relative_path = os.path.basename(image_path)
+        if subdir:
+            relative_path = os.path.join(subdir, relative_path)
+
+        destination = os.path.join(self.path(project_id), relative_path)
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        shutil.copy(image_path, destination)
+
+        images = list(metadata.get('images', []))
+        if relative_path not in images:
+            images.append(relative_path)
+        metadata = dict(metadata)
+        metadata['images'] = images
+        self.save(project_id, metadata)
+
+        return destination
+
+    def delete(self, project_id):
+        """
+        Löscht ein Projekt.
+
+        Der Ordner wird im selben Schritt, in dem das Projekt aus dem Katalog
+        verschwindet, atomar in den Papierkorb umbenannt; die Dateien entfernt
+        project_reaper anschließend im Hintergrund.
+
+        Returns:
+            True bei Erfolg, False wenn das Projekt nicht existiert
+        """
+        # Keine Pfade außerhalb des Projektverzeichnisses und nicht den Papierkorb selbst
+        if not project_id or project_id.startswith('.') or os.sep in project_id or '/' in project_id:
+            return False
+
+        project_dir = self.path(project_id)
+        trash_dir = project_reaper.trash_dir(self.projects_dir)
+        os.makedirs(trash_dir, exist_ok=True)
+        trash_path = os.path.join(trash_dir, f"{project_id}.{uuid.uuid4().hex[:8]}")
+
+        moved = []
+
+        def move_to_trash():
+            try:
+                os.rename(project_dir, trash_path)
+                moved.append(trash_path)
+            except FileNotFoundError:
+                pass
+
+        self.catalog.remove(project_id, move_to_trash)
+        if not moved:
+            return False
+
+        project_reaper.watch(self.projects_dir)
+        logger.info(f"Projekt {project_id} gelöscht (Dateien werden im Hintergrund entfernt)")
+        return True
+
+
+class ProjectMigrator:
+    """Überführt Projekte aus den älteren Ablageformaten in das Repository."""
+
+    def __init__(self, repository=None, copy=False):
+        """
+        Initialisiert den Migrator.
+
+        Args:
+            repository: Ziel-Repository (Standard: globales Repository)
+            copy: Bilder kopieren statt verschieben (sonst Hardlink bzw. Verschieben)
+        """
+        self.repository = repository or project_repository
+        self.copy = copy
+
+    def _transfer(self, source, destination):
+        """Überträgt eine Bilddatei in das Zielprojekt."""
+        if os.path.abspath(source) == os.path.abspath(destination):
+            return
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        if self.copy:
+            shutil.copy2(source, destination)
+            return
+        try:
+            # Auf demselben Dateisystem ohne zusätzlichen Speicherplatz
+            os.link(source, destination)
+        except OSError:
+            shutil.copy2(source, destination)
+
+    @staticmethod
+    def _timestamp(value, default):
+        """Wandelt ISO-Zeitstempel oder Zahlen in Unix-Zeit um."""
+        if isinstance(value, (int, float)):
+            return float(value)
+        try:
+            return datetime.fromisoformat(value).timestamp()
+        except (TypeError, ValueError):
+            return default
+
+    def migrate_model_project(self, project_path):
+        """
+        Überführt ein Projekt im Format von models.project (project.json, sessions/<id>/).
+
+        Returns:
+            Projekt-ID im Repository oder None
+        """
+        with open(os.path.join(project_path, 'project.json'), 'r') as f:
+            data = json.load(f)
+
+        project_id = data.get('id') or os.path.basename(project_path)
+        if self.repository.is_current(project_id):
+            logger.info(f"Projekt {project_id} ist bereits migriert")
+            return project_id
+
+        target_dir = self.repository.path(project_id)
+        sessions = []
+        images = []
+
+        for session in data.get('sessions', []):
+            photos = {}
+            for angle, photo_path in sorted(session.get('photos', {}).items(), key=lambda item: float(item[0])):
+                # Pfade können absolut oder relativ zum alten Projekt sein
+                source = photo_path if os.path.isabs(photo_path) else os.path.join(project_path, photo_path)
+                if not os.path.exists(source):
+                    source = os.path.join(project_path, 'sessions', session.get('id', ''),
+                                          os.path.basename(photo_path))
+                if not os.path.exists(source):
+                    logger.warning(f"Bild fehlt und wird übersprungen: {photo_path}")
+                    continue
+
+                relative_path = os.path.join('sessions', session.get('id', ''), os.path.basename(source))
+                self._transfer(source, os.path.join(target_dir, relative_path))
+                photos[angle] = relative_path
+
+            session = dict(session)
+            session['photos'] = photos
+            sessions.append(session)
+
+        # Die Viewer-Bilder stammen aus der letzten Session
+        if sessions:
+            latest = sessions[-1]['photos']
+            images = [latest[angle] for angle in sorted(latest, key=float)]
+
+        created = self._timestamp(data.get('created_at'), time.time())
+        self.repository.save(project_id, {
+            'name': data.get('name', "Unbenanntes Projekt"),
+            'description': data.get('description', ""),
+            'angle_step': data.get('angle_step', 5),
+            'created': created,
+            'sessions': sessions,
+            'images': images
+        })
+        return project_id
+
+    def migrate_legacy_project(self, project_path):
+        """
+        Überführt ein Projekt im Format von project_manager (metadata.json, images/).
+
+        Returns:
+            Projekt-ID im Repository oder None
+        """
+        with open(os.path.join(project_path, 'metadata.json'), 'r') as f:
+            data = json.load(f)
+
+        project_id = os.path.basename(project_path)
+        if self.repository.is_current(project_id):
+            logger.info(f"Projekt {project_id} ist bereits migriert")
+            return project_id
+
+        target_dir = self.repository.path(project_id)
+        images_path = os.path.join(project_path, 'images')
+        images = []
+        if os.path.isdir(images_path):
+            for filename in sorted(os.listdir(images_path)):
+                if filename.lower().endswith(IMAGE_EXTENSIONS):
+                    relative_path = os.path.join('images', filename)
+                    self._transfer(os.path.join(project_path, relative_path),
+                                   os.path.join(target_dir, relative_path))
+                    images.append(relative_path)
+
+        metadata = dict(data)
+        metadata['created'] = self._timestamp(data.get('created'), time.time())
+        metadata.pop('last_modified', None)
+        metadata['images'] = images
+        self.repository.save(project_id, metadata)
+        return project_id
+
+    def migrate_repository_project(self, project_path):
+        """
+        Überführt ein Projekt im aktuellen Format (metadata.json) aus einem anderen Projektverzeichnis.
+
+        Returns:
+            Projekt-ID im Repository oder None
+        """
+        with open(os.path.join(project_path, 'metadata.json'), 'r') as f:
+            data = json.load(f)
+
+        project_id = os.path.basename(project_path)
+        if self.repository.is_current(project_id):
+            logger.info(f"Projekt {project_id} ist bereits migriert")
+            return project_id
+
+        # Alle Dateien (Sessions, Viewer-Bilder) übernehmen, versteckte Ordner auslassen
+        target_dir = self.repository.path(project_id)
+        for root, dirs, filenames in os.walk(project_path):
+            dirs[:] = [d for d in dirs if not d.startswith('.')]
+            for filename in filenames:
+                source = os.path.join(root, filename)
+                relative_path = os.path.relpath(source, project_path)
+                if relative_path == 'metadata.json':
+                    continue
+                self._transfer(source, os.path.join(target_dir, relative_path))
+
+        self.repository.save(project_id, data)
+        return project_id
+
+    def migrate_directory(self, source_dir):
+        """
+        Überführt alle Projekte eines Verzeichnisses (Format wird automatisch erkannt).
+
+        Returns:
+            Liste der migrierten Projekt-IDs
+        """
+        migrated = []
+        if not os.path.isdir(source_dir):
+            return migrated
+
+        for name in sorted(os.listdir(source_dir)):
+            project_path = os.path.join(source_dir, name)
+            if not os.path.isdir(project_path):
+                continue
+            try:
+                if self.repository.is_current(name) and \
+                        os.path.abspath(source_dir) == os.path.abspath(self.repository.projects_dir):
+                    continue
+                if os.path.isfile(os.path.join(project_path, 'project.json')):
+                    project_id = self.migrate_model_project(project_path)
+                elif os.path.isdir(os.path.join(project_path, 'images')) and \
+                        os.path.isfile(os.path.join(project_path, 'metadata.json')):
+                    project_id = self.migrate_legacy_project(project_path)
+                elif os.path.isfile(os.path.join(project_path, 'metadata.json')):
+                    project_id = self.migrate_repository_project(project_path)
+                else:
+                    continue
+                if project_id:
+                    migrated.append(project_id)
+                    logger.info(f"Projekt migriert: {project_path} -> {project_id}")
+            except Exception as e:
+                logger.error(f"Fehler bei der Migration von {project_path}: {e}")
+
+        return migrated
+
+    def migrate_current_layout(self):
+        """Ergänzt vorhandene Projekte in static/projects um das aktuelle Schema."""
+        upgraded = 0
+        _, projects = self.repository.list()
+        for metadata in projects:
+            if metadata.get('schema_version') != SCHEMA_VERSION:
+                self.repository.save(metadata['id'], metadata)
+                upgraded += 1
+        return upgraded
+
+
+# Globale Instanz für die Anwendung
+project_repository = ProjectRepository()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description="Migriert alte Projektablagen nach static/projects")
+    parser.add_argument('sources', nargs='*', default=['projects'],
+                        help="Verzeichnisse mit alten Projekten (Standard: projects)")
+    parser.add_argument('--copy', action='store_true',
+                        help="Bilder kopieren statt Hardlinks anzulegen")
+    args = parser.parse_args()
+
+    migrator = ProjectMigrator(copy=args.copy)
+    total = 0
+    for source in args.sources:
+        migrated = migrator.migrate_directory(source)
+        total += len(migrated)
+        print(f"{source}: {len(migrated)} Projekte migriert")
+
+    upgraded = migrator.migrate_current_layout()
+    print(f"Insgesamt {total} Projekte migriert, {upgraded} vorhandene Projekte aktualisiert")
@@ -0,0 +1,411 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Modul für den Betrieb mehrerer Drehteller-Stationen (Rigs) an einem Server.
+Jedes Rig aus der Konfiguration ('rigs') erhält eigene Controller für Arduino,
+Kamera und Drehteller sowie einen eigenen Worker, sodass Sessions auf
+verschiedenen Rigs parallel und voneinander unabhängig laufen. Die
+rechenintensive Nachbearbeitung teilen sich alle Rigs in einem gemeinsamen
+Prozesspool.
+
+Mit Hardware-Broker laufen die Rigs im Broker-Prozess; die Webprozesse
+greifen über RemoteRigRegistry darauf zu und sehen so alle denselben
+Zustand. Arduino und Kameras eines Rigs sind nur während einer Session
+geöffnet.
+"""
+
+import os
+import time
+import fcntl
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from config_manager import config_manager
+from project_repository import project_repository
+from metrics import record_processing_stage
+from profiler import profiling
+
+# Logger konfigurieren
+logger = logging.getLogger("drehteller360.rig_manager")
+
+# Sperrdateien, damit ein Rig auch prozessübergreifend nur eine Session fährt
+LOCK_DIR = 'cache/rigs'
+
+
+class RigError(Exception):
+    """Fehler bei der Ansteuerung eines Rigs."""
+
+
+class RigBusyError(RigError):
+    """Auf dem Rig läuft bereits eine Session."""
+
+
+def prepare_viewer_images(projects_dir, project_id, photos, auto_crop=True):
+    """
+    Bereitet die Fotos einer Session als Viewer-Bilder auf (läuft im Prozesspool).
+
+    Args:
+        projects_dir: Verzeichnis mit den Projektordnern
+        project_id: Projekt-ID
+        photos: Absolute Pfade der Fotos in Winkelreihenfolge
+        auto_crop: Auf die gemeinsame Objekt-Bounding-Box zuschneiden
+
+    Returns:
+        Tupel (Bilddateien, Inhalts-Hashes, Bildausschnitt, Dauer je Verarbeitungsschritt);
+        die Dauern verbucht der aufrufende Prozess in seinen Metriken
+    """
+    from viewer_generator import ViewerGenerator
+
+    generator = ViewerGenerator(output_dir=projects_dir, auto_crop=auto_crop)
+    timings = {}
+    crop_box = None
+    if auto_crop:
+        started = time.perf_counter()
+        crop_box = generator.compute_union_bbox(photos)
+        timings['bbox'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    _, images, image_hashes = generator.prepare_images(photos, project_id, crop_box)
+    timings['prepare'] = time.perf_counter() - started
+    return images, image_hashes, list(crop_box) if crop_box else None, timings
+
+
+class Rig:
+    """Eine Station aus Drehteller, Arduino und Kamera."""
+
+    def __init__(self, rig_id, settings, registry):
+        """
+        Initialisiert das Rig (die Geräte werden erst bei der ersten Session geöffnet).
+
+        Args:
+            rig_id: Eindeutige ID aus der Konfiguration
+            settings: Einstellungen des Rigs ('name', 'arduino', 'camera', 'angle_step')
+            registry: RigRegistry mit dem gemeinsamen Prozesspool
+        """
+        self.id = rig_id
+        self.name = settings.get('name', rig_id)
+        self.settings = settings
+        self.registry = registry
+
+        self.arduino = None
+        self.camera = None
+        self.turntable = None
+        # Letzte bekannte Position (die Controller bestehen nur während einer Session)
+        self.position = None
+
+        # Ein Worker je Rig: Sessions eines Rigs laufen nacheinander
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f'rig-{rig_id}')
+        self.lock = threading.Lock()
+        self.session = None
+        self.last_session = None
+
+    def _create_controllers(self):
+        """Erzeugt die Controller dieses Rigs (im Worker-Thread)."""
+        from controllers.arduino_controller import ArduinoController
+        from controllers.camera_controller import CameraController
+        from controllers.turntable_controller import TurntableController
+        from controllers.camera_group import CameraGroup
+
+        if self.turntable is None:
+            arduino = self.settings.get('arduino', {})
+            self.arduino = ArduinoController(arduino.get('port'), arduino.get('baudrate', 9600))
+            self.turntable = TurntableController(self.arduino, self.settings.get('angle_step', 5))
+
+        if self.camera is None:
+            def create_camera(camera):
+                resolution = camera.get('resolution', {})
+                return CameraController(camera.get('type', 'webcam'),
+                                        camera.get('device_path', '/dev/video0'),
+                                        (resolution.get('width', 1920), resolution.get('height', 1080)))
+
+            cameras = self.settings.get('cameras')
+            if cameras:
+                # Mehrere Kameras lösen pro Schritt gemeinsam aus
+                names = [camera.get('name', f'cam{i}') for i, camera in enumerate(cameras)]
+                self.camera = CameraGroup({name: create_camera(camera) for name, camera in zip(names, cameras)},
+                                          elevations={name: camera['elevation']
+                                                      for name, camera in zip(names, cameras)
+                                                      if 'elevation' in camera})
+            else:
+                self.camera = create_camera(self.settings.get('camera', {}))
+
+    def start_session(self, name=None, angle_step=None, project_id=None, resume=None):
+        """
+        Startet eine Fotosession im Worker des Rigs.
+
+        Args:
+            name: Projektname (neues Projekt)
+            angle_step: Winkelschritt in Grad (Standard aus der Rig-Konfiguration)
+            project_id: Bestehendes Projekt, dem die Session hinzugefügt wird
+            resume: Abgebrochene Session des Projekts fortsetzen (Session-ID oder
+                True für die zuletzt abgebrochene)
+
+        Returns:
+            Zustand der Session
+
+        Raises:
+            RigBusyError: Wenn auf dem Rig bereits eine Session läuft
+            RigError: Wenn das Projekt oder die fortzusetzende Session nicht existiert
+        """
+        from models.project import Project
+        from models.session_journal import SessionJournal
+
+        with self.lock:
+            if self.session is not None:
+                raise RigBusyError(f"Auf Rig '{self.id}' läuft bereits eine Session")
+
+            angle_step = int(angle_step or self.settings.get('angle_step', 5))
+            if project_id:
+                metadata = project_repository.get(project_id)
+                if metadata is None:
+                    raise RigError(f"Projekt nicht gefunden: {project_id}")
+                project = Project.from_metadata(metadata, project_repository.path(project_id))
+                project.angle_step = angle_step
+            elif resume:
+                raise RigError("Zum Fortsetzen muss ein Projekt angegeben werden")
+            else:
+                name = name or f"{self.name} {time.strftime('%Y-%m-%d %H:%M')}"
+                project_id = project_repository.new_id(name)
+                project = Project(id=project_id, name=name, angle_step=angle_step,
+                                  path=project_repository.path(project_id))
+
+            resume_session_id = None
+            if resume:
+                incomplete = SessionJournal.find_incomplete(project.path)
+                if resume is True:
+                    resume_session_id = incomplete[-1] if incomplete else None
+                else:
+                    resume_session_id = str(resume)
+                if resume_session_id not in incomplete:
+                    raise RigError("Keine abgebrochene Session zum Fortsetzen gefunden")
+
+            self.session = {
+                'project_id': project_id,
+                'resumed_session': resume_session_id,
+                'angle_step': angle_step,
+                'state': 'queued',
+                'started': time.time(),
+                'finished': None,
+                'error': None
+            }
+            self.executor.submit(self._run_session, project, self.session, resume_session_id)
+            return dict(self.session)
+
+    def _run_session(self, project, session, resume_session_id=None):
+        """Fährt die Session und stößt die Nachbearbeitung an (Worker-Thread)."""
+        os.makedirs(LOCK_DIR, exist_ok=True)
+        profile = profiling.start_session(f"Rig {self.id}: {project.id}")
+        try:
+            with open(os.path.join(LOCK_DIR, f"{self.id}.lock"), 'w') as lock_file:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    raise RigBusyError(f"Rig '{self.id}' wird von einem anderen Prozess verwendet")
+
+                session['state'] = 'capturing'
+                try:
+                    self._create_controllers()
+                    if not self.turntable.start_session(project, self.camera, resume_session_id):
+                        raise RigError(self.turntable.last_error or "Fotosession fehlgeschlagen")
+                finally:
+                    # Geräte noch unter der Sperre freigeben, damit ein anderer Prozess sie öffnen kann
+                    self._release_devices()
+
+            # Geräte sind frei, die Nachbearbeitung läuft im gemeinsamen Pool
+            session['state'] = 'processing'
+            photos = [os.path.abspath(photo) for photo in project.sessions[-1].get_all_photos()]
+            future = self.registry.pool().submit(prepare_viewer_images, project_repository.projects_dir,
+                                                 project.id, photos, self.settings.get('auto_crop', True))
+            images, image_hashes, crop_box, timings = future.result()
+            for stage, seconds in timings.items():
+                record_processing_stage(stage, seconds, len(photos))
+            if not images:
+                raise RigError("Nachbearbeitung fehlgeschlagen: keine Viewer-Bilder erzeugt")
+
+            metadata = project_repository.get(project.id) or project.to_metadata()
+            metadata.update({'images': images, 'image_hashes': image_hashes, 'crop_box': crop_box,
+                             'rig': self.id})
+            project_repository.save(project.id, metadata)
+
+            session['state'] = 'completed'
+            logger.info(f"Session auf Rig '{self.id}' abgeschlossen: {project.id}")
+        except Exception as e:
+            logger.error(f"Fehler in der Session auf Rig '{self.id}': {e}")
+            session['state'] = 'failed'
+            session['error'] = str(e)
+        finally:
+            if profile is not None:
+                try:
+                    profile.stop(session['state'])
+                except Exception as e:
+                    logger.error(f"Profil der Session konnte nicht gespeichert werden: {e}")
+            session['finished'] = time.time()
+            with self.lock:
+                self.last_session = session
+                self.session = None
+
+    def _release_devices(self):
+        """Schließt Kamera(s) und Arduino des Rigs."""
+        with self.lock:
+            camera, arduino, turntable = self.camera, self.arduino, self.turntable
+            self.camera = self.arduino = self.turntable = None
+            if turntable is not None:
+                self.position = turntable.current_position
+
+        if camera is not None:
+            try:
+                getattr(camera, 'close', camera.cleanup)()
+            except Exception as e:
+                logger.error(f"Kamera von Rig '{self.id}' konnte nicht geschlossen werden: {e}")
+        if arduino is not None:
+            try:
+                arduino.disconnect()
+            except Exception as e:
+                logger.error(f"Arduino von Rig '{self.id}' konnte nicht getrennt werden: {e}")
+
+    def stop(self):
+        """Bricht die laufende Session nach dem aktuellen Schritt ab."""
+        with self.lock:
+            if self.session is None or self.turntable is None:
+                return False
+            self.turntable.stop()
+            return True
+
+    def status(self):
+        """Liefert den Zustand des Rigs."""
+        with self.lock:
+            session = self.session or self.last_session
+            return {
+                'id': self.id,
+                'name': self.name,
+                'busy': self.session is not None,
+                'arduino_port': self.settings.get('arduino', {}).get('port'),
+                'camera_device': self.settings.get('camera', {}).get('device_path'),
+                'cameras': [camera.get('name') for camera in self.settings.get('cameras', [])],
+                'arduino_connected': bool(self.arduino and self.arduino.is_connected()),
+                'position': self.turntable.current_position if self.turntable else self.position,
+                'progress': self.turntable.progress if self.turntable and self.session else None,
+                'session': dict(session) if session else None
+            }
+
+    def close(self):
+        """Gibt die Geräte frei."""
+        self.executor.shutdown(wait=False)
+        self._release_devices()
+
+
+class RigRegistry:
+    """Verwaltet alle konfigurierten Rigs und den gemeinsamen Prozesspool."""
+
+    def __init__(self, rigs=None, processing_workers=None):
+        """
+        Initialisiert die Registry.
+
+        Args:
+            rigs: Liste der Rig-Einstellungen (Standard: 'rigs' aus der Konfiguration)
+            processing_workers: Prozesse für die Nachbearbeitung (Standard: Anzahl CPU-Kerne)
+        """
+        self.rig_settings = rigs
+        self.processing_workers = processing_workers
+        self.rigs = None
+        self.executor = None
+        self.lock = threading.Lock()
+
+    def _load(self):
+        """Erzeugt die Rigs aus der Konfiguration (Lock gehalten)."""
+        if self.rigs is None:
+            settings = self.rig_settings
+            if settings is None:
+                settings = config_manager.get('rigs', [])
+            self.rigs = {}
+            for rig_settings in settings:
+                rig_id = str(rig_settings.get('id', '')).strip()
+                if not rig_id or rig_id in self.rigs:
+                    logger.warning(f"Rig ohne oder mit doppelter ID übersprungen: {rig_settings}")
+                    continue
+                self.rigs[rig_id] = Rig(rig_id, rig_settings, self)
+        return self.rigs
+
+    def get(self, rig_id):
+        """Gibt ein Rig anhand seiner ID zurück (oder None)."""
+        with self.lock:
+            return self._load().get(rig_id)
+
+    def list(self):
+        """Gibt alle Rigs zurück."""
+        with self.lock:
+            return list(self._load().values())
+
+    def pool(self):
+        """Gemeinsamer Prozesspool für die Nachbearbeitung aller Rigs."""
+        with self.lock:
+            if self.executor is None:
+                workers = self.processing_workers or config_manager.get('processing.workers') or os.cpu_count()
+                # Kein fork aus einem Prozess mit laufenden Threads (Flask, Rig-Worker)
+                self.executor = ProcessPoolExecutor(max_workers=workers,
+                                                    mp_context=multiprocessing.get_context('spawn'))
+            return self.executor
+
+    def status(self):
+        """Liefert den Zustand aller Rigs."""
+        return [rig.status() for rig in self.list()]
+
+    def shutdown(self):
+        """Gibt alle Geräte und den Prozesspool frei."""
+        with self.lock:
+            for rig in (self.rigs or {}).values():
+                rig.close()
+            if self.executor is not None:
+                self.executor.shutdown(wait=False)
+                self.executor = None
+
+
+class RemoteRig:
+    """Ein Rig im Hardware-Broker (gleiche Schnittstelle wie Rig)."""
+
+    def __init__(self, client, rig_id):
+        self.client = client
+        self.id = rig_id
+
+    def start_session(self, name=None, angle_step=None, project_id=None, resume=None):
+        return self.client.call('start_rig_session', rig_id=self.id, name=name, angle_step=angle_step,
+                                project_id=project_id, resume=resume)
+
+    def stop(self):
+        return self.client.call('stop_rig_session', rig_id=self.id)
+
+    def status(self):
+        return self.client.call('rig_status', rig_id=self.id)
+
+
+class RemoteRigRegistry:
+    """Zugriff auf die Rigs im Hardware-Broker (gleiche Schnittstelle wie RigRegistry)."""
+
+    def __init__(self, client):
+        """
+        Initialisiert die Registry.
+
+        Args:
+            client: HardwareClient des Brokers
+        """
+        self.client = client
+
+    def get(self, rig_id):
+        """Gibt ein Rig anhand seiner ID zurück (oder None)."""
+        if self.client.call('rig_status', rig_id=rig_id) is None:
+            return None
+        return RemoteRig(self.client, rig_id)
+
+    def list(self):
+        """Gibt alle Rigs zurück."""
+        return [RemoteRig(self.client, rig['id']) for rig in self.status()]
+
+    def status(self):
+        """Liefert den Zustand aller Rigs."""
+        return self.client.call('rigs')
+
+
+# Globale Instanz für die Anwendung
+rig_registry = RigRegistry()
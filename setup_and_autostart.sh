@@ -227,7 +227,7 @@ After=network.target
 [Service]
 User=${REAL_USER}
 WorkingDirectory=${PROJECT_DIR}
-ExecStart=${PROJECT_DIR}/myenv/bin/python ${PROJECT_DIR}/web.py
+ExecStart=${PROJECT_DIR}/myenv/bin/python ${PROJECT_DIR}/main.py --production
 Restart=always
 Environment="PATH=${PROJECT_DIR}/myenv/bin:/usr/local/bin:/usr/bin:/bin"
 Environment="PYTHONPATH=${PROJECT_DIR}"
@@ -262,12 +262,39 @@ server {
         proxy_set_header X-Forwarded-Proto \$scheme;
     }
 
-    location /static {
-        alias ${PROJECT_DIR}/static;
+    # Nur Stylesheets und Skripte direkt ausliefern; Fotos und Projekte
+    # prüft die Anwendung (Papierkorb, Cache-Header) und gibt sie per
+    # X-Accel-Redirect frei
+    location /static/css/ {
+        alias ${PROJECT_DIR}/static/css/;
+    }
+
+    location /static/js/ {
+        alias ${PROJECT_DIR}/static/js/;
+    }
+
+    # Gelöschte Projekte im Papierkorb sind nie abrufbar
+    location ^~ /static/projects/.trash {
+        return 404;
+    }
+
+    # Von der Anwendung per X-Accel-Redirect freigegebene Dateien
+    location /protected-static/ {
+        internal;
+        alias ${PROJECT_DIR}/static/;
     }
 }
 EOL
 
+    # Dateiauslieferung an Nginx abgeben
+    su - $REAL_USER -c "cd $PROJECT_DIR && source myenv/bin/activate && python - << 'EOL'
+from config_manager import config_manager
+web = dict(config_manager.config.get('web', {}))
+web['file_offload'] = 'x-accel-redirect'
+config_manager.config['web'] = web
+config_manager.save_config()
+EOL"
+
     # Aktiviere die Konfiguration
     ln -sf /etc/nginx/sites-available/drehteller360 /etc/nginx/sites-enabled/
     rm -f /etc/nginx/sites-enabled/default
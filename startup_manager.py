@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Modul zur verzögerten Initialisierung langsamer Dienste beim Programmstart.
+Kamera-Suche, Arduino-Verbindung und Beispielbilder werden erst bei Bedarf
+bzw. im Hintergrund initialisiert, damit der Webserver sofort Anfragen annimmt.
+"""
+
+import time
+import logging
+import threading
+
+# Logger konfigurieren
+logger = logging.getLogger("drehteller360.startup")
+
+
+class LazyService:
+    """Ein Dienst, der beim ersten Zugriff (oder im Hintergrund) initialisiert wird."""
+
+    PENDING = 'pending'
+    INITIALIZING = 'initializing'
+    READY = 'ready'
+    FAILED = 'failed'
+
+    def __init__(self, name, factory):
+        """
+        Initialisiert den Dienst.
+
+        Args:
+            name: Name des Dienstes
+            factory: Funktion ohne Argumente, die die Dienstinstanz erzeugt
+        """
+        self.name = name
+        self.factory = factory
+        self.instance = None
+        self.status = self.PENDING
+        self.error = None
+        self.started_at = None
+        self.duration = None
+        self.lock = threading.Lock()
+
+    def get(self):
+        """Gibt die Dienstinstanz zurück und initialisiert sie bei Bedarf."""
+        if self.status == self.READY:
+            return self.instance
+
+        with self.lock:
+            # Ein anderer Thread könnte die Initialisierung inzwischen abgeschlossen haben
+            if self.status in (self.READY, self.FAILED):
+                return self.instance
+
+            self.status = self.INITIALIZING
+            self.started_at = time.time()
+            try:
+                self.instance = self.factory()
+                self.status = self.READY
+            except Exception as e:
+                logger.error(f"Initialisierung von {self.name} fehlgeschlagen: {e}")
+                self.error = str(e)
+                self.status = self.FAILED
+            finally:
+                self.duration = time.time() - self.started_at
+
+            logger.info(f"Dienst {self.name}: {self.status} nach {self.duration:.3f} s")
+            return self.instance
+
+    def reset(self):
+        """Setzt den Dienst zurück, damit er beim nächsten Zugriff neu initialisiert wird."""
+        with self.lock:
+            self.instance = None
+            self.status = self.PENDING
+            self.error = None
+            self.started_at = None
+            self.duration = None
+
+    def to_dict(self):
+        """Status des Dienstes als Dictionary"""
+        return {
+            'status': self.status,
+            'error': self.error,
+            'duration': self.duration
+        }
+
+
+class StartupManager:
+    """Verwaltet verzögert initialisierte Dienste und misst die Startzeit."""
+
+    def __init__(self):
+        """Initialisiert den Startup-Manager."""
+        self.started_at = time.time()
+        self.services = {}
+        self.phases = []
+        self.warm_up_started = False
+
+    def register(self, name, factory):
+        """
+        Registriert einen Dienst.
+
+        Args:
+            name: Name des Dienstes
+            factory: Funktion ohne Argumente, die die Dienstinstanz erzeugt
+
+        Returns:
+            LazyService
+        """
+        service = LazyService(name, factory)
+        self.services[name] = service
+        return service
+
+    def get(self, name):
+        """Gibt die Instanz eines Dienstes zurück (initialisiert sie bei Bedarf)."""
+        return self.services[name].get()
+
+    def mark(self, phase):
+        """Merkt sich die seit dem Start vergangene Zeit für eine Startphase."""
+        elapsed = time.time() - self.started_at
+        self.phases.append({'phase': phase, 'elapsed': elapsed})
+        logger.info(f"Startphase {phase}: {elapsed:.3f} s")
+
+    def warm_up(self, names=None):
+        """
+        Initialisiert Dienste in Hintergrund-Threads vor.
+
+        Args:
+            names: Optionale Liste von Dienstnamen (Standard: alle)
+        """
+        if self.warm_up_started:
+            return
+        self.warm_up_started = True
+
+        for name in names or list(self.services.keys()):
+            service = self.services[name]
+            thread = threading.Thread(target=service.get, name=f"warmup-{name}", daemon=True)
+            thread.start()
+
+    def is_ready(self):
+        """Prüft, ob alle Dienste initialisiert sind (erfolgreich oder fehlgeschlagen)."""
+        return all(s.status in (LazyService.READY, LazyService.FAILED)
+                   for s in self.services.values())
+
+    def report(self):
+        """Liefert einen Bericht über Startphasen und Dienst-Initialisierung."""
+        return {
+            'ready': self.is_ready(),
+            'uptime': time.time() - self.started_at,
+            'phases': list(self.phases),
+            'services': {name: s.to_dict() for name, s in self.services.items()}
+        }
+
+
+# Globale Instanz für die Anwendung
+startup_manager = StartupManager()
@@ -9,11 +9,62 @@ const progressBar = document.getElementById('rotation-progress');
 const rotationStatus = document.getElementById('rotation-status');
 const capturedImage = document.getElementById('captured-image');
 const manualRotationForm = document.getElementById('manual-rotation-form');
+const livePreviewToggle = document.getElementById('live-preview-toggle');
 
 // Rotation state
 let isRotating = false;
 let rotationAborted = false;
 
+// Live preview state (last photo is shown again when the preview stops)
+let livePreviewActive = false;
+let lastPhotoSrc = capturedImage.src;
+
+// Live-Vorschau ein-/ausschalten (MJPEG-Stream direkt im Bild)
+function setLivePreview(active) {
+    livePreviewActive = active;
+    if (active) {
+        lastPhotoSrc = capturedImage.src;
+        capturedImage.src = '/camera/preview.mjpg';
+    } else {
+        // Neues src beendet den Stream
+        capturedImage.src = lastPhotoSrc;
+    }
+    livePreviewToggle.classList.toggle('active', active);
+}
+
+// Show a captured photo (ends a running live preview)
+function showPhoto(src) {
+    lastPhotoSrc = src;
+    if (livePreviewActive) {
+        setLivePreview(false);
+    } else {
+        capturedImage.src = src;
+    }
+}
+
+// Schritt der Serie senden; ist die Warteschlange voll (429), nach
+// Retry-After mit derselben request_id erneut versuchen
+async function postRotationStep(body) {
+    const maxAttempts = 30;
+    for (let attempt = 1; ; attempt++) {
+        const response = await fetch('/rotate', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/x-www-form-urlencoded',
+            },
+            body: body
+        });
+
+        if (response.status !== 429 || attempt >= maxAttempts || rotationAborted) {
+            return response;
+        }
+
+        const retryAfter = parseFloat(response.headers.get('Retry-After')) || 2;
+        rotationStatus.textContent = `Drehteller belegt, neuer Versuch in ${retryAfter} s...`;
+        await new Promise(resolve => setTimeout(resolve, retryAfter * 1000));
+    }
+}
+
 // 360° Rotation Function
 async function start360Rotation() {
     const interval = parseInt(rotationIntervalInput.value);
@@ -32,6 +83,9 @@ async function start360Rotation() {
     progressBar.style.width = '0%';
     progressBar.classList.add('progress-bar-animated');
 
+    // Eindeutige Kennung der Serie (Wiederholungen werden nicht doppelt ausgeführt)
+    const sessionId = `${Date.now()}-${Math.random().toString(36).slice(2, 10)}`;
+
     try {
         for (let i = 0; i < totalRotations; i++) {
             // Check if rotation was aborted
@@ -45,13 +99,14 @@ async function start360Rotation() {
             rotationStatus.textContent = `Foto ${i + 1} von ${totalRotations}`;
 
             // Send rotation and photo capture request
-            const response = await fetch('/rotate', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/x-www-form-urlencoded',
-                },
-                body: `degrees=${stepDegrees}&interval=${interval}`
-            });
+            // Serienaufnahme: manuelle Befehle anderer Nutzer haben Vorrang
+            const response = await postRotationStep(
+                `degrees=${stepDegrees}&interval=${interval}&priority=batch&request_id=${sessionId}-${i}`);
+
+            // Abbruch während des Wartens auf die Warteschlange
+            if (response.status === 429 && rotationAborted) {
+                break;
+            }
 
             // Check if request was successful
             if (!response.ok) {
@@ -60,7 +115,7 @@ async function start360Rotation() {
 
             // Update image source with the latest photo
             const result = await response.text();
-            capturedImage.src = result; // Assuming the response contains the photo path
+            showPhoto(result); // Assuming the response contains the photo path
 
             // Wait for the specified interval
             await new Promise(resolve => setTimeout(resolve, interval * 1000));
@@ -109,7 +164,7 @@ manualRotationForm.addEventListener('submit', async (e) => {
         });
 
         const result = await response.text();
-        capturedImage.src = result; // Update image with latest photo
+        showPhoto(result); // Update image with latest photo
     } catch (error) {
         console.error('Rotation error:', error);
     }
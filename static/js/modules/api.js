@@ -1,13 +1,21 @@
 // api.js - Modul für API-Kommunikation
 const api = {
-    // Projekte abrufen
+    // Projekte abrufen (alle Seiten der Projektliste nacheinander)
     getProjects: async function() {
         try {
-            const response = await fetch('/api/projects');
-            if (!response.ok) {
-                throw new Error(`HTTP-Fehler: ${response.status}`);
+            const projects = [];
+            let url = '/api/projects?limit=500';
+            while (url) {
+                const response = await fetch(url);
+                if (!response.ok) {
+                    throw new Error(`HTTP-Fehler: ${response.status}`);
+                }
+                projects.push(...await response.json());
+
+                const cursor = response.headers.get('X-Next-Cursor');
+                url = cursor ? `/api/projects?limit=500&cursor=${encodeURIComponent(cursor)}` : null;
             }
-            return await response.json();
+            return projects;
         } catch (error) {
             console.error('API-Fehler beim Abrufen der Projekte:', error);
             throw error;
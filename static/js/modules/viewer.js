@@ -51,7 +51,7 @@ const viewer = {
                 throw new Error('Keine Bilder im Projekt gefunden');
             }
             
-            this.config.images = projectData.images.map(img => `/static/projects/${projectId}/${img}`);
+            this.config.images = projectData.image_urls || projectData.images.map(img => `/static/projects/${projectId}/${img}`);
             
             // UI erstellen
             this.createViewerUI();
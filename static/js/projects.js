@@ -16,8 +16,19 @@ document.addEventListener('DOMContentLoaded', () => {
     // Projekte laden
     async function loadProjects() {
         try {
-            const response = await fetch('/api/projects');
-            const projects = await response.json();
+            // Projekte seitenweise und nur mit den benötigten Feldern laden
+            const projects = [];
+            let url = '/api/projects?limit=100&fields=id,name,created,image_count,cover';
+            while (url) {
+                const response = await fetch(url);
+                if (!response.ok) {
+                    throw new Error(`HTTP-Fehler: ${response.status}`);
+                }
+                projects.push(...await response.json());
+
+                const cursor = response.headers.get('X-Next-Cursor');
+                url = cursor ? `/api/projects?limit=100&fields=id,name,created,image_count,cover&cursor=${encodeURIComponent(cursor)}` : null;
+            }
             
             // Loading-Element entfernen
             if (loadingElement) {
@@ -71,10 +82,12 @@ document.addEventListener('DOMContentLoaded', () => {
         const imageCountElement = projectElement.querySelector('.project-image-count');
         const viewButton = projectElement.querySelector('.view-btn');
         const deleteButton = projectElement.querySelector('.delete-btn');
+        const exportButton = projectElement.querySelector('.export-btn');
         
         // Thumbnail setzen (erstes Bild im Projekt)
-        if (project.images && project.images.length > 0) {
-            thumbnailElement.style.backgroundImage = `url('/static/projects/${project.id}/${project.images[0]}')`;
+        const cover = project.cover || (project.images && project.images[0]);
+        if (cover) {
+            thumbnailElement.style.backgroundImage = `url('/static/projects/${project.id}/${cover}')`;
         }
         
         // Projektname setzen
@@ -91,6 +104,11 @@ document.addEventListener('DOMContentLoaded', () => {
         // Link zum Viewer
         viewButton.href = `/viewer?project=${project.id}`;
         
+        // ZIP-Export (wird beim Herunterladen erzeugt)
+        if (exportButton) {
+            exportButton.href = `/api/project/${encodeURIComponent(project.id)}/export.zip`;
+        }
+        
         // Lösch-Button
         if (deleteButton) {
             deleteButton.addEventListener('click', (e) => {
@@ -0,0 +1,98 @@
+// rigs.js - Steuerung mehrerer Drehteller-Stationen
+document.addEventListener('DOMContentLoaded', () => {
+    // DOM-Elemente
+    const rigsContainer = document.getElementById('rigs-container');
+    const noRigsElement = document.getElementById('no-rigs');
+    const rigTemplate = document.getElementById('rig-template');
+
+    // Karten je Rig-ID
+    const rigCards = {};
+
+    const stateLabels = {
+        queued: ['wartet', 'bg-info'],
+        capturing: ['Aufnahme läuft', 'bg-primary'],
+        processing: ['Nachbearbeitung', 'bg-warning'],
+        completed: ['abgeschlossen', 'bg-success'],
+        failed: ['fehlgeschlagen', 'bg-danger']
+    };
+
+    // Karte für ein Rig anlegen
+    function createRigCard(rig) {
+        const card = rigTemplate.content.cloneNode(true).firstElementChild;
+        card.querySelector('.rig-name').textContent = rig.name;
+        card.querySelector('.rig-devices').textContent =
+            `${rig.id} · ${rig.arduino_port || '-'} · ${rig.camera_device || '-'}`;
+
+        card.querySelector('.rig-start').addEventListener('click', () => startSession(rig.id, card));
+        card.querySelector('.rig-stop').addEventListener('click', () => stopSession(rig.id));
+
+        rigsContainer.appendChild(card);
+        rigCards[rig.id] = card;
+        return card;
+    }
+
+    // Zustand eines Rigs anzeigen
+    function updateRigCard(rig) {
+        const card = rigCards[rig.id] || createRigCard(rig);
+        const state = card.querySelector('.rig-state');
+        const progressBar = card.querySelector('.rig-progress');
+
+        const session = rig.session;
+        const [label, badge] = session ? stateLabels[session.state] : ['bereit', 'bg-secondary'];
+        state.textContent = session && session.error ? `${label}: ${session.error}` : label;
+        state.className = `rig-state badge ${badge}`;
+
+        if (rig.progress) {
+            progressBar.style.width = `${Math.round(rig.progress.step / rig.progress.total * 100)}%`;
+            progressBar.textContent = `${rig.progress.angle}°`;
+        } else {
+            progressBar.style.width = session && session.state === 'completed' ? '100%' : '0%';
+            progressBar.textContent = '';
+        }
+
+        card.querySelector('.rig-start').disabled = rig.busy;
+        card.querySelector('.rig-stop').disabled = !rig.busy;
+    }
+
+    // Session auf einem Rig starten
+    async function startSession(rigId, card) {
+        const name = card.querySelector('.rig-project-name').value.trim();
+        const angleStep = card.querySelector('.rig-angle-step').value;
+
+        const response = await fetch(`/api/rigs/${encodeURIComponent(rigId)}/session`, {
+            method: 'POST',
+            headers: {'Content-Type': 'application/json'},
+            body: JSON.stringify({name: name || null, angle_step: angleStep || null})
+        });
+        if (!response.ok) {
+            const result = await response.json();
+            alert(result.error || `HTTP-Fehler: ${response.status}`);
+        }
+        loadRigs();
+    }
+
+    // Laufende Session abbrechen
+    async function stopSession(rigId) {
+        await fetch(`/api/rigs/${encodeURIComponent(rigId)}/stop`, {method: 'POST'});
+        loadRigs();
+    }
+
+    // Zustand aller Rigs laden
+    async function loadRigs() {
+        try {
+            const response = await fetch('/api/rigs');
+            if (!response.ok) {
+                throw new Error(`HTTP-Fehler: ${response.status}`);
+            }
+            const rigs = await response.json();
+
+            noRigsElement.classList.toggle('d-none', rigs.length > 0);
+            rigs.forEach(updateRigCard);
+        } catch (error) {
+            console.error('Fehler beim Laden der Rigs:', error);
+        }
+    }
+
+    loadRigs();
+    setInterval(loadRigs, 2000);
+});
@@ -338,3 +338,31 @@ document.getElementById('settings-form').addEventListener('submit', async (e) =>
         }
     }
 });
+
+// Aufnahmemodus der Webcam optimieren
+const cameraAutoTuneBtn = document.getElementById('camera-auto-tune');
+const cameraAutoTuneResult = document.getElementById('camera-auto-tune-result');
+
+cameraAutoTuneBtn.addEventListener('click', async () => {
+    cameraAutoTuneBtn.disabled = true;
+    cameraAutoTuneResult.textContent = 'Teste Aufnahmemodi, bitte warten...';
+
+    try {
+        const response = await fetch('/camera/auto_tune', { method: 'POST' });
+        const data = await response.json();
+
+        if (response.ok && data.status === 'success') {
+            const mode = data.profile.mode;
+            cameraAutoTuneResult.textContent = `Profil gespeichert: ${mode.pixel_format} ` +
+                `${mode.width}x${mode.height}, ${mode.buffers} Puffer, ` +
+                `${data.profile.fps.toFixed(1)} fps`;
+        } else {
+            cameraAutoTuneResult.textContent = 'Fehler: ' + (data.message || 'Unbekannter Fehler');
+        }
+    } catch (error) {
+        console.error('Fehler bei der Optimierung des Aufnahmemodus:', error);
+        cameraAutoTuneResult.textContent = 'Verbindungsfehler: ' + error.message;
+    } finally {
+        cameraAutoTuneBtn.disabled = false;
+    }
+});
@@ -45,7 +45,7 @@ document.addEventListener('DOMContentLoaded', function() {
             spinner.style.display = 'none';
             
             // Bilder in den Viewer laden
-            const images = projectData.images.map(img => `/static/projects/${projectId}/${img}`);
+            const images = projectData.image_urls || projectData.images.map(img => `/static/projects/${projectId}/${img}`);
             console.log('Bildpfade:', images);
             
             // Erstelle Bilder-Container
@@ -205,7 +205,7 @@ document.addEventListener('DOMContentLoaded', function() {
                     fetch(`/api/project/${projectId}`)
                         .then(response => response.json())
                         .then(projectData => {
-                            const images = projectData.images.map(img => `/static/projects/${projectId}/${img}`);
+                            const images = projectData.image_urls || projectData.images.map(img => `/static/projects/${projectId}/${img}`);
                             currentIndex = (currentIndex + 1) % images.length;
                             mainImage.src = images[currentIndex];
                         });
@@ -59,7 +59,7 @@ async function loadProject() {
         imageCountElement.textContent = projectData.image_count || projectData.images.length;
         
         // Bilder laden
-        config.images = projectData.images.map(img => `/static/projects/${projectId}/${img}`);
+        config.images = projectData.image_urls || projectData.images.map(img => `/static/projects/${projectId}/${img}`);
         console.log("Bildpfade:", config.images);
         
         if (config.images.length > 0) {
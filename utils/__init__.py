@@ -3,7 +3,9 @@
 
 from .arduino_finder import ArduinoFinder
 from .camera_finder import CameraFinder
-from .image_processor import ImageProcessor
-from .path_manager import PathManager
+from .content_hash import ContentHashCache, hash_bytes
+from .frame_cache import FrameCache
+from .strip_processor import StripProcessor
+from .zip_stream import ZipStream
 
-__all__ = ['ArduinoFinder', 'CameraFinder', 'ImageProcessor', 'PathManager']
\ No newline at end of file
+__all__ = ['ArduinoFinder', 'CameraFinder', 'ContentHashCache', 'FrameCache', 'StripProcessor', 'ZipStream', 'hash_bytes']
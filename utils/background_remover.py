@@ -2,23 +2,50 @@
 # Modul für KI-basierte Hintergrundentfernung mit NVIDIA-Unterstützung
 
 import os
+import time
 import logging
 import numpy as np
 import cv2
 import torch
 from pathlib import Path
 
+from .strip_processor import StripProcessor
+from metrics import record_processing_stage
+
 
 class BackgroundRemover:
     """Klasse zur KI-basierten Entfernung des Hintergrunds von Bildern"""
 
-    def __init__(self):
-        """Initialisiert den BackgroundRemover"""
+    # Vordefinierte Schlüsselfarben (BGR) für typische Hohlkehlen
+    CHROMA_KEY_PRESETS = {
+        'green': (64, 177, 0),
+        'blue': (187, 71, 0),
+        'white': (255, 255, 255)
+    }
+
+    def __init__(self, low_memory=False, memory_budget_mb=64):
+        """Initialisiert den BackgroundRemover
+
+        Args:
+            low_memory: Masken und Compositing in Streifen berechnen (für große
+                DSLR-Bilder auf Geräten mit wenig Arbeitsspeicher)
+            memory_budget_mb: Speicherbudget für die Arbeitspuffer im Streifenmodus
+        """
         self.logger = logging.getLogger(__name__)
         self.device = 'cuda' if torch.cuda.is_available() else 'cpu'
         self.model = None
         self.initialized = False
 
+        # Speichersparender Streifenmodus
+        self.low_memory = low_memory
+        self.strip_processor = StripProcessor(memory_budget_mb) if low_memory else None
+
+        # Chroma-Key-Lookup-Tabelle (wird einmal pro Session berechnet)
+        self.chroma_lut = None
+        self.chroma_lut_bits = 6
+        self.chroma_key_params = None
+        self.chroma_spill_channel = None
+
         # Wenn CUDA verfügbar ist, sofort initialisieren
         if self.device == 'cuda':
             self.logger.info("NVIDIA GPU erkannt, verwende CUDA für KI-Verarbeitung")
@@ -69,17 +96,23 @@ class BackgroundRemover:
 
         self.logger.error("Keines der Segmentierungsmodelle konnte initialisiert werden")
 
+    def _load_image(self, image_path, frame_cache=None):
+        """Lädt ein Bild aus dem Frame-Cache (falls vorhanden) oder von der Festplatte"""
+        if frame_cache is not None and image_path in frame_cache:
+            return frame_cache.get(image_path)
+        return cv2.imread(image_path)
+
     def is_available(self):
         """Prüft, ob die Hintergrundentfernung verfügbar ist"""
         if not self.initialized and self.device == 'cuda':
             self._initialize_model()
         return self.initialized
 
-    def remove_background_with_reference(self, image_path, reference_path, output_path):
+    def remove_background_with_reference(self, image_path, reference_path, output_path, frame_cache=None):
         """Entfernt den Hintergrund mit einem Referenzbild (Hintergrund ohne Objekt)"""
         try:
             # Bilder laden
-            image = cv2.imread(image_path)
+            image = self._load_image(image_path, frame_cache)
             reference = cv2.imread(reference_path)
 
             if image is None or reference is None:
@@ -88,29 +121,226 @@ class BackgroundRemover:
 
             # Stellen Sie sicher, dass die Bilder die gleiche Größe haben
             if image.shape != reference.shape:
-                reference = cv2.resize(reference, (image.shape[1], image.shape[0]))
+                size = (image.shape[1], image.shape[0])
+                if self.low_memory:
+                    reference = self.strip_processor.resize(reference, size, cv2.INTER_LINEAR)
+                else:
+                    reference = cv2.resize(reference, size)
+
+            if self.low_memory:
+                # Maske und Compositing streifenweise mit wiederverwendeten Puffern
+                strips = self.strip_processor
+                mask = np.empty(image.shape[:2], dtype=np.uint8)
+                strips.map_strips(lambda parts, rows: self._reference_mask(parts[0], parts[1], strips),
+                                  [image, reference], mask)
+                rgba_image = strips.composite_alpha(image, mask)
+            else:
+                mask = self._reference_mask(image, reference)
+
+                # Bild mit transparentem Hintergrund
+                rgba_image = cv2.cvtColor(image, cv2.COLOR_BGR2BGRA)
+                rgba_image[:, :, 3] = mask
+
+            # Ergebnis speichern
+            output_dir = os.path.dirname(output_path)
+            os.makedirs(output_dir, exist_ok=True)
+
+            cv2.imwrite(output_path, rgba_image)
 
-            # Differenzbild berechnen
-            diff = cv2.absdiff(image, reference)
+            self.logger.info(f"Hintergrund mit Referenzbild entfernt und gespeichert: {output_path}")
+            return True
 
-            # Schwellenwertbildung für die Maske
-            gray_diff = cv2.cvtColor(diff, cv2.COLOR_BGR2GRAY)
-            _, mask = cv2.threshold(gray_diff, 30, 255, cv2.THRESH_BINARY)
+        except Exception as e:
+            self.logger.error(f"Fehler bei der Hintergrundentfernung mit Referenz: {str(e)}")
+            return False
 
-            # Rauschen aus der Maske entfernen
-            mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, np.ones((5, 5), np.uint8))
-            mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, np.ones((10, 10), np.uint8))
+    def build_chroma_key_lut(self, key_color='green', tolerance=40, softness=20,
+                             spill_suppression=0.5, bits=6):
+        """Berechnet die 3D-Farbtabelle (BGR -> Alpha) für das Chroma-Keying
+
+        Die Tabelle wird nur neu berechnet, wenn sich die Parameter ändern, und
+        kann daher für alle Bilder einer Session wiederverwendet werden.
+
+        Args:
+            key_color: Schlüsselfarbe als BGR-Tupel oder Name aus CHROMA_KEY_PRESETS
+            tolerance: Farbabstand (YCrCb), bis zu dem ein Pixel voll transparent ist
+            softness: Breite des Übergangs von transparent zu deckend
+            spill_suppression: Stärke der Farbsaum-Unterdrückung (0.0 - 1.0)
+            bits: Quantisierung pro Farbkanal (6 Bit = 64^3 Farben)
+
+        Returns:
+            Lookup-Tabelle als flaches uint8-Array, indiziert mit den gepackten
+            Kanälen (b | g << 8 | r << 16), jeweils um 8 - bits nach rechts
+            geschoben (6 Bit: 4 MB, davon 64^3 Einträge belegt)
+        """
+        if isinstance(key_color, str):
+            key_color = self.CHROMA_KEY_PRESETS.get(key_color.lower(), self.CHROMA_KEY_PRESETS['green'])
+        key_color = tuple(int(c) for c in key_color)
+
+        params = (key_color, float(tolerance), float(softness), float(spill_suppression), int(bits))
+        if self.chroma_lut is not None and params == self.chroma_key_params:
+            return self.chroma_lut
+
+        levels = 1 << bits
+        step = 256 // levels
+
+        # Alle quantisierten Farben (Zellmitte) als Bild mit einer Zeile darstellen
+        values = np.arange(levels, dtype=np.uint16) * step + step // 2
+        b, g, r = np.meshgrid(values, values, values, indexing='ij')
+        colors = np.stack([b, g, r], axis=-1).reshape(1, -1, 3).astype(np.uint8)
+
+        ycrcb = cv2.cvtColor(colors, cv2.COLOR_BGR2YCrCb).reshape(-1, 3).astype(np.float32)
+        key_ycrcb = cv2.cvtColor(np.uint8([[key_color]]), cv2.COLOR_BGR2YCrCb).reshape(3).astype(np.float32)
+
+        # Bei unbunten Schlüsselfarben (weiß/grau) entscheidet die Helligkeit,
+        # bei bunten Schlüsselfarben überwiegend die Chrominanz
+        key_chroma = np.hypot(key_ycrcb[1] - 128.0, key_ycrcb[2] - 128.0)
+        luma_weight = 1.0 if key_chroma < 20 else 0.25
+
+        delta = ycrcb - key_ycrcb
+        distance = np.sqrt((luma_weight * delta[:, 0]) ** 2 + delta[:, 1] ** 2 + delta[:, 2] ** 2)
+
+        alpha = (distance - tolerance) / max(float(softness), 1e-6)
+
+        # Einträge an die Position des gepackten Pixels legen, damit die Maske
+        # ohne Aufteilen der Kanäle berechnet werden kann
+        quantized = np.arange(levels, dtype=np.uint32)
+        qb, qg, qr = np.meshgrid(quantized, quantized, quantized, indexing='ij')
+        lut = np.zeros(((levels - 1) * 0x010101) + 1, dtype=np.uint8)
+        lut[(qb | qg << 8 | qr << 16).reshape(-1)] = (np.clip(alpha, 0.0, 1.0) * 255.0 + 0.5).astype(np.uint8)
+
+        # Farbsaum-Unterdrückung nur für bunte Schlüsselfarben (dominanter Kanal)
+        if key_chroma >= 20 and spill_suppression > 0:
+            self.chroma_spill_channel = int(np.argmax(key_color))
+        else:
+            self.chroma_spill_channel = None
+
+        self.chroma_lut = lut
+        self.chroma_lut_bits = bits
+        self.chroma_key_params = params
+
+        self.logger.info("Chroma-Key-Tabelle berechnet: Schlüsselfarbe %s, Toleranz %s, %d Einträge",
+                         key_color, tolerance, levels ** 3)
+        return lut
+
+    def compute_chroma_key_mask(self, image):
+        """Berechnet die Alpha-Maske eines BGR-Bildes per Tabellen-Lookup
+
+        Jedes Pixel wird als 32-Bit-Wert (b, g, r und das erste Byte des
+        nächsten Pixels) direkt aus dem Bildpuffer gelesen, verschoben und
+        maskiert; das ergibt ohne Aufteilen der Kanäle den Tabellenindex.
+        """
+        if self.chroma_lut is None:
+            self.build_chroma_key_lut()
+
+        shift = 8 - self.chroma_lut_bits
+        channel_mask = ((1 << self.chroma_lut_bits) - 1) * 0x010101
+
+        height, width = image.shape[:2]
+        pixels = height * width
+        data = np.ascontiguousarray(image).reshape(-1)
+
+        # Überlappende Ansicht mit 3 Byte Abstand; dem letzten Pixel fehlt das
+        # vierte Byte, es wird einzeln gepackt
+        index = np.empty(pixels, dtype=np.uint32)
+        if pixels > 1:
+            packed = np.ndarray((pixels - 1,), dtype='<u4', buffer=data, strides=(3,))
+            np.right_shift(packed, shift, out=index[:-1])
+        blue, green, red = (int(value) >> shift for value in data[-3:])
+        index[-1] = blue | green << 8 | red << 16
+        index &= channel_mask
+
+        return self.chroma_lut[index].reshape(height, width)
+
+    def suppress_spill(self, image, mask):
+        """Reduziert Farbsäume der Schlüsselfarbe an den Objektkanten (in-place)"""
+        channel = self.chroma_spill_channel
+        if channel is None:
+            return image
+
+        strength = self.chroma_key_params[3]
+        others = [c for c in range(3) if c != channel]
+        limit = np.maximum(image[:, :, others[0]], image[:, :, others[1]])
+        key_channel = image[:, :, channel]
+
+        # Nur Pixel betreffen, die sichtbar sind und in dem Schlüsselkanal überwiegen
+        spill = (mask > 0) & (key_channel > limit)
+        if strength >= 1.0:
+            key_channel[spill] = limit[spill]
+        else:
+            reduced = key_channel[spill] - strength * (key_channel[spill].astype(np.float32) - limit[spill])
+            key_channel[spill] = reduced.astype(np.uint8)
+
+        return image
 
-            # Maske erweitern
-            mask = cv2.dilate(mask, np.ones((5, 5), np.uint8), iterations=2)
+    def _reference_mask(self, image, reference, strips=None):
+        """Berechnet die Vordergrundmaske aus Bild und Referenzbild
+
+        Mit einem StripProcessor werden dessen vorab angelegte Puffer verwendet,
+        sonst werden die Zwischenergebnisse neu angelegt.
+        """
+        if strips is not None:
+            buffer = strips.buffer
+        else:
+            buffer = lambda name, shape: np.empty(shape, dtype=np.uint8)
 
-            # Maske als 3-Kanal-Bild für die Verwendung mit transparentem Hintergrund
-            rgba_mask = cv2.cvtColor(mask, cv2.COLOR_GRAY2BGRA)
-            rgba_mask[:, :, 3] = mask
+        # Differenzbild berechnen
+        diff = buffer('diff', image.shape)
+        cv2.absdiff(image, reference, dst=diff)
 
-            # Bild mit transparentem Hintergrund
-            rgba_image = cv2.cvtColor(image, cv2.COLOR_BGR2BGRA)
-            rgba_image[:, :, 3] = mask
+        # Schwellenwertbildung für die Maske
+        mask = buffer('mask', image.shape[:2])
+        work = buffer('work', image.shape[:2])
+        cv2.cvtColor(diff, cv2.COLOR_BGR2GRAY, dst=mask)
+        cv2.threshold(mask, 30, 255, cv2.THRESH_BINARY, dst=mask)
+
+        # Rauschen aus der Maske entfernen
+        cv2.morphologyEx(mask, cv2.MORPH_OPEN, np.ones((5, 5), np.uint8), dst=work)
+        cv2.morphologyEx(work, cv2.MORPH_CLOSE, np.ones((10, 10), np.uint8), dst=mask)
+
+        # Maske erweitern
+        cv2.dilate(mask, np.ones((5, 5), np.uint8), dst=work, iterations=2)
+
+        return work
+
+    def remove_background_with_chroma_key(self, image_path, output_path, key_color=None, tolerance=None,
+                                          softness=None, spill_suppression=None, frame_cache=None):
+        """Entfernt einen einfarbigen Hintergrund (Green-Screen oder weiße Hohlkehle)"""
+        try:
+            # Tabelle nur bei geänderten Parametern neu berechnen
+            if any(v is not None for v in (key_color, tolerance, softness, spill_suppression)) \
+                    or self.chroma_lut is None:
+                current = self.chroma_key_params or (None, 40.0, 20.0, 0.5, 6)
+                self.build_chroma_key_lut(
+                    key_color=key_color if key_color is not None else (current[0] or 'green'),
+                    tolerance=tolerance if tolerance is not None else current[1],
+                    softness=softness if softness is not None else current[2],
+                    spill_suppression=spill_suppression if spill_suppression is not None else current[3],
+                    bits=current[4]
+                )
+
+            image = self._load_image(image_path, frame_cache)
+
+            if image is None:
+                self.logger.error(f"Konnte Bild nicht laden: {image_path}")
+                return False
+
+            if self.low_memory:
+                # Punktweise Operationen: Streifen ohne Überlappung
+                strips = self.strip_processor
+                mask = np.empty(image.shape[:2], dtype=np.uint8)
+                strips.map_strips(lambda parts, rows: self.compute_chroma_key_mask(parts[0]),
+                                  [image], mask, halo=0, bytes_per_pixel=7)
+                rgba_image = strips.composite_alpha(image, mask)
+                for start, end, _, _ in strips.iter_strips(image.shape[0], strips.strip_height(image.shape[1]), 0):
+                    self.suppress_spill(rgba_image[start:end], mask[start:end])
+            else:
+                mask = self.compute_chroma_key_mask(image)
+
+                # Bild mit transparentem Hintergrund (Farbsaum auf der Kopie entfernen)
+                rgba_image = cv2.cvtColor(image, cv2.COLOR_BGR2BGRA)
+                rgba_image[:, :, 3] = mask
+                self.suppress_spill(rgba_image, mask)
 
             # Ergebnis speichern
             output_dir = os.path.dirname(output_path)
@@ -118,14 +348,14 @@ class BackgroundRemover:
 
             cv2.imwrite(output_path, rgba_image)
 
-            self.logger.info(f"Hintergrund mit Referenzbild entfernt und gespeichert: {output_path}")
+            self.logger.info(f"Hintergrund per Chroma-Key entfernt und gespeichert: {output_path}")
             return True
 
         except Exception as e:
-            self.logger.error(f"Fehler bei der Hintergrundentfernung mit Referenz: {str(e)}")
+            self.logger.error(f"Fehler bei der Chroma-Key-Hintergrundentfernung: {str(e)}")
             return False
 
-    def remove_background_with_ai(self, image_path, output_path):
+    def remove_background_with_ai(self, image_path, output_path, frame_cache=None):
         """Entfernt den Hintergrund mit KI-basierter Segmentierung"""
         if not self.is_available():
             self.logger.warning("KI-Segmentierung nicht verfügbar, bitte installieren Sie die erforderlichen Pakete")
@@ -133,7 +363,7 @@ class BackgroundRemover:
 
         try:
             # Bild laden
-            image = cv2.imread(image_path)
+            image = self._load_image(image_path, frame_cache)
 
             if image is None:
                 self.logger.error(f"Konnte Bild nicht laden: {image_path}")
@@ -153,13 +383,20 @@ class BackgroundRemover:
                 self.logger.error("Kein unterstütztes Segmentierungsmodell verfügbar")
                 return False
 
-            # Maske nachbearbeiten
-            mask = cv2.GaussianBlur(mask, (5, 5), 0)
-            _, mask = cv2.threshold(mask, 127, 255, cv2.THRESH_BINARY)
+            if self.low_memory:
+                # Maske streifenweise in einen wiederverwendeten Puffer nachbearbeiten
+                # (die Quelle bleibt unverändert, da die Überlappung sie erneut liest)
+                strips = self.strip_processor
+                smoothed = strips.buffer('ai_mask', mask.shape, mask.dtype)
+                strips.map_strips(lambda parts, rows: self._smooth_mask(parts[0]),
+                                  [mask], smoothed, bytes_per_pixel=2)
+                rgba_image = strips.composite_alpha(image, smoothed)
+            else:
+                mask = self._smooth_mask(mask)
 
-            # Bild mit transparentem Hintergrund
-            rgba_image = cv2.cvtColor(image, cv2.COLOR_BGR2BGRA)
-            rgba_image[:, :, 3] = mask
+                # Bild mit transparentem Hintergrund
+                rgba_image = cv2.cvtColor(image, cv2.COLOR_BGR2BGRA)
+                rgba_image[:, :, 3] = mask
 
             # Ergebnis speichern
             output_dir = os.path.dirname(output_path)
@@ -174,6 +411,12 @@ class BackgroundRemover:
             self.logger.error(f"Fehler bei der KI-basierten Hintergrundentfernung: {str(e)}")
             return False
 
+    def _smooth_mask(self, mask):
+        """Glättet eine Segmentierungsmaske und binarisiert sie"""
+        mask = cv2.GaussianBlur(mask, (5, 5), 0)
+        _, mask = cv2.threshold(mask, 127, 255, cv2.THRESH_BINARY)
+        return mask
+
     def _segment_with_u2net(self, image):
         """Segmentierung mit U^2-Net"""
         # Hier wäre der spezifische Code für U^2-Net
@@ -231,8 +474,17 @@ class BackgroundRemover:
 
         return mask2
 
-    def process_project_images(self, project, session, reference_image=None, use_ai=True):
-        """Verarbeitet alle Bilder einer Projekt-Session für transparenten Hintergrund"""
+    def process_project_images(self, project, session, reference_image=None, use_ai=True, chroma_key=None,
+                               frame_cache=None):
+        """Verarbeitet alle Bilder einer Projekt-Session für transparenten Hintergrund
+
+        chroma_key: Optionales Dictionary mit den Parametern für build_chroma_key_lut
+        (z.B. {'key_color': 'green', 'tolerance': 40}). Ist es gesetzt, wird der
+        Hintergrund per Chroma-Key entfernt.
+
+        frame_cache: Optionaler FrameCache, aus dem die bereits dekodierten
+        Bilder gelesen werden, statt die JPEGs erneut zu dekodieren.
+        """
         if not project or not session:
             self.logger.error("Ungültiges Projekt oder Session für die Bildverarbeitung")
             return False
@@ -243,16 +495,25 @@ class BackgroundRemover:
 
         success_count = 0
         total_count = len(session.photos)
+        started = time.perf_counter()
+
+        # Chroma-Key-Tabelle einmal für die gesamte Session berechnen
+        if chroma_key is not None:
+            self.build_chroma_key_lut(**chroma_key)
 
         for angle, photo_path in session.photos.items():
             output_path = os.path.join(transparent_dir, f"angle_{int(angle):03d}.png")
 
-            if reference_image and os.path.exists(reference_image):
+            if chroma_key is not None:
+                # Mit Chroma-Key (einfarbiger Hintergrund)
+                success = self.remove_background_with_chroma_key(photo_path, output_path, frame_cache=frame_cache)
+            elif reference_image and os.path.exists(reference_image):
                 # Mit Referenzbild
-                success = self.remove_background_with_reference(photo_path, reference_image, output_path)
+                success = self.remove_background_with_reference(photo_path, reference_image, output_path,
+                                                                frame_cache=frame_cache)
             elif use_ai and self.is_available():
                 # Mit KI
-                success = self.remove_background_with_ai(photo_path, output_path)
+                success = self.remove_background_with_ai(photo_path, output_path, frame_cache=frame_cache)
             else:
                 # Fehlschlag, keine geeignete Methode verfügbar
                 self.logger.warning(f"Keine geeignete Methode zur Hintergrundentfernung für {photo_path}")
@@ -261,6 +522,8 @@ class BackgroundRemover:
             if success:
                 success_count += 1
 
+        record_processing_stage('background', time.perf_counter() - started, success_count)
+
         result = {
             'success': success_count > 0,
             'total': total_count,
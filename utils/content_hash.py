@@ -0,0 +1,66 @@
+# Datei: utils/content_hash.py
+# Modul für Inhalts-Hashes von Dateien (ETags und versionierte URLs)
+
+import os
+import hashlib
+import threading
+
+
+def hash_bytes(data, length=16):
+    """Gibt den gekürzten SHA-256-Hash eines Byte-Strings zurück"""
+    return hashlib.sha256(data).hexdigest()[:length]
+
+
+class ContentHashCache:
+    """Berechnet Inhalts-Hashes von Dateien und merkt sie sich bis zur nächsten Änderung"""
+
+    CHUNK_SIZE = 1024 * 1024
+
+    def __init__(self, length=16, max_entries=10000):
+        """Initialisiert den Zwischenspeicher
+
+        Args:
+            length: Länge der Hashes in Hex-Zeichen
+            max_entries: Maximale Anzahl gespeicherter Hashes
+        """
+        self.length = length
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+
+        # Pfad -> (Größe, Änderungszeit, Hash)
+        self.entries = {}
+
+    def get(self, path):
+        """Gibt den Inhalts-Hash einer Datei zurück
+
+        Der Hash wird nur neu berechnet, wenn sich Größe oder Änderungszeit
+        geändert haben.
+
+        Raises:
+            OSError: Wenn die Datei nicht gelesen werden kann
+        """
+        stat = os.stat(path)
+        with self.lock:
+            entry = self.entries.get(path)
+        if entry and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+            return entry[2]
+
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(self.CHUNK_SIZE), b''):
+                digest.update(chunk)
+        content_hash = digest.hexdigest()[:self.length]
+
+        with self.lock:
+            if len(self.entries) >= self.max_entries:
+                self.entries.clear()
+            self.entries[path] = (stat.st_size, stat.st_mtime_ns, content_hash)
+        return content_hash
+
+    def invalidate(self, path=None):
+        """Verwirft den Hash einer Datei (oder alle)"""
+        with self.lock:
+            if path is None:
+                self.entries.clear()
+            else:
+                self.entries.pop(path, None)
@@ -0,0 +1,319 @@
+# Datei: utils/frame_cache.py
+# Modul für einen memory-mapped Stapel dekodierter Bilder einer Session
+
+import os
+import json
+import time
+import uuid
+import shutil
+import hashlib
+import logging
+import numpy as np
+import cv2
+from PIL import Image
+
+
+class FrameCache:
+    """Dekodiert die Bilder einer Session einmalig in einen memory-mapped NumPy-Stapel
+
+    Der Stapel wird als .npy-Datei (N x H x W x 3, uint8, BGR) abgelegt. Alle
+    Verarbeitungsschritte lesen Ansichten (ohne Kopie) daraus, statt die JPEGs
+    jedes Mal neu zu dekodieren. Ändert sich eine Quelldatei (Größe oder
+    Änderungszeit), wird der Stapel beim nächsten Öffnen neu aufgebaut.
+
+    Jeder Aufbau schreibt einen eigenen Stapel (name-<id>.npy); erst das
+    atomare Ersetzen des Manifests, das auf diesen Stapel verweist, macht ihn
+    sichtbar. Stapel und Manifest wechseln so immer gemeinsam, auch wenn
+    mehrere Anfragen gleichzeitig aufbauen. Ersetzte Stapel werden erst nach
+    RETAIN_SECONDS gelöscht, damit Leser, die das alte Manifest bereits
+    geladen haben, den Stapel noch öffnen können.
+
+    Bilder mit Alphakanal (z.B. nach der Hintergrundentfernung) werden nicht
+    in den Stapel übernommen; für sie liefert `in` False, sodass die
+    Verarbeitungsschritte sie wie ohne Cache direkt von der Festplatte lesen.
+    """
+
+    MANIFEST_VERSION = 3
+
+    # Sekunden, die ersetzte Stapel und unbenutzte Cache-Verzeichnisse erhalten bleiben
+    RETAIN_SECONDS = 600
+
+    def __init__(self, image_paths, cache_dir, name='frames'):
+        """Initialisiert den Cache
+
+        Args:
+            image_paths: Liste der Quellbilder (Reihenfolge = Index im Stapel)
+            cache_dir: Verzeichnis für Stapel und Manifest
+            name: Basisname der Cache-Dateien
+        """
+        self.logger = logging.getLogger(__name__)
+        self.image_paths = [os.path.abspath(p) for p in image_paths]
+        self.cache_dir = cache_dir
+        self.name = name
+        self.manifest_path = os.path.join(cache_dir, f"{name}.json")
+        self.stack_path = None
+
+        self.stack = None
+        self.shapes = []
+        self.index = {path: i for i, path in enumerate(self.image_paths)}
+        self.signatures = {}
+        self.uncached = set()
+        self.stale = False
+
+    @classmethod
+    def for_session(cls, project, session):
+        """Erstellt einen Cache für alle Fotos einer Projekt-Session"""
+        photos = [session.photos[angle] for angle in sorted(session.photos.keys(), key=float)]
+        cache_dir = os.path.join(project.path, "sessions", session.id, "cache")
+        return cls(photos, cache_dir)
+
+    @classmethod
+    def for_photos(cls, image_paths, cache_root, keep=3):
+        """Erstellt einen Cache für eine beliebige Bildauswahl
+
+        Das Cache-Verzeichnis wird aus der Liste der Bilder abgeleitet, sodass
+        verschiedene Auswahlen sich nicht gegenseitig überschreiben. Über die
+        keep zuletzt verwendeten hinaus werden Verzeichnisse gelöscht, sobald
+        sie RETAIN_SECONDS lang nicht mehr geöffnet oder aufgebaut wurden
+        (jede Verwendung aktualisiert die Änderungszeit des Verzeichnisses).
+        """
+        paths = [os.path.abspath(p) for p in image_paths]
+        key = hashlib.sha1('\n'.join(paths).encode('utf-8')).hexdigest()[:16]
+        cache_dir = os.path.join(cache_root, key)
+        os.makedirs(cache_dir, exist_ok=True)
+        os.utime(cache_dir)
+
+        entries = sorted((entry for entry in os.scandir(cache_root) if entry.is_dir() and entry.name != key),
+                         key=lambda entry: entry.stat().st_mtime, reverse=True)
+        idle_since = time.time() - cls.RETAIN_SECONDS
+        for entry in entries[max(keep - 1, 0):]:
+            if entry.stat().st_mtime < idle_since:
+                shutil.rmtree(entry.path, ignore_errors=True)
+
+        return cls(paths, cache_dir)
+
+    @staticmethod
+    def _signature(path):
+        """Signatur einer Quelldatei (Größe und Änderungszeit)"""
+        stat = os.stat(path)
+        return [stat.st_size, stat.st_mtime_ns]
+
+    def _load_manifest(self):
+        """Lädt das Manifest oder gibt None zurück"""
+        try:
+            with open(self.manifest_path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _stack_path(self, manifest):
+        """Pfad des Stapels, auf den ein Manifest verweist"""
+        return os.path.join(self.cache_dir, os.path.basename(manifest['stack']))
+
+    def _is_valid(self, manifest):
+        """Prüft ein geladenes Manifest gegen die aktuellen Quelldateien"""
+        if not manifest or manifest.get('version') != self.MANIFEST_VERSION:
+            return False
+        if not os.path.exists(self._stack_path(manifest)):
+            return False
+
+        sources = manifest.get('sources', [])
+        if [s['path'] for s in sources] != self.image_paths:
+            return False
+
+        try:
+            return all(s['signature'] == self._signature(s['path']) for s in sources)
+        except OSError:
+            return False
+
+    def is_valid(self):
+        """Prüft, ob der Stapel existiert und zu den aktuellen Quelldateien passt"""
+        return self._is_valid(self._load_manifest())
+
+    def build(self):
+        """Dekodiert alle Quellbilder in einen neuen Stapel
+
+        Returns:
+            Das neue Manifest oder None
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        os.utime(self.cache_dir)
+
+        if not self.image_paths:
+            self.logger.warning("Keine Bilder für den Frame-Cache vorhanden")
+            return None
+
+        # Bildgrößen und Alphakanal aus den Dateiköpfen lesen (ohne zu dekodieren)
+        sizes = []
+        alpha = set()
+        for path in self.image_paths:
+            with Image.open(path) as img:
+                if img.mode in ('RGBA', 'LA') or 'transparency' in img.info:
+                    alpha.add(path)
+                else:
+                    sizes.append(img.size)
+
+        height = max((h for _, h in sizes), default=0)
+        width = max((w for w, _ in sizes), default=0)
+        shape = (len(self.image_paths), height, width, 3)
+
+        # Eigener Stapel je Aufbau; sichtbar wird er erst mit dem Manifest
+        build_id = uuid.uuid4().hex[:12]
+        stack_name = f"{self.name}-{build_id}.npy"
+        stack_path = os.path.join(self.cache_dir, stack_name)
+        stack = np.lib.format.open_memmap(stack_path, mode='w+', dtype=np.uint8, shape=shape)
+
+        sources = []
+        shapes = []
+        for i, path in enumerate(self.image_paths):
+            signature = self._signature(path)
+            image = None if path in alpha else cv2.imread(path, cv2.IMREAD_COLOR)
+            if image is None:
+                # Bilder mit Alphakanal liest jeder Schritt selbst von der Festplatte
+                if path not in alpha:
+                    self.logger.error(f"Konnte Bild nicht laden: {path}")
+                h, w = 0, 0
+            else:
+                h, w = image.shape[:2]
+                stack[i, :h, :w] = image
+            shapes.append([h, w])
+            sources.append({'path': path, 'signature': signature})
+
+        stack.flush()
+        del stack
+
+        manifest = {
+            'version': self.MANIFEST_VERSION,
+            'stack': stack_name,
+            'shape': list(shape),
+            'dtype': 'uint8',
+            'frame_shapes': shapes,
+            'alpha': sorted(alpha),
+            'sources': sources
+        }
+        # Die Frist des bisherigen Stapels beginnt mit seiner Ablösung
+        previous = self._load_manifest()
+        if previous and previous.get('stack'):
+            try:
+                os.utime(self._stack_path(previous))
+            except OSError:
+                pass
+
+        tmp_manifest = f"{self.manifest_path}.{build_id}.tmp"
+        with open(tmp_manifest, 'w') as f:
+            json.dump(manifest, f)
+        os.replace(tmp_manifest, self.manifest_path)
+
+        self._remove_old_stacks(stack_name)
+
+        self.logger.info(f"Frame-Cache aufgebaut: {len(shapes)} Bilder, {width}x{height} -> {stack_path}")
+        return manifest
+
+    def _remove_old_stacks(self, current):
+        """Löscht ersetzte Stapel, die älter als RETAIN_SECONDS sind
+
+        Jüngere Stapel bleiben erhalten: ein anderer Prozess kann das
+        vorherige Manifest geladen haben und den Stapel gleich öffnen, oder
+        ein gleichzeitiger Aufbau schreibt ihn noch.
+        """
+        cutoff = time.time() - self.RETAIN_SECONDS
+        prefix = f"{self.name}-"
+        for entry in os.scandir(self.cache_dir):
+            if (entry.name.startswith(prefix) and entry.name.endswith('.npy') and entry.name != current
+                    and entry.stat().st_mtime < cutoff):
+                self._remove(entry.path)
+
+    def open(self):
+        """Öffnet den Stapel (und baut ihn bei Bedarf neu auf)"""
+        for attempt in range(2):
+            manifest = self._load_manifest()
+            if not self._is_valid(manifest):
+                manifest = self.build()
+                if not manifest:
+                    return False
+
+            try:
+                stack = np.load(self._stack_path(manifest), mmap_mode='r')
+                break
+            except FileNotFoundError:
+                # Stapel wurde zwischen Manifest und Öffnen ersetzt: neu lesen
+                if attempt:
+                    raise
+
+        self.stack_path = self._stack_path(manifest)
+        self.shapes = [tuple(s) for s in manifest['frame_shapes']]
+        self.signatures = {s['path']: s['signature'] for s in manifest['sources']}
+        self.uncached = set(manifest.get('alpha', []))
+        self.stack = stack
+        self.stale = False
+        os.utime(self.cache_dir)
+        return True
+
+    def close(self):
+        """Gibt die Speicherabbildung frei"""
+        self.stack = None
+
+    def invalidate(self):
+        """Löscht den Stapel und das Manifest"""
+        self.close()
+        manifest = self._load_manifest()
+        self._remove(self.manifest_path)
+        if manifest and manifest.get('stack'):
+            self._remove(self._stack_path(manifest))
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def __len__(self):
+        return len(self.image_paths)
+
+    def __contains__(self, path):
+        """Prüft, ob ein Bild aus dem Stapel geliefert wird (nicht bei Alphakanal)"""
+        path = os.path.abspath(path)
+        if path not in self.index:
+            return False
+        if self.stack is None and not self.open():
+            return False
+        return path not in self.uncached
+
+    def get_frame(self, index):
+        """Liefert das Bild mit dem angegebenen Index als schreibgeschützte Ansicht"""
+        if self.stack is None and not self.open():
+            return None
+
+        h, w = self.shapes[index]
+        if h == 0 or w == 0:
+            return None
+        return self.stack[index, :h, :w]
+
+    def get(self, path):
+        """Liefert das Bild zu einem Quellpfad
+
+        Wurde die Quelldatei seit dem Aufbau verändert, wird sie direkt
+        dekodiert und der Cache als veraltet markiert.
+        """
+        path = os.path.abspath(path)
+        index = self.index.get(path)
+        if index is None:
+            return cv2.imread(path)
+
+        if self.stack is None and not self.open():
+            return cv2.imread(path)
+
+        if path in self.uncached:
+            return cv2.imread(path)
+
+        try:
+            changed = self._signature(path) != self.signatures.get(path)
+        except OSError:
+            changed = True
+
+        if changed:
+            self.stale = True
+            return cv2.imread(path)
+
+        return self.get_frame(index)
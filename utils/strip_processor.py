@@ -0,0 +1,138 @@
+# Datei: utils/strip_processor.py
+# Modul zur speichersparenden Bildverarbeitung in horizontalen Streifen
+
+import logging
+import numpy as np
+import cv2
+
+
+class StripProcessor:
+    """Verarbeitet große Bilder in überlappenden horizontalen Streifen
+
+    Punktweise Operationen (Differenz, Schwellenwert, Alpha-Compositing) und
+    Nachbarschaftsoperationen (Morphologie, Weichzeichner) werden Streifen für
+    Streifen mit vorab angelegten Puffern ausgeführt. Jeder Streifen wird um
+    einen Überlappungsbereich (halo) erweitert, der mindestens so groß ist wie
+    der summierte Radius aller Nachbarschaftsoperationen. Dadurch ist das
+    Ergebnis identisch mit der Verarbeitung des ganzen Bildes.
+    """
+
+    # Bytes pro Pixel für die Arbeitspuffer eines Streifens
+    # (Differenz BGR, Graustufen, zwei Morphologie-Puffer)
+    WORK_BYTES_PER_PIXEL = 6
+
+    def __init__(self, memory_budget_mb=64, halo=32):
+        """Initialisiert den Streifenprozessor
+
+        Args:
+            memory_budget_mb: Obergrenze für die Arbeitspuffer in MB
+            halo: Überlappung der Streifen in Zeilen (oben und unten)
+        """
+        self.logger = logging.getLogger(__name__)
+        self.memory_budget = int(memory_budget_mb * 1024 * 1024)
+        self.halo = halo
+        self.buffers = {}
+
+    def buffer(self, name, shape, dtype=np.uint8):
+        """Liefert einen wiederverwendbaren Arbeitspuffer
+
+        Der Puffer wird nur neu angelegt, wenn er für die angeforderte Größe zu
+        klein ist; ansonsten wird eine Ansicht auf die ersten Zeilen geliefert.
+        """
+        shape = tuple(shape)
+        buf = self.buffers.get(name)
+        if buf is None or buf.dtype != dtype or buf.shape[1:] != shape[1:] or buf.shape[0] < shape[0]:
+            buf = np.empty(shape, dtype=dtype)
+            self.buffers[name] = buf
+        return buf[:shape[0]]
+
+    def release(self):
+        """Gibt alle Arbeitspuffer frei"""
+        self.buffers = {}
+
+    def strip_height(self, width, bytes_per_pixel=None):
+        """Berechnet die Streifenhöhe (inkl. Überlappung) für das Speicherbudget"""
+        bytes_per_pixel = bytes_per_pixel or self.WORK_BYTES_PER_PIXEL
+        rows = self.memory_budget // max(1, width * bytes_per_pixel)
+
+        # Mindestens so viele Kernzeilen wie Überlappungszeilen
+        return max(rows, 4 * self.halo)
+
+    def iter_strips(self, height, strip_height, halo=None):
+        """Liefert die Streifen als (Start, Ende, Kern-Start, Kern-Ende)
+
+        Start/Ende umfassen die Überlappung, Kern-Start/Kern-Ende die Zeilen,
+        deren Ergebnis aus diesem Streifen übernommen wird.
+        """
+        halo = self.halo if halo is None else halo
+        core_height = max(1, strip_height - 2 * halo)
+
+        for core_start in range(0, height, core_height):
+            core_end = min(height, core_start + core_height)
+            yield max(0, core_start - halo), min(height, core_end + halo), core_start, core_end
+
+    def map_strips(self, func, sources, out, halo=None, bytes_per_pixel=None):
+        """Wendet func streifenweise auf die Quellbilder an und schreibt nach out
+
+        Args:
+            func: Funktion (Liste der Quellstreifen, Pufferhöhe) -> Ergebnisstreifen
+            sources: Liste gleich hoher Quellbilder
+            out: Vorab angelegtes Zielarray (gleiche Höhe wie die Quellen)
+            halo: Überlappung in Zeilen (Standard: self.halo)
+            bytes_per_pixel: Speicherbedarf der Arbeitspuffer pro Pixel
+
+        Returns:
+            out
+        """
+        height, width = sources[0].shape[:2]
+        strip_height = min(height, self.strip_height(width, bytes_per_pixel))
+
+        for start, end, core_start, core_end in self.iter_strips(height, strip_height, halo):
+            result = func([src[start:end] for src in sources], end - start)
+            out[core_start:core_end] = result[core_start - start:core_end - start]
+
+        return out
+
+    def composite_alpha(self, image, mask, out=None):
+        """Erzeugt ein BGRA-Bild aus BGR-Bild und Maske, streifenweise in out"""
+        height, width = image.shape[:2]
+        if out is None:
+            out = np.empty((height, width, 4), dtype=np.uint8)
+
+        # Punktweise Operation: keine Überlappung nötig
+        strip_height = min(height, self.strip_height(width, 4))
+        for start, end, _, _ in self.iter_strips(height, strip_height, halo=0):
+            cv2.cvtColor(image[start:end], cv2.COLOR_BGR2BGRA, dst=out[start:end])
+            out[start:end, :, 3] = mask[start:end]
+
+        return out
+
+    def resize(self, image, size, interpolation=cv2.INTER_AREA):
+        """Verkleinert ein Bild streifenweise
+
+        Nur bei ganzzahligen Verkleinerungsfaktoren mit INTER_AREA hängt jede
+        Zielzeile ausschließlich von ihrem eigenen Block an Quellzeilen ab; nur
+        dann wird streifenweise gearbeitet. In allen anderen Fällen wird das
+        ganze Bild mit cv2.resize skaliert, damit das Ergebnis identisch bleibt.
+        """
+        height, width = image.shape[:2]
+        new_width, new_height = size
+        factor_x, factor_y = width // max(1, new_width), height // max(1, new_height)
+
+        exact = (interpolation == cv2.INTER_AREA and factor_x > 1 and factor_y > 1
+                 and new_width * factor_x == width and new_height * factor_y == height)
+        if not exact:
+            return cv2.resize(image, size, interpolation=interpolation)
+
+        out = np.empty((new_height, new_width) + image.shape[2:], dtype=image.dtype)
+
+        # Streifenhöhe auf ein Vielfaches des Faktors ausrichten
+        strip_height = min(height, self.strip_height(width, image.itemsize * image[0, 0].size))
+        strip_height = max(factor_y, strip_height - strip_height % factor_y)
+
+        for start in range(0, height, strip_height):
+            end = min(height, start + strip_height)
+            cv2.resize(image[start:end], (new_width, (end - start) // factor_y),
+                       dst=out[start // factor_y:end // factor_y], interpolation=interpolation)
+
+        return out
@@ -0,0 +1,368 @@
+# Datei: utils/zip_stream.py
+# Modul für ZIP-Archive, die beim Herunterladen erzeugt werden
+
+import os
+import json
+import time
+import uuid
+import zlib
+import struct
+import hashlib
+import logging
+import threading
+
+
+# Dateiinhalt wird in Blöcken dieser Größe gelesen (konstanter Speicherbedarf)
+CHUNK_SIZE = 1024 * 1024
+
+# Grenzwerte, ab denen ZIP64-Felder nötig sind
+ZIP32_LIMIT = 0xFFFFFFFF
+ZIP32_COUNT_LIMIT = 0xFFFF
+
+# Bit 3: CRC und Größen stehen im Datendeskriptor, Bit 11: Dateinamen in UTF-8
+FLAGS = 0x0808
+
+
+class _CrcCache:
+    """Merkt sich CRC-32-Prüfsummen von Dateien bis zur nächsten Änderung"""
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.entries = {}
+
+    def get(self, path, size, mtime_ns):
+        with self.lock:
+            entry = self.entries.get(path)
+        if entry and entry[0] == size and entry[1] == mtime_ns:
+            return entry[2]
+        return None
+
+    def put(self, path, size, mtime_ns, crc):
+        with self.lock:
+            if len(self.entries) >= self.max_entries:
+                self.entries.clear()
+            self.entries[path] = (size, mtime_ns, crc)
+
+
+crc_cache = _CrcCache()
+
+
+class CrcSidecar:
+    """Dauerhaft gespeicherte CRC-32-Prüfsummen der Dateien eines Verzeichnisses
+
+    Die Prüfsummen liegen als JSON neben den Dateien (Schlüssel: relativer Pfad,
+    Werte: Größe, Änderungszeit, CRC) und gelten für alle Prozesse und über
+    Neustarts hinweg. Ein fortgesetzter Download muss so nicht alle bereits
+    gesendeten Dateien erneut lesen, um das zentrale Verzeichnis zu erzeugen.
+    """
+
+    # Mindestabstand zwischen zwei Schreibvorgängen während des Sendens
+    SAVE_INTERVAL = 1.0
+
+    def __init__(self, path):
+        self.logger = logging.getLogger(__name__)
+        self.path = path
+        self.directory = os.path.dirname(os.path.abspath(path))
+        self.lock = threading.Lock()
+        self.entries = None
+        self.dirty = False
+        self.saved_at = 0.0
+
+    def _load(self):
+        """Liest die Datei beim ersten Zugriff (Lock gehalten)"""
+        if self.entries is None:
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self.entries = json.load(f)
+                if not isinstance(self.entries, dict):
+                    self.entries = {}
+            except (OSError, ValueError):
+                self.entries = {}
+        return self.entries
+
+    def _key(self, path):
+        return os.path.relpath(os.path.abspath(path), self.directory).replace(os.sep, '/')
+
+    def get(self, path, size, mtime_ns):
+        with self.lock:
+            entry = self._load().get(self._key(path))
+        if entry and entry[0] == size and entry[1] == mtime_ns:
+            return entry[2]
+        return None
+
+    def put(self, path, size, mtime_ns, crc):
+        with self.lock:
+            self._load()[self._key(path)] = [size, mtime_ns, crc]
+            self.dirty = True
+
+    def save(self, paths=None, force=True):
+        """Schreibt geänderte Prüfsummen atomar zurück
+
+        Args:
+            paths: Aktuelle Dateien; Einträge anderer (gelöschter) Dateien entfallen
+            force: Auch innerhalb von SAVE_INTERVAL seit dem letzten Schreiben
+        """
+        with self.lock:
+            if not self.dirty or (not force and time.monotonic() - self.saved_at < self.SAVE_INTERVAL):
+                return
+            entries = self._load()
+            if paths is not None:
+                keys = {self._key(path) for path in paths}
+                entries = self.entries = {key: value for key, value in entries.items() if key in keys}
+            tmp_path = f"{self.path}.{uuid.uuid4().hex[:8]}.tmp"
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(entries, f, separators=(',', ':'))
+                os.replace(tmp_path, self.path)
+                self.dirty = False
+            except OSError as e:
+                self.logger.warning(f"CRC-Datei konnte nicht gespeichert werden: {e}")
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+            self.saved_at = time.monotonic()
+
+
+def _dos_datetime(timestamp):
+    """Zeitstempel im DOS-Format (Zeit, Datum) der ZIP-Header"""
+    t = time.localtime(max(timestamp, 315532800))  # frühestens 1980
+    dos_time = (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2)
+    dos_date = ((t.tm_year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+    return dos_time, dos_date
+
+
+class ZipEntry:
+    """Eine Datei im Archiv (Größe und Zeitstempel beim Erstellen festgehalten)"""
+
+    def __init__(self, arcname, path, sidecar=None):
+        stat = os.stat(path)
+        self.arcname = arcname
+        self.name = arcname.encode('utf-8')
+        self.path = path
+        self.size = stat.st_size
+        self.mtime_ns = stat.st_mtime_ns
+        self.dos_time, self.dos_date = _dos_datetime(stat.st_mtime)
+        self.offset = 0
+        self.crc = crc_cache.get(path, self.size, self.mtime_ns)
+        if self.crc is None and sidecar is not None:
+            self.crc = sidecar.get(path, self.size, self.mtime_ns)
+
+    @property
+    def zip64(self):
+        """Datei braucht ZIP64-Größenfelder"""
+        return self.size >= ZIP32_LIMIT
+
+    def local_header(self):
+        """Lokaler Dateikopf (CRC und Größen folgen im Datendeskriptor)"""
+        extra = b''
+        sizes = 0
+        if self.zip64:
+            extra = struct.pack('<HHQQ', 0x0001, 16, 0, 0)
+            sizes = ZIP32_LIMIT
+        return struct.pack('<IHHHHHIIIHH', 0x04034b50, 45 if self.zip64 else 20, FLAGS, 0,
+                           self.dos_time, self.dos_date, 0, sizes, sizes,
+                           len(self.name), len(extra)) + self.name + extra
+
+    def local_header_size(self):
+        return 30 + len(self.name) + (20 if self.zip64 else 0)
+
+    def data_descriptor(self):
+        if self.zip64:
+            return struct.pack('<IIQQ', 0x08074b50, self.crc, self.size, self.size)
+        return struct.pack('<IIII', 0x08074b50, self.crc, self.size, self.size)
+
+    def data_descriptor_size(self):
+        return 24 if self.zip64 else 16
+
+    def _central_extra(self):
+        """ZIP64-Zusatzfeld des zentralen Verzeichnisses (nur die übergelaufenen Werte)"""
+        values = []
+        if self.zip64:
+            values += [self.size, self.size]
+        if self.offset >= ZIP32_LIMIT:
+            values.append(self.offset)
+        if not values:
+            return b''
+        return struct.pack('<HH', 0x0001, 8 * len(values)) + struct.pack(f'<{len(values)}Q', *values)
+
+    def central_header(self):
+        extra = self._central_extra()
+        size = ZIP32_LIMIT if self.zip64 else self.size
+        offset = min(self.offset, ZIP32_LIMIT)
+        return struct.pack('<IHHHHHHIIIHHHHHII', 0x02014b50, (3 << 8) | 45, 45 if extra else 20, FLAGS, 0,
+                           self.dos_time, self.dos_date, self.crc, size, size,
+                           len(self.name), len(extra), 0, 0, 0, 0o100644 << 16, offset) + self.name + extra
+
+    def central_header_size(self):
+        return 46 + len(self.name) + len(self._central_extra())
+
+
+class ZipStream:
+    """ZIP-Archiv, das beim Lesen Stück für Stück erzeugt wird
+
+    Alle Einträge werden unkomprimiert gespeichert (JPEGs lassen sich ohnehin
+    kaum komprimieren). Dadurch ist der Aufbau allein durch Dateinamen und
+    -größen festgelegt: Gesamtgröße und Position jedes Bytes sind vorab
+    bekannt, ein abgebrochener Download kann per HTTP-Range an beliebiger
+    Stelle fortgesetzt werden, und es entstehen keine temporären Dateien.
+    """
+
+    def __init__(self, entries, crc_file=None):
+        """Initialisiert das Archiv
+
+        Args:
+            entries: Liste von (Name im Archiv, Dateipfad) in der gewünschten Reihenfolge
+            crc_file: Optionale Datei, in der die Prüfsummen dauerhaft gespeichert werden
+        """
+        self.sidecar = CrcSidecar(crc_file) if crc_file else None
+        self.entries = [ZipEntry(arcname, path, self.sidecar) for arcname, path in entries]
+
+        # Segmente: (Startposition, Länge, Art, Eintrag)
+        self.segments = []
+        offset = 0
+        for entry in self.entries:
+            entry.offset = offset
+            for kind, length in (('header', entry.local_header_size()), ('data', entry.size),
+                                 ('descriptor', entry.data_descriptor_size())):
+                self.segments.append((offset, length, kind, entry))
+                offset += length
+
+        self.central_offset = offset
+        self.central_size = sum(entry.central_header_size() for entry in self.entries)
+        self.segments.append((offset, self.central_size + self._end_size(), 'central', None))
+        self.size = offset + self.central_size + self._end_size()
+
+    @classmethod
+    def from_directory(cls, directory, prefix='', exclude=None, crc_file=None):
+        """Archiv aller Dateien eines Verzeichnisses (sortiert, damit der Aufbau stabil bleibt)
+
+        Args:
+            directory: Quellverzeichnis
+            prefix: Ordnername im Archiv
+            exclude: Optionale Funktion (relativer Pfad) -> True, um Dateien auszulassen
+            crc_file: Optionale Datei für die Prüfsummen (wird nie ins Archiv übernommen)
+        """
+        skip = os.path.abspath(crc_file) if crc_file else None
+        entries = []
+        for root, dirs, files in os.walk(directory):
+            dirs.sort()
+            for filename in sorted(files):
+                path = os.path.join(root, filename)
+                relative = os.path.relpath(path, directory).replace(os.sep, '/')
+                if exclude and exclude(relative):
+                    continue
+                if skip and (os.path.abspath(path) == skip or os.path.abspath(path).startswith(skip + '.')):
+                    continue
+                if os.path.isfile(path):
+                    entries.append((f"{prefix}/{relative}" if prefix else relative, path))
+        return cls(entries, crc_file)
+
+    @property
+    def etag(self):
+        """Kennung des Archivinhalts (ändert sich mit jeder Datei)"""
+        digest = hashlib.sha1()
+        for entry in self.entries:
+            digest.update(entry.name + b'\0' + struct.pack('<QQ', entry.size, entry.mtime_ns))
+        return digest.hexdigest()
+
+    @property
+    def _zip64_end(self):
+        """Archiv braucht ZIP64-Endeinträge"""
+        return (len(self.entries) >= ZIP32_COUNT_LIMIT or self.central_offset >= ZIP32_LIMIT
+                or self.central_size >= ZIP32_LIMIT)
+
+    def _end_size(self):
+        return 22 + (56 + 20 if self._zip64_end else 0)
+
+    def _store_crc(self, entry, crc):
+        """Merkt sich die Prüfsumme im Prozess und (falls vorhanden) in der CRC-Datei"""
+        entry.crc = crc
+        crc_cache.put(entry.path, entry.size, entry.mtime_ns, crc)
+        if self.sidecar is not None:
+            self.sidecar.put(entry.path, entry.size, entry.mtime_ns, crc)
+            # Auch ein abgebrochener Download hinterlässt die bis dahin berechneten Prüfsummen
+            self.sidecar.save(force=False)
+
+    def _compute_crc(self, entry):
+        """Berechnet die Prüfsumme einer Datei (nur wenn sie nicht beim Senden anfiel)"""
+        if entry.crc is None:
+            crc = 0
+            with open(entry.path, 'rb') as f:
+                for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                    crc = zlib.crc32(chunk, crc)
+            self._store_crc(entry, crc)
+        return entry.crc
+
+    def _central_directory(self):
+        """Zentrales Verzeichnis und Endeinträge"""
+        for entry in self.entries:
+            self._compute_crc(entry)
+            yield entry.central_header()
+        if self.sidecar is not None:
+            self.sidecar.save([entry.path for entry in self.entries])
+
+        count = len(self.entries)
+        if self._zip64_end:
+            zip64_end_offset = self.central_offset + self.central_size
+            yield struct.pack('<IQHHIIQQQQ', 0x06064b50, 44, 45, 45, 0, 0,
+                              count, count, self.central_size, self.central_offset)
+            yield struct.pack('<IIQI', 0x07064b50, 0, zip64_end_offset, 1)
+
+        yield struct.pack('<IHHHHIIH', 0x06054b50, 0, 0, min(count, ZIP32_COUNT_LIMIT),
+                          min(count, ZIP32_COUNT_LIMIT), min(self.central_size, ZIP32_LIMIT),
+                          min(self.central_offset, ZIP32_LIMIT), 0)
+
+    def _file_data(self, entry, start, length):
+        """Liest einen Ausschnitt einer Datei in Blöcken"""
+        # Vollständig gesendete Dateien liefern ihre Prüfsumme nebenbei
+        crc = 0 if start == 0 and length == entry.size and entry.crc is None else None
+
+        with open(entry.path, 'rb') as f:
+            f.seek(start)
+            remaining = length
+            while remaining > 0:
+                chunk = f.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    raise IOError(f"Datei wurde während des Exports verändert: {entry.path}")
+                if crc is not None:
+                    crc = zlib.crc32(chunk, crc)
+                remaining -= len(chunk)
+                yield chunk
+
+        if crc is not None:
+            self._store_crc(entry, crc)
+
+    def _segment(self, kind, entry, start, length):
+        """Erzeugt einen Ausschnitt eines Segments"""
+        if kind == 'data':
+            yield from self._file_data(entry, start, length)
+            return
+
+        if kind == 'header':
+            data = entry.local_header()
+        elif kind == 'descriptor':
+            self._compute_crc(entry)
+            data = entry.data_descriptor()
+        else:
+            data = b''.join(self._central_directory())
+        yield data[start:start + length]
+
+    def iter_range(self, start=0, stop=None):
+        """Erzeugt die Bytes [start, stop) des Archivs
+
+        Vor start liegende Dateien werden übersprungen, ohne sie zu lesen.
+        """
+        stop = self.size if stop is None else min(stop, self.size)
+        for offset, length, kind, entry in self.segments:
+            end = offset + length
+            if end <= start or length == 0:
+                continue
+            if offset >= stop:
+                break
+            begin = max(start, offset) - offset
+            yield from self._segment(kind, entry, begin, min(end, stop) - offset - begin)
+
+    def __iter__(self):
+        return self.iter_range()
@@ -5,13 +5,16 @@ Modul zur Generierung des 360°-Viewers aus einer Serie von Bildern.
 Bereitet Bilder auf und erstellt HTML/JavaScript für den interaktiven Viewer.
 """
 
+import io
 import os
-import json
-import shutil
 import logging
 import time
 from datetime import datetime
-from PIL import Image
+from PIL import Image, ImageChops, ImageFilter, ImageStat
+
+from project_repository import ProjectRepository
+from utils.content_hash import hash_bytes
+from metrics import processing_stage
 
 # Logger konfigurieren
 logger = logging.getLogger("drehteller360.viewer_generator")
@@ -20,40 +23,220 @@ logger = logging.getLogger("drehteller360.viewer_generator")
 class ViewerGenerator:
     """Generiert einen interaktiven 360°-Viewer aus einer Serie von Bildern."""
 
-    def __init__(self, photo_dir='static/photos', output_dir='static/projects'):
+    # Kantenlänge der Vorschaubilder für die Objekterkennung
+    BBOX_PREVIEW_SIZE = 256
+
+    def __init__(self, photo_dir='static/photos', output_dir='static/projects',
+                 auto_crop=True, crop_padding=0.05, crop_threshold=40):
         """
         Initialisiert den Viewer-Generator.
 
         Args:
             photo_dir: Verzeichnis mit den Quellfotos
-            output_dir: Ausgabeverzeichnis für generierte Projekte
+            output_dir: Ausgabeverzeichnis für generierte Projekte (Projekte aus einem
+                anderen als dem Repository-Verzeichnis werden dorthin übernommen)
+            auto_crop: Alle Bilder auf die gemeinsame Objekt-Bounding-Box zuschneiden
+            crop_padding: Rand um die Bounding-Box (Anteil der Box-Größe)
+            crop_threshold: Mindestabweichung vom Hintergrund für Vordergrundpixel
         """
         self.photo_dir = photo_dir
-        self.output_dir = output_dir
+        self.repository = ProjectRepository.for_directory(output_dir)
+        self.output_dir = self.repository.projects_dir
+        self.auto_crop = auto_crop
+        self.crop_padding = crop_padding
+        self.crop_threshold = crop_threshold
 
         # Stelle sicher, dass das Ausgabeverzeichnis existiert
-        os.makedirs(output_dir, exist_ok=True)
+        os.makedirs(self.output_dir, exist_ok=True)
+
+    def _load_frame(self, img_path, frame_cache=None):
+        """
+        Lädt ein Quellbild als PIL-Bild, bevorzugt aus dem Frame-Cache.
+
+        Args:
+            img_path: Bildpfad (relativ zu photo_dir)
+            frame_cache: Optionaler FrameCache mit bereits dekodierten Bildern
+
+        Returns:
+            PIL-Bild
+        """
+        full_path = os.path.join(self.photo_dir, img_path)
+        if frame_cache is not None and full_path in frame_cache:
+            frame = frame_cache.get(full_path)
+            if frame is not None:
+                # Der Cache speichert BGR, PIL erwartet RGB
+                return Image.fromarray(frame[:, :, ::-1])
+        return Image.open(full_path)
+
+    def compute_object_bbox(self, img_path, frame=None):
+        """
+        Ermittelt die Bounding-Box des Objekts in einem Bild.
+
+        Bilder mit Alphakanal (z.B. nach der Hintergrundentfernung) werden über
+        die Maske ausgewertet, sonst wird der Hintergrund aus den Bildrändern
+        geschätzt. Die Analyse erfolgt auf einer verkleinerten Vorschau.
+
+        Args:
+            img_path: Pfad zum Bild
+            frame: Optional bereits dekodiertes Bild (BGR-Array aus dem Frame-Cache)
 
-    def prepare_images(self, images, project_name):
+        Returns:
+            Tupel (links, oben, rechts, unten) in Originalkoordinaten oder None
+        """
+        if frame is not None:
+            # Jedes n-te Pixel des dekodierten Bildes als Vorschau verwenden
+            full_height, full_width = frame.shape[:2]
+            step = max(1, max(full_width, full_height) // self.BBOX_PREVIEW_SIZE)
+            return self._bbox_from_preview(Image.fromarray(frame[::step, ::step, ::-1]),
+                                           full_width, full_height)
+
+        with Image.open(img_path) as img:
+            full_width, full_height = img.size
+
+            # JPEGs direkt verkleinert dekodieren (deutlich schneller)
+            img.draft('RGB', (self.BBOX_PREVIEW_SIZE, self.BBOX_PREVIEW_SIZE))
+
+            if img.mode in ('RGBA', 'LA') or 'transparency' in img.info:
+                preview = img.convert('RGBA')
+            else:
+                preview = img.convert('RGB')
+            preview.thumbnail((self.BBOX_PREVIEW_SIZE, self.BBOX_PREVIEW_SIZE))
+
+        return self._bbox_from_preview(preview, full_width, full_height)
+
+    def _bbox_from_preview(self, preview, full_width, full_height):
         """
-        Bereitet Bilder für den 360°-Viewer vor (Größenanpassung, Optimierung).
+        Bestimmt die Objekt-Bounding-Box auf einer verkleinerten Vorschau.
+
+        Args:
+            preview: Vorschaubild (RGB oder RGBA)
+            full_width: Breite des Originalbildes
+            full_height: Höhe des Originalbildes
+
+        Returns:
+            Tupel (links, oben, rechts, unten) in Originalkoordinaten oder None
+        """
+        if preview.mode == 'RGBA':
+            mask = preview.getchannel('A').point(lambda v: 255 if v > 127 else 0)
+        else:
+            # Hintergrundfarbe als Median eines schmalen Randstreifens schätzen
+            width, height = preview.size
+            border = max(2, min(width, height) // 20)
+            strips = [preview.crop((0, 0, width, border)),
+                      preview.crop((0, height - border, width, height)),
+                      preview.crop((0, 0, border, height)),
+                      preview.crop((width - border, 0, width, height))]
+            medians = [ImageStat.Stat(strip).median for strip in strips]
+            background = tuple(sorted(m[c] for m in medians)[len(medians) // 2] for c in range(3))
+
+            diff = ImageChops.difference(preview, Image.new('RGB', preview.size, background))
+            diff = diff.convert('L')
+            threshold = self.crop_threshold
+            mask = diff.point(lambda v: 255 if v > threshold else 0)
+
+        # Einzelne Rauschpixel entfernen
+        mask = mask.filter(ImageFilter.MedianFilter(5))
+        bbox = mask.getbbox()
+
+        if not bbox:
+            return None
+
+        # Auf Originalgröße zurückrechnen
+        scale_x = full_width / mask.width
+        scale_y = full_height / mask.height
+        return (int(bbox[0] * scale_x), int(bbox[1] * scale_y),
+                min(full_width, int(round(bbox[2] * scale_x))),
+                min(full_height, int(round(bbox[3] * scale_y))))
+
+    def compute_union_bbox(self, images, frame_cache=None):
+        """
+        Berechnet die gemeinsame Bounding-Box aller Bilder einer Drehung.
+
+        Durch die Vereinigung bleibt der Ausschnitt über die gesamte Drehung
+        stabil, sodass das Objekt im Viewer nicht springt.
+
+        Args:
+            images: Liste der Bildpfade (relativ zu photo_dir)
+            frame_cache: Optionaler FrameCache mit bereits dekodierten Bildern
+
+        Returns:
+            Tupel (links, oben, rechts, unten) inkl. Rand oder None
+        """
+        union = None
+        frame_size = None
+
+        for img_path in images:
+            full_path = os.path.join(self.photo_dir, img_path)
+            try:
+                frame = None
+                if frame_cache is not None and full_path in frame_cache:
+                    frame = frame_cache.get(full_path)
+
+                bbox = self.compute_object_bbox(full_path, frame)
+                if frame_size is None:
+                    if frame is not None:
+                        frame_size = (frame.shape[1], frame.shape[0])
+                    else:
+                        with Image.open(full_path) as img:
+                            frame_size = img.size
+            except Exception as e:
+                logger.warning(f"Bounding-Box für {img_path} konnte nicht ermittelt werden: {e}")
+                continue
+
+            if bbox is None:
+                continue
+
+            if union is None:
+                union = list(bbox)
+            else:
+                union = [min(union[0], bbox[0]), min(union[1], bbox[1]),
+                         max(union[2], bbox[2]), max(union[3], bbox[3])]
+
+        if union is None or frame_size is None:
+            return None
+
+        # Rand hinzufügen und auf die Bildgröße begrenzen
+        pad_x = int((union[2] - union[0]) * self.crop_padding)
+        pad_y = int((union[3] - union[1]) * self.crop_padding)
+        crop_box = (max(0, union[0] - pad_x), max(0, union[1] - pad_y),
+                    min(frame_size[0], union[2] + pad_x), min(frame_size[1], union[3] + pad_y))
+
+        # Zuschneiden lohnt sich nur, wenn tatsächlich Fläche eingespart wird
+        crop_area = (crop_box[2] - crop_box[0]) * (crop_box[3] - crop_box[1])
+        if crop_area >= 0.95 * frame_size[0] * frame_size[1]:
+            return None
+
+        logger.info(f"Gemeinsamer Bildausschnitt: {crop_box} (Originalgröße {frame_size[0]}x{frame_size[1]})")
+        return crop_box
+
+    def prepare_images(self, images, project_name, crop_box=None, frame_cache=None):
+        """
+        Bereitet Bilder für den 360°-Viewer vor (Zuschnitt, Größenanpassung, Optimierung).
 
         Args:
             images: Liste der Bildpfade
             project_name: Name des Projekts
+            crop_box: Optionaler gemeinsamer Bildausschnitt (links, oben, rechts, unten)
+            frame_cache: Optionaler FrameCache mit bereits dekodierten Bildern
 
         Returns:
-            Pfad zum Projektverzeichnis
+            Tupel (Projektverzeichnis, Bilddateien, Inhalts-Hashes der Bilddateien)
         """
         project_dir = os.path.join(self.output_dir, project_name)
         os.makedirs(project_dir, exist_ok=True)
 
         processed_images = []
+        image_hashes = {}
 
         for i, img_path in enumerate(images):
             try:
                 # Lade Bild
-                img = Image.open(os.path.join(self.photo_dir, img_path))
+                img = self._load_frame(img_path, frame_cache)
+
+                # Auf den gemeinsamen Ausschnitt zuschneiden (vor dem Skalieren)
+                if crop_box:
+                    img = img.crop((crop_box[0], crop_box[1],
+                                    min(crop_box[2], img.width), min(crop_box[3], img.height)))
 
                 # Passe Größe an (max. 1200px Breite für optimale Performance)
                 max_width = 1200
@@ -65,21 +248,28 @@ class ViewerGenerator:
                 # Speichere optimiertes Bild
                 img_filename = f"image_{i:03d}.jpg"
                 output_path = os.path.join(project_dir, img_filename)
-                img.save(output_path, "JPEG", quality=85, optimize=True)
+                buffer = io.BytesIO()
+                img.save(buffer, "JPEG", quality=85, optimize=True)
+                data = buffer.getvalue()
+                with open(output_path, "wb") as f:
+                    f.write(data)
 
+                # Inhalts-Hash für unveränderliche, versionierte URLs
+                image_hashes[img_filename] = hash_bytes(data)
                 processed_images.append(img_filename)
             except Exception as e:
                 logger.error(f"Fehler bei der Bildverarbeitung für {img_path}: {e}")
 
-        return project_dir, processed_images
+        return project_dir, processed_images, image_hashes
 
-    def generate_viewer(self, images, metadata=None):
+    def generate_viewer(self, images, metadata=None, frame_cache=None):
         """
         Generiert einen 360°-Viewer aus den gegebenen Bildern.
 
         Args:
             images: Liste der Bildpfade
             metadata: Zusätzliche Metadaten für das Projekt
+            frame_cache: Optionaler FrameCache, damit jedes Bild nur einmal dekodiert wird
 
         Returns:
             URL zum erstellten Viewer
@@ -92,22 +282,29 @@ class ViewerGenerator:
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         project_name = f"project_{timestamp}"
 
+        # Gemeinsamen Bildausschnitt aller Bilder bestimmen
+        crop_box = None
+        if self.auto_crop:
+            with processing_stage('bbox', len(images)):
+                crop_box = self.compute_union_bbox(images, frame_cache)
+
         # Bilder vorbereiten
-        project_dir, processed_images = self.prepare_images(images, project_name)
+        with processing_stage('prepare', len(images)):
+            project_dir, processed_images, image_hashes = self.prepare_images(images, project_name, crop_box,
+                                                                              frame_cache)
 
         # Erstelle Projektmetadaten
         project_metadata = {
             "name": project_name,
             "created": time.time(),
-            "image_count": len(processed_images),
             "images": processed_images,
+            "image_hashes": image_hashes,
+            "crop_box": list(crop_box) if crop_box else None,
             "user_metadata": metadata or {}
         }
 
-        # Speichere Metadaten
-        metadata_path = os.path.join(project_dir, "metadata.json")
-        with open(metadata_path, "w") as f:
-            json.dump(project_metadata, f)
+        # Metadaten speichern und Projektkatalog aktualisieren
+        self.repository.save(project_name, project_metadata)
 
         return f"/viewer?project={project_name}"
 
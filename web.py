@@ -1,54 +1,88 @@
-from flask import Flask, render_template, request, send_from_directory, jsonify
+from flask import Flask, render_template, request, send_file, jsonify, url_for, abort, redirect, g
+from werkzeug.security import safe_join
 import os
+import hmac
 import json
 import time
-import serial
-import subprocess
+import hashlib
+import mimetypes
+import threading
+from collections import OrderedDict
+from urllib.parse import quote
 
 # Import config manager
 from config_manager import config_manager
+from startup_manager import startup_manager
 
-# Import the webcam capture simulator
-from webcam_simulator import WebcamCaptureSimulator
+# Import the sample image generator
 from sample_images_generator import SampleImagesGenerator
-from webcam_detection_helper import find_working_webcam, get_camera_capabilities, test_webcam_capture
-from device_detector import device_detector
+from webcam_detection_helper import find_working_webcam, test_webcam_capture
+from camera_capability_store import capability_store
+from hardware_service import HardwareService
+from hardware_scheduler import HardwareScheduler, HardwareError, HardwareBusyError
+from hardware_broker import HardwareClient, DEFAULT_SOCKET_PATH
+from live_preview import PreviewHub
+from rig_manager import rig_registry as local_rig_registry, RemoteRigRegistry, RigError, RigBusyError
 from viewer_generator import viewer_generator
+from utils.frame_cache import FrameCache
+from utils.content_hash import ContentHashCache
+from utils.zip_stream import ZipStream
+from project_catalog import project_catalog
+from project_repository import project_repository
+from project_reaper import project_reaper
+from models.frame_grid import FrameGrid
+from models.photo_session import PhotoSession
+from metrics import metrics, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from metrics import http_request_seconds, http_requests, hardware_queue_depth, preview_clients
+from profiler import profiling
 
 app = Flask(__name__)
 
-# Configuration retrieval
-USE_SIMULATOR = config_manager.get('simulator.enabled', True)
+# Dateiauslieferung an den vorgeschalteten Webserver abgeben (None, 'x-sendfile', 'x-accel-redirect')
+FILE_OFFLOAD = config_manager.get('web.file_offload')
+ACCEL_PREFIX = config_manager.get('web.accel_prefix', '/protected-static/')
+app.config['USE_X_SENDFILE'] = FILE_OFFLOAD == 'x-sendfile'
 
-# Initialize webcam capture simulator
-webcam_simulator = WebcamCaptureSimulator()
-
-# Initialize sample images generator (optional, run once to generate images)
-if not os.path.exists('static/sample_images') or len(os.listdir('static/sample_images')) < 5:
-    image_generator = SampleImagesGenerator()
-    image_generator.generate_sample_images(10)
-
-# Arduino connection
-def get_arduino_connection():
+def create_hardware():
     """
-    Establish Arduino connection based on configuration
+    Create the hardware access: a client of the hardware broker if enabled,
+    otherwise a local service owning the Arduino and camera in this process.
+    Either way all commands run one after another through a HardwareScheduler.
     """
-    try:
-        if USE_SIMULATOR:
-            return None
+    if config_manager.get('hardware.broker', False):
+        return HardwareClient(config_manager.get('hardware.socket_path', DEFAULT_SOCKET_PATH))
+    return HardwareScheduler(HardwareService())
 
-        port = config_manager.get('arduino.port', '/dev/ttyACM0')
-        baudrate = config_manager.get('arduino.baudrate', 9600)
+hardware = create_hardware()
 
-        arduino = serial.Serial(port, baudrate, timeout=1)
-        time.sleep(2)  # Wait for initialization
-        return arduino
-    except Exception as e:
-        print(f"Arduino connection error: {e}")
-        return None
-
-# Global Arduino connection
-arduino = get_arduino_connection()
+def create_rig_registry():
+    """
+    Rigs run in the hardware broker if enabled, so only one process opens their
+    devices and every web worker sees the same sessions; otherwise in this process.
+    """
+    if isinstance(hardware, HardwareClient):
+        return RemoteRigRegistry(hardware)
+    return local_rig_registry
+
+rig_registry = create_rig_registry()
+
+# One preview capture (downscaled once) shared by all live preview clients of this process;
+# with the hardware broker every process subscribes to the broker's single shared capture
+preview_hub = PreviewHub(hardware,
+                         fps=config_manager.get('camera.preview.fps', 10),
+                         max_width=config_manager.get('camera.preview.max_width', 640))
+
+# WebSocket preview only if flask-sock is installed
+try:
+    from flask_sock import Sock
+except ImportError:
+    Sock = None
+
+# Slow services are initialized lazily or warmed up in the background
+startup_manager.register('project_catalog', lambda: project_catalog.start_watching() or project_catalog)
+# Reste abgebrochener Löschvorgänge entfernen
+startup_manager.register('project_reaper',
+                         lambda: project_reaper.watch(project_repository.projects_dir) or project_reaper)
 
 def rotate_teller(degrees):
     """
@@ -56,22 +90,11 @@ def rotate_teller(degrees):
 
     :param degrees: Rotation angle
     """
-    if USE_SIMULATOR:
-        print(f"Simulated rotation: {degrees} degrees")
-        return
-
-    if arduino is None:
-        print("Arduino not connected!")
-        return
-
-    # Berechnung der Drehzeit basierend auf der Gradzahl (0,8 Grad pro Sekunde)
-    rotation_time = degrees / 0.8
-
-    # Relais einschalten (Drehteller starten)
-    arduino.write(b'1')  # '1' senden, um das Relais einzuschalten
-    time.sleep(rotation_time)  # Warte für die berechnete Zeit
-    arduino.write(b'0')  # '0' senden, um das Relais auszuschalten
-    print(f"Drehteller um {degrees} Grad gedreht.")
+    try:
+        return hardware.rotate(degrees)
+    except HardwareError as e:
+        print(f"Fehler beim Drehen: {e}")
+        return False
 
 def take_photo(filename=None):
     """
@@ -80,57 +103,9 @@ def take_photo(filename=None):
     :param filename: Optional custom filename
     :return: Path to the saved photo
     """
-    if USE_SIMULATOR:
-        # Use the webcam simulator to generate a photo
-        # Ensure filename is just the basename
-        if filename:
-            filename = os.path.basename(filename)
-        return webcam_simulator.capture_photo(filename)
-
     try:
-        # Camera device path and resolution from configuration
-        camera_device = config_manager.get('camera.device_path', '/dev/video0')
-        camera_type = config_manager.get('camera.type', 'webcam')
-
-        # Get camera resolution
-        camera_width = config_manager.get('camera.resolution.width')
-        camera_height = config_manager.get('camera.resolution.height')
-
-        # Use actual webcam capture for real hardware
-        if not filename:
-            filename = f'photo_{int(time.time())}.jpg'
-
-        # Ensure filename is just the basename
-        filename = os.path.basename(filename)
-        full_path = os.path.join('static/photos', filename)
-
-        # Choose capture method based on camera type
-        if camera_type == 'gphoto2':
-            # Use gphoto2 for DSLR cameras
-            subprocess.call(['gphoto2', '--capture-image-and-download', '--filename', full_path])
-        else:
-            # Default to OpenCV for webcams
-            import cv2
-            cap = cv2.VideoCapture(camera_device)
-
-            # Set resolution if specified
-            if camera_width and camera_height:
-                cap.set(cv2.CAP_PROP_FRAME_WIDTH, camera_width)
-                cap.set(cv2.CAP_PROP_FRAME_HEIGHT, camera_height)
-
-            ret, frame = cap.read()
-            if ret:
-                cv2.imwrite(full_path, frame)
-                cap.release()
-            else:
-                # Fallback to fswebcam if OpenCV fails
-                subprocess.call(['fswebcam', '--no-banner',
-                                 '-d', camera_device,
-                                 full_path])
-
-        print(f"Foto aufgenommen und als {filename} gespeichert.")
-        return filename
-    except Exception as e:
+        return hardware.capture(filename)
+    except HardwareError as e:
         print(f"Fehler beim Aufnehmen des Fotos: {e}")
         return None
 
@@ -169,7 +144,7 @@ def test_webcam_simulator():
         os.makedirs('static/photos', exist_ok=True)
 
         # Capture a test photo using the simulator
-        photo_path = webcam_simulator.capture_photo('test_simulator.jpg')
+        photo_path = hardware.capture('test_simulator.jpg', simulator=True)
 
         # Return the photo path relative to static folder
         return photo_path.replace('static/', '/static/')
@@ -180,6 +155,31 @@ def test_webcam_simulator():
             "message": str(e)
         }), 500
 
+@app.route('/camera/auto_tune', methods=['POST'])
+def camera_auto_tune():
+    """
+    Benchmark the capture modes of the configured webcam and store the fastest profile
+    """
+    try:
+        profile = hardware.auto_tune()
+
+        if not profile:
+            return jsonify({
+                "status": "error",
+                "message": "Kein Aufnahmemodus erfüllt die konfigurierte Auflösung"
+            }), 500
+
+        return jsonify({
+            "status": "success",
+            "profile": profile
+        })
+    except Exception as e:
+        print(f"Error tuning camera capture mode: {e}")
+        return jsonify({
+            "status": "error",
+            "message": str(e)
+        }), 500
+
 @app.route('/camera_capabilities', methods=['GET'])
 def camera_capabilities():
     """
@@ -189,8 +189,9 @@ def camera_capabilities():
         # Get camera device from configuration
         camera_device = config_manager.get('camera.device_path', '/dev/video0')
 
-        # Get camera capabilities
-        capabilities = get_camera_capabilities(camera_device)
+        # Get camera capabilities (served from the capability store)
+        refresh = request.args.get('refresh', 'false').lower() == 'true'
+        capabilities = capability_store.get(camera_device, refresh=refresh)
 
         return jsonify({
             "status": "success",
@@ -203,6 +204,176 @@ def camera_capabilities():
             "message": str(e)
         }), 500
 
+@app.route('/api/ready')
+def ready():
+    """
+    Readiness check: 200 once all background services are initialized
+    """
+    report = startup_manager.report()
+    return jsonify(report), (200 if report['ready'] else 503)
+
+@app.route('/api/hardware/status')
+def hardware_status():
+    """Zustand von Drehteller und Kamera (lokal oder im Hardware-Broker)."""
+    try:
+        return jsonify(hardware.status())
+    except HardwareError as e:
+        return jsonify({"status": "error", "message": str(e)}), 503
+
+@app.route('/camera/preview.mjpg')
+def camera_preview():
+    """
+    Live preview as multipart MJPEG stream (works directly in an <img> tag)
+    """
+    response = app.response_class(preview_hub.mjpeg(),
+                                  mimetype='multipart/x-mixed-replace; boundary=frame')
+    response.headers['Cache-Control'] = 'no-store'
+    # Keep nginx from buffering the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/api/preview/status')
+def camera_preview_status():
+    """Zustand der Live-Vorschau (Clients, übersprungene Bilder)"""
+    return jsonify(preview_hub.status())
+
+if Sock is not None:
+    sock = Sock(app)
+
+    @sock.route('/camera/preview/ws')
+    def camera_preview_ws(ws):
+        """
+        Live preview over a WebSocket, one binary JPEG message per frame
+        """
+        for frame in preview_hub.frames():
+            ws.send(frame)
+
+@app.route('/api/startup')
+def startup_report():
+    """
+    Startup timing report (phases and service initialization times)
+    """
+    return jsonify(startup_manager.report())
+
+def hardware_queue_depths():
+    """Wartende Hardwarebefehle je Priorität (lokal oder vom Hardware-Broker)."""
+    if hasattr(hardware, 'queue_status'):
+        queue = hardware.queue_status()
+    else:
+        queue = hardware.status().get('queue', {})
+    return {(priority,): depth for priority, depth in queue.get('depth', {}).items()}
+
+hardware_queue_depth.set_function(hardware_queue_depths)
+preview_clients.set_function(lambda: len(preview_hub.status()['clients']))
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+def observe_request(status_code):
+    """Verbucht Dauer und Status der aktuellen Anfrage (höchstens einmal je Anfrage)."""
+    started = g.pop('request_started', None)
+    if started is not None:
+        # Routenmuster statt Pfad, damit Projekt-IDs keine neuen Zeitreihen erzeugen
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        http_request_seconds.labels(route, request.method).observe(time.perf_counter() - started)
+        http_requests.labels(route, request.method, status_code).inc()
+
+@app.after_request
+def record_request_metrics(response):
+    """Antwortzeit je Route (Streams nur bis zum Beginn der Antwort)."""
+    observe_request(response.status_code)
+    return response
+
+@app.teardown_request
+def record_failed_request_metrics(exc):
+    """Unbehandelte Ausnahmen überspringen after_request; sie enden als 500."""
+    if exc is not None:
+        observe_request(500)
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """
+    Runtime metrics in the Prometheus text format
+    """
+    response = app.response_class(metrics.exposition(), content_type=METRICS_CONTENT_TYPE)
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+# Token für Admin-Funktionen (bewusst nicht in config.json, die über /get_config lesbar ist)
+ADMIN_TOKEN = os.environ.get('DREHTELLER_ADMIN_TOKEN')
+
+def is_admin():
+    """
+    Admin access: with DREHTELLER_ADMIN_TOKEN set only with that token in the
+    X-Admin-Token header (never in the URL, which ends up in access logs and
+    browser history), otherwise only from this machine
+    """
+    if ADMIN_TOKEN:
+        token = request.headers.get('X-Admin-Token', '')
+        return hmac.compare_digest(token.encode('utf-8'), ADMIN_TOKEN.encode('utf-8'))
+    # Hinter einem Reverse-Proxy ist jede Anfrage lokal, daher weitergeleitete ausschließen
+    return request.remote_addr in ('127.0.0.1', '::1') and 'X-Forwarded-For' not in request.headers
+
+@app.before_request
+def start_request_profile():
+    # Profilierung nur, wenn angefordert (sonst ein einzelner Vergleich)
+    if profiling.requests_remaining > 0 and not request.path.startswith('/api/admin/'):
+        g.profile = profiling.start_request(request.method, request.path)
+
+@app.teardown_request
+def stop_request_profile(error=None):
+    capture = g.pop('profile', None)
+    if capture is not None:
+        try:
+            capture.stop('error' if error is not None else 'ok')
+        except Exception as e:
+            print(f"Fehler beim Speichern des Profils: {e}")
+
+@app.route('/api/admin/profiling', methods=['GET', 'POST', 'DELETE'])
+def admin_profiling():
+    """
+    Profile the next N requests or photo sessions (POST), stop (DELETE)
+    or list the recorded profiles (GET)
+    """
+    if not is_admin():
+        return jsonify({"error": "Nur für Administratoren"}), 403
+
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or request.form
+        memory = data.get('memory', False)
+        if isinstance(memory, str):
+            memory = memory.lower() in ('true', '1')
+        try:
+            status = profiling.arm(target=data.get('target', 'requests'),
+                                   count=data.get('count', 1),
+                                   mode=data.get('mode', 'cprofile'),
+                                   memory=memory,
+                                   route=data.get('route') or None)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        return jsonify(status)
+
+    if request.method == 'DELETE':
+        return jsonify(profiling.disarm())
+
+    return jsonify({**profiling.status(), 'captures': profiling.captures()})
+
+@app.route('/api/admin/profiling/<capture_id>/<artifact>')
+def admin_profiling_artifact(capture_id, artifact):
+    """
+    Download a recorded profile: profile.pstats (cProfile), stacks.txt
+    (collapsed stacks for flamegraphs), memory.snapshot (tracemalloc) or memory.txt
+    """
+    if not is_admin():
+        return jsonify({"error": "Nur für Administratoren"}), 403
+
+    path = profiling.artifact_path(capture_id, artifact)
+    if path is None:
+        return jsonify({"error": "Profil nicht gefunden"}), 404
+    return send_file(os.path.abspath(path), as_attachment=True, download_name=f"{capture_id}-{artifact}",
+                     max_age=0)
+
 # Routes
 @app.route('/')
 def index():
@@ -212,6 +383,10 @@ def index():
 def settings():
     return render_template('settings.html')
 
+@app.route('/rigs')
+def rigs():
+    return render_template('rigs.html')
+
 @app.route('/viewer')
 def view_360():
     """Zeigt den 360°-Viewer an."""
@@ -297,123 +472,313 @@ def save_config():
             "message": f"Allgemeiner Fehler: {str(e)}"
         }), 500
 
+def project_image_url(project_id, image, image_hashes):
+    """URL eines Projektbilds (unveränderliche URL, wenn der Inhalts-Hash bekannt ist)."""
+    if image in image_hashes:
+        return url_for('serve_frame', project_id=project_id, content_hash=image_hashes[image], filename=image)
+    return url_for('serve_project_file', project_id=project_id, filename=image)
+
 @app.route('/api/project/<project_id>')
 def get_project(project_id):
-    """Liefert Projektdaten für den 360°-Viewer."""
+    """Liefert Projektdaten für den 360°-Viewer (mit versionierten Bild-URLs)."""
     try:
-        project_dir = os.path.join('static/projects', project_id)
-        metadata_path = os.path.join(project_dir, 'metadata.json')
-
-        if not os.path.exists(metadata_path):
+        metadata = project_repository.get(project_id)
+        if metadata is None:
             return jsonify({"error": "Projekt nicht gefunden"}), 404
 
-        with open(metadata_path, 'r') as f:
-            metadata = json.load(f)
+        # Bilder mit bekanntem Inhalts-Hash über unveränderliche URLs ausliefern
+        image_hashes = metadata.get('image_hashes') or {}
+        image_urls = [project_image_url(project_id, image, image_hashes) for image in metadata.get('images', [])]
 
-        return jsonify(metadata)
+        response = jsonify(dict(metadata, image_urls=image_urls))
+        response.add_etag()
+        response.cache_control.no_cache = True
+        return response.make_conditional(request)
     except Exception as e:
         print(f"Fehler beim Laden der Projektdaten: {e}")
         return jsonify({"error": str(e)}), 500
 
+# Bildraster der zuletzt abgefragten Sessions (Projekt, Session) -> (Stand, FrameGrid)
+MAX_CACHED_FRAME_GRIDS = 64
+frame_grids = OrderedDict()
+frame_grids_lock = threading.Lock()
+
+def project_frame_grid(project_id, metadata, session_id=None):
+    """
+    Bildraster einer Session (Standard: letzte Session, ohne Sessions die Viewer-Bilder)
+
+    :return: Tupel (Session-ID oder None, FrameGrid) oder None, wenn die Session fehlt
+    """
+    sessions = metadata.get('sessions') or []
+    if session_id:
+        session = next((s for s in sessions if s.get('id') == session_id), None)
+        if session is None:
+            return None
+    else:
+        session = sessions[-1] if sessions else None
+
+    key = (project_id, session['id'] if session else None)
+    with frame_grids_lock:
+        cached = frame_grids.get(key)
+        if cached and cached[0] == metadata.get('updated'):
+            frame_grids.move_to_end(key)
+            return key[1], cached[1]
+
+    if session is not None:
+        grid = PhotoSession.from_dict(session).grid
+    else:
+        grid = FrameGrid.from_images(metadata.get('images', []))
+
+    with frame_grids_lock:
+        frame_grids[key] = (metadata.get('updated'), grid)
+        while len(frame_grids) > MAX_CACHED_FRAME_GRIDS:
+            frame_grids.popitem(last=False)
+    return key[1], grid
+
+@app.route('/api/project/<project_id>/frame')
+def get_project_frame(project_id):
+    """
+    Nächstgelegenes Bild zu einer Ansicht (az = Azimut, el = Elevation in Grad)
+
+    Optional: session=<id>, redirect=true (leitet direkt auf das Bild weiter)
+    """
+    metadata = project_repository.get(project_id)
+    if metadata is None:
+        return jsonify({"error": "Projekt nicht gefunden"}), 404
+
+    try:
+        azimuth = float(request.args.get('az', 0))
+        elevation = float(request.args.get('el', 0))
+    except ValueError:
+        return jsonify({"error": "az und el müssen Zahlen sein"}), 400
+
+    result = project_frame_grid(project_id, metadata, request.args.get('session'))
+    if result is None:
+        return jsonify({"error": "Session nicht gefunden"}), 404
+
+    session_id, grid = result
+    frame = grid.nearest(azimuth, elevation)
+    if frame is None:
+        return jsonify({"error": "Projekt enthält keine Bilder"}), 404
+
+    frame_azimuth, frame_elevation, path = frame
+    url = project_image_url(project_id, path, metadata.get('image_hashes') or {})
+    if request.args.get('redirect', 'false').lower() == 'true':
+        return redirect(url)
+
+    response = jsonify({
+        "session": session_id,
+        "azimuth": frame_azimuth,
+        "elevation": frame_elevation,
+        "path": path,
+        "url": url,
+        "elevations": grid.elevations,
+        "frames": len(grid)
+    })
+    response.add_etag()
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+# CRC-32-Prüfsummen des Exports (Punktdatei: nicht im Archiv und nicht im Projektkatalog)
+EXPORT_CRC_FILE = '.export-crc32.json'
+
+@app.route('/api/project/<project_id>/export.zip')
+def export_project(project_id):
+    """
+    Download a project as ZIP archive, built while streaming
+
+    Entries are stored uncompressed, so the archive layout only depends on the
+    file names and sizes: Content-Length is known up front and interrupted
+    downloads can be resumed with a Range request (If-Range with the ETag).
+    """
+    if project_repository.get(project_id) is None:
+        return jsonify({"error": "Projekt nicht gefunden"}), 404
+
+    # Prüfsummen neben dem Projekt speichern, damit fortgesetzte Downloads sie in jedem Worker finden
+    project_path = project_repository.path(project_id)
+    archive = ZipStream.from_directory(
+        project_path, prefix=project_id,
+        exclude=lambda name: name.endswith('.tmp') or os.path.basename(name).startswith('.'),
+        crc_file=os.path.join(project_path, EXPORT_CRC_FILE))
+    etag = archive.etag
+
+    # Teilbereich nur, wenn sich das Archiv seit dem ersten Teil nicht geändert hat
+    start, stop, status = 0, archive.size, 200
+    if_range = request.if_range
+    unchanged = (if_range.etag is None and if_range.date is None) or if_range.etag == etag
+    if request.range and unchanged:
+        byte_range = request.range.range_for_length(archive.size)
+        if byte_range is None:
+            response = app.response_class(status=416)
+            response.headers['Content-Range'] = f"bytes */{archive.size}"
+            return response
+        start, stop = byte_range
+        status = 206
+
+    response = app.response_class(archive.iter_range(start, stop), status=status, mimetype='application/zip',
+                                  direct_passthrough=True)
+    response.content_length = stop - start
+    response.set_etag(etag)
+    response.headers['Accept-Ranges'] = 'bytes'
+    response.headers['Content-Disposition'] = f"attachment; filename*=UTF-8''{quote(project_id)}.zip"
+    response.headers['X-Accel-Buffering'] = 'no'
+    if status == 206:
+        response.headers['Content-Range'] = f"bytes {start}-{stop - 1}/{archive.size}"
+    return response
+
+# Seitengröße der Projektliste (ohne limit) und Obergrenze
+DEFAULT_PROJECT_PAGE_SIZE = 100
+MAX_PROJECT_PAGE_SIZE = 500
+
+def project_fields(metadata, fields):
+    """Reduziert Projektmetadaten auf die angefragten Felder ('cover' = erstes Bild)."""
+    if not fields:
+        return metadata
+
+    projected = {'id': metadata['id']}
+    for field in fields:
+        if field == 'cover':
+            images = metadata.get('images') or []
+            projected['cover'] = images[0] if images else None
+        elif field in metadata:
+            projected[field] = metadata[field]
+    return projected
+
 @app.route('/api/projects')
 def get_projects():
-    """Liefert eine Liste aller verfügbaren Projekte."""
+    """
+    Liefert eine Seite der Projektliste aus dem Projektkatalog.
+
+    Optionale Parameter: sort (created, updated, name, image_count), order (asc, desc),
+    offset, limit (Standard 100, höchstens 500), cursor (aus X-Next-Cursor bzw. Link-Header), fields (z.B.
+    id,name,created,image_count,cover) und q (Suche in Name und ID).
+    Unveränderte Listen werden über das ETag mit 304 beantwortet.
+    """
     try:
-        projects_dir = 'static/projects'
-        projects = []
-
-        # Verzeichnisse durchsuchen
-        for project_id in os.listdir(projects_dir):
-            project_path = os.path.join(projects_dir, project_id)
-
-            # Nur Verzeichnisse berücksichtigen
-            if os.path.isdir(project_path):
-                metadata_path = os.path.join(project_path, 'metadata.json')
-
-                # Prüfen, ob Metadaten existieren
-                if os.path.exists(metadata_path):
-                    with open(metadata_path, 'r') as f:
-                        metadata = json.load(f)
-
-                    # Projekt-ID hinzufügen
-                    metadata['id'] = project_id
-                    projects.append(metadata)
-                else:
-                    # Fallback, wenn keine Metadaten existieren
-                    images = [f for f in os.listdir(project_path)
-                             if f.lower().endswith(('.jpg', '.jpeg', '.png'))]
-                    projects.append({
-                        'id': project_id,
-                        'name': f"Projekt {project_id}",
-                        'created': os.path.getctime(project_path),
-                        'images': images,
-                        'image_count': len(images)
-                    })
-
-        return jsonify(projects)
+        sort = request.args.get('sort', 'created')
+        order = request.args.get('order', 'desc')
+        offset = max(0, request.args.get('offset', 0, type=int))
+        limit = request.args.get('limit', DEFAULT_PROJECT_PAGE_SIZE, type=int)
+        cursor = request.args.get('cursor')
+        search = request.args.get('q')
+        fields = [f for f in request.args.get('fields', '').split(',') if f]
+
+        limit = min(max(1, limit), MAX_PROJECT_PAGE_SIZE)
+
+        try:
+            page = project_repository.page(sort=sort, order=order, cursor=cursor, offset=offset,
+                                           limit=limit, search=search)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        # Starkes ETag aus Katalogstand und Anfrageparametern
+        query_string = request.query_string.decode('utf-8', 'replace')
+        etag = f"{page['etag']}-{hashlib.sha1(query_string.encode('utf-8')).hexdigest()[:12]}"
+        if request.if_none_match.contains(etag):
+            response = app.response_class(status=304)
+            response.set_etag(etag)
+            return response
+
+        items = page['items']
+
+        def generate():
+            # Projekt für Projekt serialisieren, damit der Speicherbedarf begrenzt bleibt
+            yield '['
+            for index, metadata in enumerate(items):
+                yield (',' if index else '') + json.dumps(project_fields(metadata, fields))
+            yield ']'
+
+        response = app.response_class(generate(), mimetype='application/json')
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        response.headers['X-Total-Count'] = str(page['total'])
+        if page['next_cursor']:
+            response.headers['X-Next-Cursor'] = page['next_cursor']
+            next_args = request.args.to_dict()
+            next_args.pop('offset', None)
+            next_args['cursor'] = page['next_cursor']
+            response.headers['Link'] = f'<{url_for("get_projects", **next_args)}>; rel="next"'
+        return response
     except Exception as e:
         print(f"Fehler beim Laden der Projekte: {e}")
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/project/<project_id>', methods=['DELETE'])
 def delete_project(project_id):
-    """Löscht ein Projekt und alle zugehörigen Bilder."""
+    """Löscht ein Projekt; die Bilder werden im Hintergrund entfernt."""
     try:
-        # Pfad zum Projektverzeichnis
-        project_dir = os.path.join('static/projects', project_id)
-        
-        if not os.path.exists(project_dir):
+        if not project_repository.delete(project_id):
             return jsonify({"error": "Projekt nicht gefunden"}), 404
-        
-        # Metadaten lesen, um Bildinformationen zu erhalten
-        metadata_path = os.path.join(project_dir, 'metadata.json')
-        images_to_delete = []
-        
-        if os.path.exists(metadata_path):
-            try:
-                with open(metadata_path, 'r') as f:
-                    metadata = json.load(f)
-                
-                # Unterverzeichnisse wie sessions/sessions_id/images prüfen
-                if 'sessions' in metadata:
-                    for session in metadata.get('sessions', []):
-                        session_photos = session.get('photos', {})
-                        for photo_path in session_photos.values():
-                            if os.path.exists(photo_path) and os.path.isfile(photo_path):
-                                images_to_delete.append(photo_path)
-            except Exception as metadata_error:
-                print(f"Warnung: Konnte Metadaten nicht lesen: {metadata_error}")
-        
-        # Verzeichnisstruktur des Projekts durchsuchen
-        for root, dirs, files in os.walk(project_dir):
-            for file in files:
-                if file.lower().endswith(('.jpg', '.jpeg', '.png', '.gif')):
-                    file_path = os.path.join(root, file)
-                    images_to_delete.append(file_path)
-        
-        # Zuerst die einzelnen Bilddateien löschen
-        for image_path in images_to_delete:
-            try:
-                if os.path.exists(image_path) and os.path.isfile(image_path):
-                    os.remove(image_path)
-                    print(f"Gelöschtes Bild: {image_path}")
-            except Exception as image_error:
-                print(f"Warnung: Konnte Bild nicht löschen: {image_error}")
-        
-        # Dann das gesamte Projektverzeichnis löschen
-        import shutil
-        shutil.rmtree(project_dir)
-        print(f"Projekt {project_id} und alle zugehörigen Dateien wurden gelöscht.")
-        
+
+        print(f"Projekt {project_id} gelöscht, Dateien werden im Hintergrund entfernt.")
         return jsonify({"status": "success"})
     except Exception as e:
         print(f"Fehler beim Löschen des Projekts: {e}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/rigs')
+def list_rigs():
+    """Zustand aller konfigurierten Rigs"""
+    try:
+        return jsonify(rig_registry.status())
+    except HardwareError as e:
+        return jsonify({"error": str(e)}), 503
+
+@app.route('/api/rigs/<rig_id>')
+def get_rig(rig_id):
+    """Zustand eines Rigs"""
+    try:
+        rig = rig_registry.get(rig_id)
+        if rig is None:
+            return jsonify({"error": "Rig nicht gefunden"}), 404
+        return jsonify(rig.status())
+    except HardwareError as e:
+        return jsonify({"error": str(e)}), 503
+
+@app.route('/api/rigs/<rig_id>/session', methods=['POST'])
+def start_rig_session(rig_id):
+    """
+    Start a photo session on one rig (runs in the rig's own worker)
+    """
+    data = request.get_json(silent=True) or request.form
+    try:
+        rig = rig_registry.get(rig_id)
+        if rig is None:
+            return jsonify({"error": "Rig nicht gefunden"}), 404
+
+        # resume: true (zuletzt abgebrochene Session) oder eine Session-ID
+        resume = data.get('resume')
+        if isinstance(resume, str) and resume.lower() in ('true', '1'):
+            resume = True
+        session = rig.start_session(name=data.get('name'),
+                                    angle_step=data.get('angle_step'),
+                                    project_id=data.get('project_id'),
+                                    resume=resume or None)
+        return jsonify({"status": "started", "rig": rig_id, "session": session}), 202
+    except RigBusyError as e:
+        return jsonify({"error": str(e)}), 409
+    except (RigError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    except HardwareError as e:
+        return jsonify({"error": str(e)}), 503
+
+@app.route('/api/rigs/<rig_id>/stop', methods=['POST'])
+def stop_rig_session(rig_id):
+    """Laufende Session eines Rigs abbrechen"""
+    try:
+        rig = rig_registry.get(rig_id)
+        if rig is None:
+            return jsonify({"error": "Rig nicht gefunden"}), 404
+        return jsonify({"status": "stopping" if rig.stop() else "idle"})
+    except RigError as e:
+        return jsonify({"error": str(e)}), 400
+    except HardwareError as e:
+        return jsonify({"error": str(e)}), 503
+
 @app.route('/api/devices')
 def get_devices():
     """Liefert eine Liste aller erkannten Geräte."""
-    return jsonify(device_detector.get_devices())
+    return jsonify(hardware.devices())
 
 @app.route('/generate_360', methods=['POST'])
 def generate_360():
@@ -430,8 +795,14 @@ def generate_360():
         # Optionale Metadaten aus der Anfrage
         metadata = request.get_json() if request.is_json else {}
 
+        # Optional: Bilder nur einmal dekodieren und für alle Schritte wiederverwenden
+        frame_cache = None
+        if config_manager.get('processing.frame_cache', False):
+            frame_cache = FrameCache.for_photos([os.path.join(photo_dir, p) for p in photos],
+                                                os.path.join('cache', 'frames'))
+
         # 360°-Viewer generieren
-        viewer_url = viewer_generator.generate_viewer(photos, metadata)
+        viewer_url = viewer_generator.generate_viewer(photos, metadata, frame_cache)
 
         if viewer_url:
             return jsonify({"status": "success", "url": viewer_url})
@@ -446,12 +817,24 @@ def rotate():
     degrees = int(request.form['degrees'])
     interval = float(request.form.get('interval', 5))  # Default 5 seconds if not specified
 
-    # Rotate platform
-    rotate_teller(degrees)
+    # Serienaufnahmen ('batch') warten hinter manuellen Befehlen ('interactive');
+    # Wiederholungen mit derselben request_id werden nur einmal ausgeführt
+    priority = request.form.get('priority', 'interactive')
+    request_id = request.form.get('request_id') or request.headers.get('X-Request-Id')
 
     # Capture photo with timestamp to prevent caching
     filename = f'photo_{int(time.time())}_{degrees}.jpg'
-    photo_path = take_photo(filename)
+
+    try:
+        # Rotate platform and capture photo as one command
+        photo_path = hardware.step(degrees, filename, priority=priority, request_id=request_id)
+    except HardwareBusyError as e:
+        response = app.response_class(str(e), status=429)
+        response.headers['Retry-After'] = '2'
+        return response
+    except HardwareError as e:
+        print(f"Fehler bei Drehung und Aufnahme: {e}")
+        photo_path = None
 
     # Return photo name relative to static folder
     if photo_path:
@@ -459,9 +842,96 @@ def rotate():
     else:
         return 'Error capturing photo', 500
 
+# Inhalts-Hashes für ETags und versionierte Bild-URLs
+content_hashes = ContentHashCache()
+
+# Gültigkeitsdauer unveränderlicher Dateien (ein Jahr)
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+def send_cached_file(directory, filename, immutable=False, etag=None):
+    """
+    Sendet eine Datei mit starkem ETag, 304-Antworten und Range-Unterstützung.
+
+    Unveränderliche Dateien (Inhalts-Hash in der URL) dürfen ein Jahr lang ohne
+    Rückfrage zwischengespeichert werden, alle anderen werden per ETag geprüft.
+    Ohne vorgegebenes etag ist es der Inhalts-Hash der Datei; übernimmt nginx
+    die Auslieferung, wird die Datei nicht gelesen und das ETag aus Größe und
+    Änderungszeit gebildet.
+    """
+    path = safe_join(os.path.join(app.root_path, directory), filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+    # Gelöschte Projekte im Papierkorb nicht mehr ausliefern
+    if project_reaper.trash_dir(os.path.join(app.root_path, project_repository.projects_dir)) + os.sep in path:
+        abort(404)
+
+    if FILE_OFFLOAD == 'x-accel-redirect':
+        # nginx liefert die Datei (inkl. Range-Anfragen) selbst aus
+        if etag is None:
+            stat = os.stat(path)
+            etag = f"{stat.st_size:x}-{stat.st_mtime_ns:x}"
+        relative_path = os.path.relpath(path, app.static_folder).replace(os.sep, '/')
+        response = app.response_class(mimetype=mimetypes.guess_type(path)[0] or 'application/octet-stream')
+        response.headers['X-Accel-Redirect'] = ACCEL_PREFIX.rstrip('/') + '/' + quote(relative_path)
+        response.set_etag(etag)
+        if immutable:
+            response.cache_control.public = True
+            response.cache_control.max_age = IMMUTABLE_MAX_AGE
+        response.make_conditional(request)
+        if response.status_code == 304:
+            # Sonst sendet nginx trotz 304 die ganze Datei
+            del response.headers['X-Accel-Redirect']
+    else:
+        if etag is None:
+            etag = content_hashes.get(path)
+        # Mit USE_X_SENDFILE übernimmt der Webserver die Übertragung, sonst
+        # nutzt der WSGI-Server wsgi.file_wrapper (z.B. sendfile bei gunicorn)
+        response = send_file(path, conditional=True, etag=etag,
+                             max_age=IMMUTABLE_MAX_AGE if immutable else None)
+
+    if immutable:
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+    return response
+
+def serve_static(filename):
+    """Statische Dateien mit Inhalts-ETag und optionaler Auslieferung durch den Webserver."""
+    return send_cached_file('static', filename)
+
+app.view_functions['static'] = serve_static
+
 @app.route('/static/photos/<filename>')
 def serve_photo(filename):
-    return send_from_directory('static/photos', filename)
+    return send_cached_file('static/photos', filename)
+
+@app.route('/static/projects/<project_id>/<path:filename>')
+def serve_project_file(project_id, filename):
+    """Liefert Projektdateien mit ETag (Inhalt kann sich ändern)."""
+    return send_cached_file(os.path.join('static/projects', project_id), filename)
+
+@app.route('/frames/<project_id>/<content_hash>/<path:filename>')
+def serve_frame(project_id, content_hash, filename):
+    """Liefert ein Projektbild unter seiner unveränderlichen, inhaltsversionierten URL."""
+    path = safe_join(os.path.join(app.root_path, 'static/projects', project_id), filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+
+    # Veralteter Hash: auf die aktuelle Datei verweisen statt falsche Daten dauerhaft zu cachen.
+    # Bei Auslieferung durch nginx gilt der beim Erzeugen gespeicherte Hash, damit
+    # die Datei nicht durch Python gelesen wird.
+    if FILE_OFFLOAD == 'x-accel-redirect':
+        metadata = project_repository.get(project_id) or {}
+        current_hash = (metadata.get('image_hashes') or {}).get(filename)
+    else:
+        current_hash = content_hashes.get(path)
+    if current_hash != content_hash:
+        return redirect(url_for('serve_project_file', project_id=project_id, filename=filename))
+
+    return send_cached_file(os.path.join('static/projects', project_id), filename, immutable=True,
+                            etag=content_hash)
+
+startup_manager.mark('web_imported')
 
 if __name__ == '__main__':
     # Ensure static directories exist
@@ -469,5 +939,9 @@ if __name__ == '__main__':
     os.makedirs('static/sample_images', exist_ok=True)
     os.makedirs('static/projects', exist_ok=True)
 
+    # Warm up services only in the serving process (not in the reloader parent)
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        startup_manager.warm_up()
+
     # Run the Flask app
     app.run(host='0.0.0.0', port=5000, debug=True)
@@ -1,94 +1,313 @@
 import cv2
 import os
+import re
+import glob
 import time
+import signal
+import struct
+import logging
+import threading
 import subprocess
 import warnings
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeoutError
 
+# Logger konfigurieren
+logger = logging.getLogger("drehteller360.webcam_detection_helper")
 
-def find_working_webcam(preferred_devices=None):
+# V4L2 ioctl constants (linux/videodev2.h)
+VIDIOC_QUERYCAP = 0x80685600  # _IOR('V', 0, struct v4l2_capability)
+V4L2_CAP_VIDEO_CAPTURE = 0x00000001
+V4L2_CAP_VIDEO_CAPTURE_MPLANE = 0x00001000
+V4L2_CAP_DEVICE_CAPS = 0x80000000
+
+
+def query_v4l2_capabilities(device_path):
+    """
+    Query the V4L2 capabilities of a device without grabbing a frame
+
+    :param device_path: Path to the video device
+    :return: Dictionary with driver, card, bus_info and capture flag, or None
+             if the query is not possible (e.g. no V4L2 on this platform)
+    """
+    try:
+        import fcntl
+    except ImportError:
+        return None
+
+    try:
+        fd = os.open(device_path, os.O_RDWR | os.O_NONBLOCK)
+    except OSError:
+        return None
+
+    try:
+        buf = bytearray(104)  # sizeof(struct v4l2_capability)
+        fcntl.ioctl(fd, VIDIOC_QUERYCAP, buf)
+    except OSError:
+        return None
+    finally:
+        os.close(fd)
+
+    driver, card, bus_info, version, caps, device_caps = struct.unpack_from('16s32s32sIII', buf)
+
+    # device_caps describes this node, capabilities the whole physical device
+    node_caps = device_caps if caps & V4L2_CAP_DEVICE_CAPS else caps
+
+    return {
+        'driver': driver.split(b'\0', 1)[0].decode(errors='replace'),
+        'card': card.split(b'\0', 1)[0].decode(errors='replace'),
+        'bus_info': bus_info.split(b'\0', 1)[0].decode(errors='replace'),
+        'video_capture': bool(node_caps & (V4L2_CAP_VIDEO_CAPTURE | V4L2_CAP_VIDEO_CAPTURE_MPLANE))
+    }
+
+
+class _ProbeRun:
+    """fswebcam processes of one probe_webcams() call, killed at the deadline"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.processes = set()
+        self.cancelled = False
+
+    def start(self, cmd):
+        """Start a process (None once the run was cancelled)"""
+        with self.lock:
+            if self.cancelled:
+                return None
+            # Own process group, so that helpers started by the tool die with it
+            process = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                                       start_new_session=True)
+            self.processes.add(process)
+            return process
+
+    def finish(self, process):
+        with self.lock:
+            self.processes.discard(process)
+
+    def cancel(self):
+        """Kill all running processes and skip any further test"""
+        with self.lock:
+            self.cancelled = True
+            processes = list(self.processes)
+        for process in processes:
+            self.kill(process)
+        return len(processes)
+
+    @staticmethod
+    def kill(process):
+        """Kill a process and its process group"""
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except (AttributeError, OSError):
+            try:
+                process.kill()
+            except OSError:
+                pass
+
+
+def probe_device(device, timeout=3, run=None):
+    """
+    Check whether a single device delivers frames (fswebcam, then OpenCV)
+
+    :param device: Device path
+    :param timeout: Timeout for the fswebcam test in seconds
+    :param run: Optional _ProbeRun that can kill the test at an overall deadline
+    :return: Dictionary with device, working flag, method and latency
+    """
+    start = time.time()
+    run = run or _ProbeRun()
+
+    # Use fswebcam to test the device, output is discarded
+    process = None
+    try:
+        process = run.start(['fswebcam', '-d', device, '--no-banner', '/dev/null'])
+        if process is not None and process.wait(timeout=timeout) == 0:
+            # If fswebcam succeeds, this device works
+            return {'device': device, 'working': True, 'method': 'fswebcam',
+                    'latency': time.time() - start}
+    except subprocess.TimeoutExpired:
+        run.kill(process)
+        process.wait()
+    except Exception:
+        pass
+    finally:
+        if process is not None:
+            run.finish(process)
+
+    if run.cancelled:
+        return {'device': device, 'working': False, 'method': None,
+                'latency': time.time() - start}
+
+    # Fallback to OpenCV detection
+    try:
+        cap = cv2.VideoCapture(device)
+        ret, frame = cap.read()
+        cap.release()
+        if ret and frame is not None and frame.size > 0:
+            return {'device': device, 'working': True, 'method': 'opencv',
+                    'latency': time.time() - start}
+    except Exception:
+        pass
+
+    return {'device': device, 'working': False, 'method': None,
+            'latency': time.time() - start}
+
+
+def probe_webcams(devices, deadline=6.0, timeout=3, stop_early=False):
+    """
+    Probe several devices concurrently within an overall deadline
+
+    Nodes whose V4L2 capabilities show no video capture (e.g. metadata
+    nodes) are skipped before any frame grab.
+
+    :param devices: Device paths in order of preference
+    :param deadline: Overall time limit in seconds
+    :param timeout: Timeout for a single fswebcam test in seconds
+    :param stop_early: Return as soon as the most preferred working device is known
+    :return: Ranked list of working candidates (preference, then latency)
+    """
+    # Remove duplicates, keep order of preference
+    devices = list(dict.fromkeys(devices))
+    rank = {device: i for i, device in enumerate(devices)}
+
+    candidates = []
+    for device in devices:
+        caps = query_v4l2_capabilities(device)
+        if caps is not None and not caps['video_capture']:
+            continue
+        candidates.append(device)
+
+    if not candidates:
+        return []
+
+    results = []
+    pending = set(candidates)
+    run = _ProbeRun()
+    executor = ThreadPoolExecutor(max_workers=len(candidates), thread_name_prefix='webcam-probe')
+
+    try:
+        futures = [executor.submit(probe_device, device, timeout, run) for device in candidates]
+        for future in as_completed(futures, timeout=deadline):
+            result = future.result()
+            pending.discard(result['device'])
+            if result['working']:
+                results.append(result)
+
+            if stop_early and results:
+                # The best working device answers as soon as all more preferred ones failed
+                best = min(results, key=lambda r: rank[r['device']])
+                if all(rank[d] > rank[best['device']] for d in pending):
+                    break
+    except FuturesTimeoutError:
+        logger.warning(f"Webcam probing deadline reached, no answer from: {sorted(pending)}")
+    finally:
+        # Do not wait for hanging probes beyond the deadline: kill their
+        # fswebcam processes and skip the OpenCV fallback
+        killed = run.cancel()
+        if killed:
+            logger.info(f"Stopped {killed} unfinished fswebcam probe(s)")
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    return sorted(results, key=lambda r: (rank[r['device']], r['latency']))
+
+
+def find_working_webcam(preferred_devices=None, deadline=6.0):
     """
     Find a working webcam device
 
     :param preferred_devices: List of device paths to try first
+    :param deadline: Overall time limit for probing in seconds
     :return: Working device path or None
     """
     # Prioritize video0 for Microsoft LifeCam HD-5000
     if preferred_devices is None:
         preferred_devices = ['/dev/video0', '/dev/video1']
 
-    # First, try fswebcam to check device functionality
-    for device in preferred_devices:
+    # All other video devices are probed concurrently with a lower preference
+    devices = list(preferred_devices) + sorted(glob.glob('/dev/video*'))
+
+    ranked = probe_webcams(devices, deadline=deadline, stop_early=True)
+    return ranked[0]['device'] if ranked else None
+
+
+def get_usb_device_info(device_path):
+    """
+    Identify the physical USB camera behind a video node via sysfs
+
+    :param device_path: Path to the video device, e.g. /dev/video0
+    :return: Dictionary with a stable key (vendor:product:serial:node index)
+             and the firmware revision (bcdDevice), or None for non-USB devices
+    """
+    def read_sysfs(path):
         try:
-            # Use subprocess to run fswebcam test
-            result = subprocess.run([
-                'fswebcam',
-                '-d', device,
-                '--no-banner',
-                '/dev/null'  # Discard output
-            ], capture_output=True, text=True, timeout=3)
-
-            # If fswebcam succeeds, return this device
-            if result.returncode == 0:
-                return device
-        except subprocess.TimeoutExpired:
-            continue
-        except Exception:
+            with open(path, 'r') as f:
+                return f.read().strip()
+        except OSError:
+            return None
+
+    sysfs_dir = os.path.join('/sys/class/video4linux', os.path.basename(device_path))
+    index = read_sysfs(os.path.join(sysfs_dir, 'index')) or '0'
+
+    # Walk up from the interface to the USB device that carries idVendor
+    usb_dir = os.path.realpath(os.path.join(sysfs_dir, 'device'))
+    while usb_dir and usb_dir != '/':
+        vendor = read_sysfs(os.path.join(usb_dir, 'idVendor'))
+        if vendor:
+            product = read_sysfs(os.path.join(usb_dir, 'idProduct')) or ''
+            serial = read_sysfs(os.path.join(usb_dir, 'serial')) or ''
+            return {
+                'key': f"{vendor}:{product}:{serial}:{index}",
+                'firmware': read_sysfs(os.path.join(usb_dir, 'bcdDevice'))
+            }
+        usb_dir = os.path.dirname(usb_dir)
+
+    return None
+
+
+def parse_v4l2_formats(output):
+    """
+    Parse the output of 'v4l2-ctl --list-formats-ext'
+
+    :param output: Text output of v4l2-ctl
+    :return: List of formats, each with pixel format, description and a list
+             of sizes with their frame rates
+    """
+    formats = []
+    current_format = None
+    current_size = None
+
+    for line in output.split('\n'):
+        line = line.strip()
+
+        # e.g. [0]: 'MJPG' (Motion-JPEG, compressed)
+        match = re.match(r"\[\d+\]:\s*'([^']+)'\s*(?:\((.*)\))?", line)
+        if match:
+            current_format = {
+                'pixel_format': match.group(1),
+                'description': match.group(2) or '',
+                'sizes': []
+            }
+            formats.append(current_format)
+            current_size = None
             continue
 
-    # Fallback to OpenCV detection
-    for device in preferred_devices:
-        try:
-            # Try OpenCV capture
-            cap = cv2.VideoCapture(device)
-            ret, frame = cap.read()
-            if ret and frame is not None and frame.size > 0:
-                cap.release()
-                return device
-            cap.release()
-        except Exception:
-            pass
+        # e.g. Size: Discrete 640x480 / Size: Stepwise 16x16 - 1920x1080 with step 1/1
+        match = re.match(r"Size:\s*(\w+)\s+(\d+)x(\d+)(?:\s*-\s*(\d+)x(\d+))?", line)
+        if match and current_format is not None:
+            width, height = int(match.group(2)), int(match.group(3))
+            if match.group(4):
+                # Stepwise/continuous: keep the largest size
+                width, height = int(match.group(4)), int(match.group(5))
+            current_size = {'width': width, 'height': height,
+                            'type': match.group(1).lower(), 'fps': []}
+            current_format['sizes'].append(current_size)
+            continue
 
-    # Comprehensive search if all else fails
-    try:
-        # Use v4l2-ctl to list all video devices
-        result = subprocess.run(['v4l2-ctl', '--list-devices'],
-                                capture_output=True,
-                                text=True)
-
-        # Extract all /dev/video* devices
-        devices = [
-            line.strip()
-            for line in result.stdout.split('\n')
-            if line.startswith('/dev/video')
-        ]
-
-        # Try each discovered device
-        for device in devices:
-            try:
-                # Try fswebcam first
-                result = subprocess.run([
-                    'fswebcam',
-                    '-d', device,
-                    '--no-banner',
-                    '/dev/null'
-                ], capture_output=True, text=True, timeout=3)
-
-                if result.returncode == 0:
-                    return device
-
-                # Fallback to OpenCV
-                cap = cv2.VideoCapture(device)
-                ret, frame = cap.read()
-                if ret and frame is not None and frame.size > 0:
-                    cap.release()
-                    return device
-                cap.release()
-            except Exception:
-                continue
-    except Exception:
-        pass
+        # e.g. Interval: Discrete 0.033s (30.000 fps)
+        match = re.match(r"Interval:.*?\(([\d.]+)\s*fps\)", line)
+        if match and current_size is not None:
+            current_size['fps'].append(float(match.group(1)))
 
-    return None
+    return formats
 
 
 def get_camera_capabilities(device_path):
@@ -96,12 +315,14 @@ def get_camera_capabilities(device_path):
     Retrieve camera capabilities
 
     :param device_path: Path to the video device
-    :return: Dictionary of camera capabilities
+    :return: Dictionary of camera capabilities (resolutions, pixel formats
+             and frame rates)
     """
     capabilities = {
         'supported_resolutions': [],
         'max_width': 0,
-        'max_height': 0
+        'max_height': 0,
+        'formats': []
     }
 
     try:
@@ -112,23 +333,20 @@ def get_camera_capabilities(device_path):
             '--list-formats-ext'
         ], capture_output=True, text=True, timeout=3)
 
-        # Parse output to extract resolutions
-        resolutions = []
-        for line in result.stdout.split('\n'):
-            if 'Size' in line:
-                try:
-                    # Extract resolution like '640x480'
-                    resolution = line.split(':')[-1].strip()
-                    width, height = map(int, resolution.split('x'))
-                    resolutions.append((width, height))
-
-                    # Track max resolution
-                    capabilities['max_width'] = max(capabilities['max_width'], width)
-                    capabilities['max_height'] = max(capabilities['max_height'], height)
-                except Exception:
-                    pass
-
-        capabilities['supported_resolutions'] = sorted(set(resolutions))
+        formats = parse_v4l2_formats(result.stdout)
+        capabilities['formats'] = formats
+
+        # Summarise resolutions across all pixel formats
+        resolutions = set()
+        for fmt in formats:
+            for size in fmt['sizes']:
+                resolutions.add((size['width'], size['height']))
+
+                # Track max resolution
+                capabilities['max_width'] = max(capabilities['max_width'], size['width'])
+                capabilities['max_height'] = max(capabilities['max_height'], size['height'])
+
+        capabilities['supported_resolutions'] = sorted(resolutions)
     except Exception as e:
         print(f"Error getting camera capabilities: {e}")
 
@@ -188,10 +406,10 @@ def test_webcam_capture(device_path, width=None, height=None):
         return False, None
 
     except subprocess.TimeoutExpired:
-        print(f"Timeout capturing from {device_path}")
+        logger.error(f"Timeout capturing from {device_path}")
         return False, None
     except Exception as e:
-        print(f"Webcam capture error: {e}")
+        logger.error(f"Webcam capture error: {e}")
         return False, None
 
 